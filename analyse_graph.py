@@ -0,0 +1,45 @@
+import sys
+import time
+
+from defs import Graph_analytics
+from defs import Triple_sink
+
+
+def main() -> int:
+
+    # A graph written by export_graph.py as .npz
+    if len(sys.argv) < 2:
+        print("Usage: python analyse_graph.py <graph.npz>")
+        return 1
+    rdf_output = True  #  Set to False to only print the top nodes
+    shard_output = False  #  Set to True to write the metrics as shards to data/shards/metrics (replacing the previous ones) instead of .nt files
+    top = 20  #  Nodes printed, by PageRank
+
+    start = time.perf_counter()
+    graph = Graph_analytics.load_graph(sys.argv[1])
+    edges = (len(graph.src) + (graph.src == graph.dst).sum()) // 2
+    print(f"{graph.n} nodes, {edges} edges loaded in {time.perf_counter() - start:.2f}s")
+
+    metrics = {}
+    for name, func in (("degree", lambda g: g.degree()), ("pagerank", Graph_analytics.pagerank),
+                       ("component", Graph_analytics.connected_components),
+                       ("community", Graph_analytics.louvain_communities)):
+        start = time.perf_counter()
+        metrics[name] = func(graph)
+        print(f"  {name}: {time.perf_counter() - start:.2f}s")
+    print(f"{metrics['component'].max() + 1} components, {metrics['community'].max() + 1} communities "
+          f"(modularity {Graph_analytics.modularity(graph, metrics['community']):.3f})")
+
+    for i in metrics["pagerank"].argsort()[::-1][:top]:
+        print(f"  {metrics['pagerank'][i]:.6f}  {graph.nodes[i]}")
+
+    if rdf_output:
+        sink = Triple_sink.ShardSink(Graph_analytics.SHARD_DIR) if shard_output else Triple_sink.RunFileSink(Graph_analytics.OUTPUT_DIR)
+        with sink:
+            Graph_analytics.write_metrics(graph, metrics, sink)
+        print(f"Metrics written in graph {Graph_analytics.METRICS_GRAPH} to {sink.output_dir}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
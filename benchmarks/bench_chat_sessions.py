@@ -0,0 +1,171 @@
+"""
+Load test of the chat loop: N concurrent sessions against a local streaming LLM
+stub and a SPARQL stub, first the way demo.py used to run them (synchronous OpenAI
+client and query call inside the async handler) and then through
+Sparql_chat.chat_turns. Reports wall time and, per session, the time from the start
+of the run to its first token, plus Sparql_chat.METRICS. In the async run one
+session in ten is cancelled part way, as the stop button does, and the others must
+still finish.
+
+Run from the repository root:
+    python -m benchmarks.bench_chat_sessions [sessions] [ttft_seconds] [query_seconds]
+"""
+
+import asyncio
+import contextlib
+import io
+import re
+import sys
+import time
+
+from openai import AsyncOpenAI, OpenAI
+
+from benchmarks.stub_services import StubLLM, StubSparqlQuery
+from defs import Http
+from defs import Sparql_cache
+from defs import Sparql_chat
+
+QUESTIONS = [
+    "Provide an extensive list of all the pathogens you are aware of and classify them",
+    "Provide an extensive list of the pathogens that have been sequenced in China",
+]
+SPARQL_BLOCK = re.compile(r"```sparql\n(.*?)```", re.S)
+ENDPOINT_COMMENT = re.compile(r"#\+ endpoint: (\S+)")
+
+
+def stub_answer(sparql_url):
+    """The stub LLM writes a query for a question and a short text for a summary request."""
+    def answer(messages):
+        request = messages[-1]["content"] if messages[-1]["role"] == "user" else messages[1]["content"]
+        if messages[0]["role"] == "user" and "summarize" in messages[0]["content"]:
+            return "The endpoint lists ten stub pathogens. " * 8
+        where = "FILTER (REGEX(?place, \"China\"))" if "China" in request else ""
+        return ("Here is the query:\n\n```sparql\n"
+                f"#+ endpoint: {sparql_url}\n"
+                "PREFIX schema: <https://schema.org/>\n"
+                f"SELECT DISTINCT ?name WHERE {{ ?s a schema:InfectiousDisease ; schema:name ?name . {where} }}\n"
+                "```\n")
+    return answer
+
+
+def query_sparql(query, endpoint_url):
+    response = Http.post(endpoint_url, data={"query": query},
+                         headers={"Accept": "application/sparql-results+json"})
+    response.raise_for_status()
+    return response.json()
+
+
+def extract(answer):
+    match = SPARQL_BLOCK.search(answer)
+    if not match:
+        return None, None
+    endpoint = ENDPOINT_COMMENT.search(match.group(1))
+    return match.group(1), endpoint.group(1) if endpoint else None
+
+
+def opening_messages(question):
+    return [{"role": "system", "content": "You write SPARQL."}, {"role": "user", "content": question}]
+
+
+async def blocking_session(client, question, start, first_tokens):
+    """The old demo.on_message: sync client and sync query inside the coroutine."""
+    messages = opening_messages(question)
+    first = None
+    for _ in range(Sparql_chat.MAX_TRY_COUNT):
+        parts = []
+        for r in client.chat.completions.create(model=Sparql_chat.MODEL, messages=messages, stream=True):
+            if r.choices and r.choices[0].delta.content:
+                first = first or time.perf_counter() - start
+                parts.append(r.choices[0].delta.content)
+        query, endpoint = extract("".join(parts))
+        if query is None:
+            break
+        query_sparql(query, endpoint)
+        messages = [{"role": "user", "content": "The query you provided returned these results, summarize them"}]
+    first_tokens.append(first)
+
+
+async def async_session(client, cache, question, start, first_tokens):
+    async def execute_query(answer):
+        query, endpoint = extract(answer)
+        if query is None:
+            return []
+        return (await cache.aquery(query, endpoint))["results"]["bindings"]
+
+    first = None
+    async for event, value in Sparql_chat.chat_turns(opening_messages(question), execute_query, client=client):
+        if event == "token" and first is None:
+            first = time.perf_counter() - start
+    first_tokens.append(first)
+
+
+def percentiles(values):
+    ordered = sorted(v for v in values if v is not None)
+    return ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+async def run_async(sessions, llm_url):
+    client = AsyncOpenAI(base_url=llm_url, api_key=".")
+    cache = Sparql_cache.SparqlCache(query_sparql)
+    warm_up = Sparql_chat.stream_answer(opening_messages(QUESTIONS[0]), client, metrics=Sparql_chat.LatencyMetrics())
+    async for token in warm_up:
+        pass  # outside the timing
+    first_tokens = []
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(async_session(client, cache, QUESTIONS[i % len(QUESTIONS)], start, first_tokens))
+             for i in range(sessions)]
+    cancelled = tasks[::10]
+    await asyncio.sleep(0.05)
+    for task in cancelled:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    seconds = time.perf_counter() - start
+    failed = [r for task, r in zip(tasks, results) if task not in cancelled and isinstance(r, BaseException)]
+    await client.close()
+    return seconds, first_tokens, len(cancelled), failed, cache.stats()
+
+
+async def run_blocking(sessions, llm_url):
+    client = OpenAI(base_url=llm_url, api_key=".")
+    for r in client.chat.completions.create(model=Sparql_chat.MODEL, messages=opening_messages(QUESTIONS[0]),
+                                            stream=True):
+        pass  # warm-up, outside the timing
+    first_tokens = []
+    start = time.perf_counter()
+    await asyncio.gather(*[blocking_session(client, QUESTIONS[i % len(QUESTIONS)], start, first_tokens)
+                           for i in range(sessions)])
+    return time.perf_counter() - start, first_tokens
+
+
+def main() -> int:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ttft = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    query_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+
+    sparql = StubSparqlQuery(query_seconds)
+    llm = StubLLM(ttft, token_delay=0.01)
+    llm.answer = stub_answer(sparql.url + "/sparql")
+    for service in (sparql, llm):
+        service.start()
+    try:
+        print(f"Sessions: {sessions}, stub time to first token: {ttft}s, stub query: {query_seconds}s")
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, first_tokens = asyncio.run(run_blocking(sessions, llm.url))
+        p50, p95 = percentiles(first_tokens)
+        print(f"{'blocking':>9}: {seconds:6.2f}s  first token p50 {p50:6.2f}s  p95 {p95:6.2f}s")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, first_tokens, cancelled, failed, cache_stats = asyncio.run(run_async(sessions, llm.url))
+        p50, p95 = percentiles(first_tokens)
+        print(f"{'async':>9}: {seconds:6.2f}s  first token p50 {p50:6.2f}s  p95 {p95:6.2f}s  "
+              f"cancelled {cancelled}, failed {len(failed)}, SPARQL cache {cache_stats}")
+        for name, summary in Sparql_chat.METRICS.summary().items():
+            print(f"{name:>10}: {summary}")
+    finally:
+        for service in (sparql, llm):
+            service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
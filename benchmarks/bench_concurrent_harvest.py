@@ -0,0 +1,77 @@
+"""
+Wall-clock comparison of the sequential taxon loop (etl_ENA_REST.main) and
+Concurrent_harvest.harvest_taxa against local stub services, checking that both
+write the same N-Triples files.
+
+Run from the repository root:
+    python -m benchmarks.bench_concurrent_harvest [number_of_taxa]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from benchmarks.stub_services import StubServices
+from defs import Concurrent_harvest
+from defs import ENA_tax_eq
+from defs import Lookup_cache
+from etl_ENA_REST import TAXON_LIST
+
+
+def _graph(path):
+    g = Graph()
+    g.parse(path, format="nt")
+    return g.de_skolemize()
+
+
+def same_output(dir_a, dir_b):
+    """True when both directories hold the same files with isomorphic graphs."""
+    files_a, files_b = sorted(os.listdir(dir_a)), sorted(os.listdir(dir_b))
+    if files_a != files_b:
+        return False
+    return all(isomorphic(_graph(os.path.join(dir_a, f)), _graph(os.path.join(dir_b, f))) for f in files_a)
+
+
+def timed_run(harvest):
+    """Runs a harvest in a fresh working directory, returning (seconds, output dir)."""
+    workdir = tempfile.mkdtemp(prefix="pdn2rdf-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            harvest()
+        return time.perf_counter() - start, os.path.join(workdir, ENA_tax_eq.OUTPUT_DIR)
+    finally:
+        os.chdir(cwd)
+
+
+def main() -> int:
+    taxa = TAXON_LIST[:int(sys.argv[1]) if len(sys.argv) > 1 else 40]
+    ENA_tax_eq.TEMPLATE_FILE = os.path.abspath(ENA_tax_eq.TEMPLATE_FILE)
+    Lookup_cache.ENABLED = False  # time the network path, not the lookup cache
+
+    with StubServices(rows_per_taxon=100):
+        def sequential():
+            for taxon in taxa:
+                ENA_tax_eq.serviceCallByTaxonID(taxon, 100)
+
+        seq_seconds, seq_dir = timed_run(sequential)
+        con_seconds, con_dir = timed_run(lambda: Concurrent_harvest.harvest_taxa(taxa, 100))
+
+    print(f"Taxa:       {len(taxa)} ({len(set(taxa))} unique)")
+    print(f"Sequential: {seq_seconds:.2f}s")
+    print(f"Concurrent: {con_seconds:.2f}s")
+    print(f"Speedup:    {seq_seconds / con_seconds:.1f}x")
+    print(f"Same output files: {same_output(seq_dir, con_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
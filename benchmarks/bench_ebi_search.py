@@ -0,0 +1,60 @@
+"""
+Pages per second of EBI_search.harvest against a local EBI Search stub: one page
+at a time (max_workers=1, the old loop's pace, but following every page) and then
+with more workers, checking both write the same rows. The stub's host gets the
+same concurrency cap and request rate as www.ebi.ac.uk.
+
+Run from the repository root:
+    python -m benchmarks.bench_ebi_search [queries] [hits_per_category] [max_workers]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import urllib.parse
+
+from benchmarks.stub_services import StubServices
+from defs import EBI_search
+from defs import Http
+from EBI_search_all_categories_to_tsv import QUERIES
+
+
+def _rows(output_dir, queries):
+    rows = set()
+    for query in queries:
+        with open(os.path.join(output_dir, f"{query}.tsv"), encoding='utf-8') as f:
+            rows.update((query, line) for line in f)
+    return rows
+
+
+def main() -> int:
+    queries = QUERIES[:int(sys.argv[1]) if len(sys.argv) > 1 else 2]
+    hits = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    with StubServices(hits_per_category=hits) as services:
+        host = urllib.parse.urlsplit(services.ebisearch.url).netloc
+        Http.HOST_LIMITS[host] = Http.HOST_LIMITS["www.ebi.ac.uk"]
+        Http.HOST_RATES[host] = Http.HOST_RATES["www.ebi.ac.uk"]
+        pages = len(queries) * len(EBI_search.CATEGORIES) * -(-hits // EBI_search.PAGE_SIZE)
+        print(f"Queries: {len(queries)}, categories: {len(EBI_search.CATEGORIES)}, hits per category: {hits}, "
+              f"pages: {pages}, stub latency: {services.ebisearch.latency}s, "
+              f"host limit: {Http.HOST_LIMITS[host]}, rate: {Http.HOST_RATES[host]}/s")
+
+        outputs = []
+        for workers in (1, max_workers):
+            output_dir = tempfile.mkdtemp(prefix="pdn2rdf-ebisearch-")
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = EBI_search.harvest(queries, output_dir=output_dir, max_workers=workers)
+            outputs.append(_rows(output_dir, queries))
+            print(f"{workers:>3} worker{'s' if workers > 1 else ' '}: {summary['seconds']:7.2f}s  "
+                  f"{summary['pages']} pages  {summary['pages_per_second']:6.1f} pages/s  "
+                  f"{summary['rows']} rows  {summary['errors']} failed")
+        print(f"Same rows: {outputs[0] == outputs[-1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Graph_analytics on the synthetic pathogen-to-place graph of bench_graph_export,
+written as .npz by Graph_export: time of each metric, against PageRank on a
+dict-of-dicts graph as networkx builds it (networkx itself is not installed here),
+and the largest PageRank difference between the two.
+
+Run from the repository root:
+    python -m benchmarks.bench_graph_analytics [edges...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_graph_export import rows
+from defs import Graph_analytics
+from defs import Graph_export
+
+
+def dict_pagerank(adjacency, alpha=Graph_analytics.PAGERANK_ALPHA, tol=Graph_analytics.PAGERANK_TOL,
+                  max_iter=Graph_analytics.PAGERANK_MAX_ITER):
+    """Power iteration over a dict-of-dicts graph, one node and neighbour at a time."""
+    n = len(adjacency)
+    out_weight = {node: sum(neighbours.values()) for node, neighbours in adjacency.items()}
+    rank = dict.fromkeys(adjacency, 1.0 / n)
+    for _ in range(max_iter):
+        previous = rank
+        dangling = alpha * sum(previous[node] for node in adjacency if not out_weight[node])
+        rank = dict.fromkeys(adjacency, (dangling + 1.0 - alpha) / n)
+        for node, neighbours in adjacency.items():
+            for neighbour, weight in neighbours.items():
+                rank[neighbour] += alpha * previous[node] * weight / out_weight[node]
+        if sum(abs(rank[node] - previous[node]) for node in adjacency) < n * tol:
+            break
+    return rank
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20000, 100000, 500000]
+    print(f"{'edges':>8} {'nodes':>7} {'load':>7} {'degree':>7} {'pagerank':>9} {'dict pr':>8} {'components':>11} "
+          f"{'louvain':>8} {'communities':>12} {'modularity':>11} {'max pr diff':>12}")
+    with tempfile.TemporaryDirectory(prefix="pdn2rdf-analytics-") as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"graph-{size}.npz")
+            Graph_export.export(rows(0, size), path)
+            graph, load = timed(Graph_analytics.load_graph, path)
+            _, degree = timed(graph.degree)
+            rank, pagerank = timed(Graph_analytics.pagerank, graph)
+            components, component_seconds = timed(Graph_analytics.connected_components, graph)
+            communities, louvain = timed(Graph_analytics.louvain_communities, graph)
+
+            adjacency = {node: {} for node in range(graph.n)}
+            for u, v, w in zip(graph.src.tolist(), graph.dst.tolist(), graph.weights.tolist()):
+                adjacency[u][v] = w
+            dict_rank, dict_seconds = timed(dict_pagerank, adjacency)
+            difference = np.abs(rank - np.array([dict_rank[node] for node in range(graph.n)])).max()
+            print(f"{size:8d} {graph.n:7d} {load:7.3f} {degree:7.4f} {pagerank:9.3f} {dict_seconds:8.3f} "
+                  f"{component_seconds:11.3f} {louvain:8.2f} {communities.max() + 1:12d} "
+                  f"{Graph_analytics.modularity(graph, communities):11.3f} {difference:12.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Graph export the way triplestore/graphlpg/rdfGraphs.ipynb does it (all JSON bindings
+in memory, one node element per edge end, then the file parsed again to get a
+graph) against Graph_export streaming LIMIT/OFFSET pages of TSV into each format.
+The SPARQL endpoint is a local stub serving a synthetic pathogen-to-place graph.
+Reports time, peak Python memory (tracemalloc) and the node elements written.
+
+Run from the repository root:
+    python -m benchmarks.bench_graph_export [edges] [page_size]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from benchmarks.stub_services import StubSparqlTable
+from defs import Graph_export
+from defs import Http
+
+VARIABLES = ["name", "predicate", "spatial_name", "sType", "tType"]
+PLACES_PER_PATHOGEN = 20
+
+
+def rows(start, count):
+    """Edge i links pathogen i // PLACES_PER_PATHOGEN to one of 5000 places."""
+    for i in range(start, start + count):
+        pathogen = i // PLACES_PER_PATHOGEN
+        yield [f'"Stub pathogen {pathogen}"', '"spatialCoverage"', f'"Country {(pathogen * 7 + i) % 5000}"',
+               '"pathogen"', '"geospatial"']
+
+
+def notebook_export(endpoint, path):
+    response = Http.post(endpoint, data={"query": Graph_export.PATHOGEN_PLACE_QUERY},
+                         headers={"Accept": "application/sparql-results+json"})
+    bindings = response.json()["results"]["bindings"]
+    # pygraphml.Graph.add_node for both ends of every row, written as is
+    nodes, edges = [], []
+    for row in bindings:
+        nodes.append((row["name"]["value"], "pathogen"))
+        nodes.append((row["spatial_name"]["value"], "geospatial"))
+        edges.append((row["name"]["value"], row["spatial_name"]["value"]))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" ?>\n<graphml>\n<graph id="" edgedefault="undirected">\n')
+        for node, node_type in nodes:
+            f.write(f'<node id={quoteattr(node)}><data key="type">{escape(node_type)}</data></node>\n')
+        for source, target in edges:
+            f.write(f'<edge source={quoteattr(source)} target={quoteattr(target)}>'
+                    f'<data key="predicate">spatialCoverage</data></edge>\n')
+        f.write('</graph>\n</graphml>\n')
+    ET.parse(path)  # nx.read_graphml parses the file again
+    return len(nodes)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def count_nodes(path):
+    count = 0
+    for _, element in ET.iterparse(path):
+        if element.tag.rsplit("}", 1)[-1] == "node":
+            count += 1
+        element.clear()
+    return count
+
+
+def main() -> int:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    sparql = StubSparqlTable(0.0, VARIABLES, rows, total)
+    sparql.start()
+    endpoint = sparql.url + "/sparql"
+    print(f"Edges: {total}, page size: {page_size}")
+    try:
+        with tempfile.TemporaryDirectory(prefix="pdn2rdf-graph-bench-") as tmp:
+            sparql.json = True
+            path = os.path.join(tmp, "notebook.graphml")
+            nodes, seconds, peak = measure(notebook_export, endpoint, path)
+            print(f"{'notebook':>18}: {seconds:6.2f}s  peak {peak / 2**20:7.1f} MiB  {nodes} node elements")
+            sparql.json = False
+
+            for fmt in Graph_export.FORMATS:
+                path = os.path.join(tmp, f"graph.{fmt}")
+                summary, seconds, peak = measure(
+                    Graph_export.export, Graph_export.sparql_rows(Graph_export.PATHOGEN_PLACE_QUERY, endpoint,
+                                                                  page_size), path)
+                if fmt in ("graphml", "gexf"):
+                    detail = f"{count_nodes(path)} node elements"
+                elif fmt == "npz":
+                    with np.load(path) as graph:
+                        detail = f"CSR {len(graph['indptr']) - 1} nodes, {len(graph['indices'])} edges"
+                else:
+                    detail = f"{os.path.getsize(path) / 2**20:.1f} MiB"
+                print(f"{'streaming ' + fmt:>18}: {seconds:6.2f}s  peak {peak / 2**20:7.1f} MiB  {detail}  "
+                      f"({summary['nodes']} nodes, {summary['edges']} edges)")
+    finally:
+        sparql.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Cold-start time of the pipeline modules: each one is imported in a fresh
+interpreter, REPEATS times, and the median import time is compared with its
+budget in BUDGETS. Also checks that none of LAZY_MODULES (the OpenAI client
+library, pyld, rdflib) gets imported along the way; they are only loaded by the
+code paths that use them. Exits with 1 when a module is over budget or pulls in
+a lazy module, so it can guard the startup of process-pool workers and short CLI
+runs.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time [modules...]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPEATS = 5
+
+# Seconds, with headroom over the measured times; pandas and requests are needed by most of them
+BUDGETS = {
+    "defs.Http": 0.3,
+    "defs.Instrumentation": 0.05,
+    "defs.Lookup_cache": 0.1,
+    "defs.Template_emitter": 1.0,
+    "defs.Tool_Pathogen_Class": 0.4,
+    "defs.Lineage_classifier": 0.4,
+    "defs.ENA_tax_eq": 1.2,
+    "defs.Parallel_generation": 1.2,
+    "defs.Concurrent_harvest": 1.2,
+    "defs.Triple_sink": 1.2,
+    "defs.EBI_search": 0.3,
+    "defs.Sparql_cache": 0.1,
+    "defs.Sparql_chat": 0.1,
+    "defs.Example_retriever": 0.1,
+    "defs.Graph_export": 0.3,
+}
+LAZY_MODULES = ["openai", "pyld", "rdflib"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(__import__("json").dumps({{"seconds": seconds, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def import_time(module):
+    """Median seconds to import a module in a fresh interpreter, and the lazy modules it loaded."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    runs = []
+    for _ in range(REPEATS):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+                                capture_output=True, text=True, check=True, env=env).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return statistics.median(run["seconds"] for run in runs), runs[0]["loaded"]
+
+
+def main() -> int:
+    modules = sys.argv[1:] or list(BUDGETS)
+    failures = 0
+    print(f"{'module':<28} {'seconds':>8} {'budget':>7}  lazy modules loaded")
+    for module in modules:
+        seconds, loaded = import_time(module)
+        budget = BUDGETS.get(module)
+        over = budget is not None and seconds > budget
+        failures += over or bool(loaded)
+        print(f"{module:<28} {seconds:8.3f} {budget or float('nan'):7.2f}  {', '.join(loaded) or '-'}"
+              f"{'  OVER BUDGET' if over else ''}")
+    print("OK" if not failures else f"{failures} module(s) over budget or loading lazy modules")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
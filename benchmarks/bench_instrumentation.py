@@ -0,0 +1,57 @@
+"""
+Cost of Instrumentation: Concurrent_harvest.harvest_taxa against local stub
+services with instrumentation off, then on with a trace file and the metrics
+endpoint. Reports the wall-clock difference, the stage summary, the spans in the
+trace and a few lines scraped from the Prometheus endpoint.
+
+Run from the repository root:
+    python -m benchmarks.bench_instrumentation [number_of_taxa]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import urllib.request
+
+from benchmarks.bench_concurrent_harvest import timed_run
+from benchmarks.stub_services import StubServices
+from defs import Concurrent_harvest
+from defs import ENA_tax_eq
+from defs import Instrumentation
+from defs import Lookup_cache
+from etl_ENA_REST import TAXON_LIST
+
+
+def main() -> int:
+    taxa = TAXON_LIST[:int(sys.argv[1]) if len(sys.argv) > 1 else 40]
+    ENA_tax_eq.TEMPLATE_FILE = os.path.abspath(ENA_tax_eq.TEMPLATE_FILE)
+    Lookup_cache.ENABLED = False  # every taxon goes through UniProt and the LLM
+
+    with StubServices(rows_per_taxon=100), tempfile.TemporaryDirectory(prefix="pdn2rdf-trace-") as tmp:
+        off, _ = timed_run(lambda: Concurrent_harvest.harvest_taxa(taxa))
+
+        trace_file = os.path.join(tmp, "trace.jsonl")
+        Instrumentation.configure(trace_file)
+        port = Instrumentation.serve(0)
+        on, _ = timed_run(lambda: Concurrent_harvest.harvest_taxa(taxa))
+        metrics = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        Instrumentation.close()
+
+        with open(trace_file, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+
+    print(f"{len(taxa)} taxa: {off:.2f}s off, {on:.2f}s on ({100 * (on - off) / off:+.1f}%)")
+    spans = [record for record in records if record["stage"] != "counters"]
+    print(f"Trace: {len(spans)} spans, {len({r['taxon'] for r in spans if 'taxon' in r})} taxa")
+    Instrumentation.print_summary()
+    print("Metrics endpoint:")
+    for line in metrics.splitlines():
+        if line.startswith(("pdn2rdf_rows", "pdn2rdf_triples", "pdn2rdf_llm_tokens", 'pdn2rdf_stage_seconds_sum')):
+            print(f"  {line}")
+    Instrumentation.configure(enabled=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Throughput of the RDF generation stage alone: the bundled ENA fixtures
+(data/input/japan.tsv and virus.tsv) replicated to a million rows, converted in
+this process and then through Parallel_generation with 1, 2, 4, ... worker
+processes up to the number of cores. Output goes to a sink that only hashes it,
+so disk speed is not measured, and every run must hash the same.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel_generation [rows] [chunk_rows]
+"""
+
+import hashlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+from defs import ENA_tax_eq
+from defs import Parallel_generation
+from defs import Template_emitter
+
+FIXTURES = [os.path.join(os.path.dirname(__file__), "..", "data", "input", name)
+            for name in ("japan.tsv", "virus.tsv")]
+NAMES = ("Monkeypox virus", "Virus", ENA_tax_eq.clean_string("Monkeypox virus"))
+
+
+class HashSink:
+    """Sink that digests what it is given instead of writing it."""
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.runs = 0
+        self.triples = 0
+
+    def write(self, taxon, run_accessions, documents):
+        for ntriples in documents:
+            self.digest.update(ntriples.encode('utf-8'))
+            self.triples += ntriples.count("\n")
+        self.runs += len(documents)
+        return len(documents)
+
+
+def fixture_rows(rows):
+    """The fixtures' template columns repeated to `rows` rows, run accessions kept unique."""
+    fixture = pd.concat([Parallel_generation.project(pd.read_csv(path, sep="\t", dtype=str)) for path in FIXTURES],
+                        ignore_index=True)
+    df = fixture.iloc[[i % len(fixture) for i in range(rows)]].reset_index(drop=True)
+    df["run_accession"] = df["run_accession"] + "_" + df.index.astype(str)
+    return df
+
+
+def batches(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield 10244, df.iloc[start:start + chunk_rows], NAMES
+
+
+def in_process(df, chunk_rows):
+    emitter = Template_emitter.get_emitter(ENA_tax_eq.TEMPLATE_FILE)
+    sink = HashSink()
+    for taxon, chunk, names in batches(df, chunk_rows):
+        sink.write(taxon, chunk["run_accession"], ENA_tax_eq.convert_frame(chunk, emitter, *names))
+    return sink
+
+
+def main() -> int:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    chunk_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    df = fixture_rows(rows)
+    cores = os.cpu_count()
+
+    start = time.perf_counter()
+    baseline = in_process(df, chunk_rows)
+    base_seconds = time.perf_counter() - start
+    print(f"Rows: {rows}, chunk: {chunk_rows}, cores: {cores}, triples: {baseline.triples}")
+    print(f"{'in-process':>12}: {base_seconds:7.2f}s  {rows / base_seconds:9.0f} rows/s  "
+          f"{baseline.triples / base_seconds:10.0f} triples/s")
+
+    processes = 1
+    while True:
+        with Parallel_generation.process_pool(processes) as pool:
+            pool.submit(int).result()  # start the workers outside the timing
+            sink = HashSink()
+            start = time.perf_counter()
+            Parallel_generation.generate(batches(df, chunk_rows), sink, processes, pool=pool)
+            seconds = time.perf_counter() - start
+        same = sink.digest.digest() == baseline.digest.digest()
+        print(f"{processes:>3} process{'es' if processes > 1 else '  '}: {seconds:7.2f}s  {rows / seconds:9.0f} rows/s  "
+              f"{sink.triples / seconds:10.0f} triples/s  speedup {base_seconds / seconds:4.1f}x  same output: {same}")
+        if processes >= cores:
+            break
+        processes = min(2 * processes, cores)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
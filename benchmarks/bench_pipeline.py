@@ -0,0 +1,251 @@
+"""
+End-to-end pipeline benchmark on recorded fixtures (benchmarks/fixtures.py), with
+no network access: each stage runs in a fresh interpreter against the replay
+services, with Instrumentation on, and reports its rows/s, triples/s, peak RSS
+and the p50/p95 latency of the spans it went through.
+
+Stages:
+    taxon_tools  Tool_Pathogen_Name_from_Taxon_ID and Tool_Pathogen_Class for each
+                 taxon (tool call, UniProt lineage, answer), then one batched
+                 get_pathogen_classes
+    harvest      ENA_tax_eq.serviceCallByTaxonID for each taxon, to a temporary sink
+    ebisearch    EBI_search.harvest (the former fetch_data) of every query and category
+    chat         concurrent Sparql_chat.chat_turns sessions, the query run through
+                 Sparql_cache against the replayed SPARQL endpoint
+
+The results are saved as JSON in RESULTS_DIR, named after the time and commit, so
+runs can be compared across commits:
+
+    python -m benchmarks.bench_pipeline [--taxa 40] [--rows 1000] [--compare benchmarks/results/<file>.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fixtures
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+STAGES = ["taxon_tools", "harvest", "ebisearch", "chat"]
+NOISE_PERCENT = 10  # smaller changes are not flagged; repeated runs on one machine vary about this much
+
+
+def run_taxon_tools(services, taxa, args):
+    from defs import Tool_Pathogen_Class
+    from defs import Tool_Pathogen_Name_from_Taxon_ID
+
+    names = []
+    for taxon in taxa:
+        name = Tool_Pathogen_Name_from_Taxon_ID.get_pathogen_name_by_taxon_id(taxon)
+        Tool_Pathogen_Class.get_pathogen_class(name)
+        names.append(name)
+    Tool_Pathogen_Class.get_pathogen_classes(names)
+    return {"items": len(taxa)}
+
+
+def run_harvest(services, taxa, args):
+    from defs import ENA_tax_eq
+    from defs import Triple_sink
+
+    with tempfile.TemporaryDirectory(prefix="pdn2rdf-pipeline-") as tmp:
+        sink = Triple_sink.ShardSink(tmp) if args.shards else Triple_sink.RunFileSink(tmp)
+        with sink:
+            for taxon in taxa:
+                ENA_tax_eq.serviceCallByTaxonID(taxon, args.rows, sink=sink)
+    return {"items": len(taxa)}
+
+
+def run_ebisearch(services, taxa, args):
+    from defs import EBI_search
+    from EBI_search_all_categories_to_tsv import QUERIES
+
+    with tempfile.TemporaryDirectory(prefix="pdn2rdf-pipeline-") as tmp:
+        summary = EBI_search.harvest(QUERIES, EBI_search.CATEGORIES, tmp)
+    return {"items": summary["pages"]}
+
+
+def run_chat(services, taxa, args):
+    from openai import AsyncOpenAI
+
+    from benchmarks.bench_chat_sessions import extract, opening_messages, query_sparql
+    from defs import Sparql_cache
+    from defs import Sparql_chat
+
+    questions = [entry["question"] for entry in services.fixtures["chat"]]
+
+    async def sessions():
+        client = AsyncOpenAI(base_url=services.chat_llm.url, api_key=".")
+        cache = Sparql_cache.SparqlCache(query_sparql)
+
+        async def execute_query(answer):
+            query, endpoint = extract(answer)
+            if query is None:
+                return []
+            return (await cache.aquery(query, endpoint))["results"]["bindings"]
+
+        async def session(question):
+            async for _ in Sparql_chat.chat_turns(opening_messages(question), execute_query, client=client):
+                pass
+
+        await asyncio.gather(*[session(questions[i % len(questions)]) for i in range(args.sessions)])
+        await client.close()
+
+    asyncio.run(sessions())
+    return {"items": args.sessions}
+
+
+def run_stage(stage, args):
+    """Runs one stage in this process and returns its measurements."""
+    from defs import Instrumentation
+    from defs import Lookup_cache
+
+    data = fixtures.load_fixtures(args.fixtures)
+    taxa = fixtures.taxon_ids(data, args.taxa)
+    Lookup_cache.ENABLED = False  # every run goes through the services
+    Instrumentation.configure()
+    services = fixtures.ReplayServices(data, rows_per_taxon=args.rows, hits_per_category=args.hits,
+                                       latency_scale=args.latency_scale)
+    with services, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = globals()[f"run_{stage}"](services, taxa, args)
+        seconds = time.perf_counter() - start
+
+    snapshot = Instrumentation.snapshot()
+    counters = {}
+    for counter in snapshot["counters"]:
+        counters[counter["name"]] = counters.get(counter["name"], 0) + counter["value"]
+    rows = counters.get("rows", 0)
+    triples = counters.get("triples", 0)
+    return {"seconds": round(seconds, 4), "items": result["items"], "items_per_second": round(result["items"] / seconds, 1),
+            "rows": rows, "triples": triples,
+            "rows_per_second": round(rows / seconds, 1), "triples_per_second": round(triples / seconds, 1),
+            "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "http_requests": counters.get("http_requests", 0), "llm_tokens": counters.get("llm_tokens", 0),
+            "latency": {name: {"count": totals["count"], "p50": totals["p50"], "p95": totals["p95"]}
+                        for name, totals in sorted(snapshot["stages"].items())}}
+
+
+def stage_in_subprocess(stage, argv):
+    """Runs a stage in a fresh interpreter, so its peak RSS and imports are its own."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    env.pop("PDN2RDF_TRACE", None)
+    env.pop("PDN2RDF_METRICS_PORT", None)
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_pipeline", "--stage", stage, *argv],
+                            capture_output=True, text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median_run(runs):
+    """The run with the median time, its peak RSS the largest of all runs."""
+    chosen = sorted(runs, key=lambda run: run["seconds"])[len(runs) // 2]
+    return {**chosen, "peak_rss_mib": max(run["peak_rss_mib"] for run in runs),
+            "seconds_all": [run["seconds"] for run in runs]}
+
+
+def git_commit():
+    def git(*command):
+        return subprocess.run(["git", *command], capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def print_results(results):
+    print(f"{'stage':<12} {'seconds':>8} {'items':>6} {'items/s':>8} {'rows/s':>9} {'triples/s':>10} {'peak RSS':>9}  "
+          f"p50/p95 per span (ms)")
+    for stage, result in results["stages"].items():
+        spans = ", ".join(f"{name} {1000 * t['p50']:.1f}/{1000 * t['p95']:.1f}" for name, t in result["latency"].items())
+        print(f"{stage:<12} {result['seconds']:8.2f} {result['items']:6d} {result['items_per_second']:8.1f} "
+              f"{result['rows_per_second']:9.0f} "
+              f"{result['triples_per_second']:10.0f} {result['peak_rss_mib']:7.1f}Mi  {spans}")
+
+
+def print_comparison(old, new):
+    """Change of each stage's throughput, peak RSS and p95 latencies from old to new."""
+    print(f"\nChange from {old['commit']} ({old['date']}) to {new['commit']}:")
+    if old["params"] != new["params"] or old["fixtures"] != new["fixtures"]:
+        print("  (different parameters or fixtures: the numbers are not comparable)")
+
+    def change(name, before, after, lower_is_better=False):
+        percent = 100 * (after - before) / before
+        better = percent < 0 if lower_is_better else percent > 0
+        return f"{name} {percent:+.1f}%{'' if abs(percent) < NOISE_PERCENT else (' better' if better else ' worse')}"
+
+    for stage, result in new["stages"].items():
+        before = old["stages"].get(stage)
+        if before is None:
+            continue
+        changes = [change("time", before["seconds"], result["seconds"], True),
+                   change("peak RSS", before["peak_rss_mib"], result["peak_rss_mib"], True)]
+        for key, name in (("items_per_second", "items/s"), ("rows_per_second", "rows/s"),
+                          ("triples_per_second", "triples/s")):
+            if before[key]:
+                changes.append(change(name, before[key], result[key]))
+        changes += [change(f"{name} p95", before["latency"][name]["p95"], latency["p95"], True)
+                    for name, latency in result["latency"].items() if before["latency"].get(name, {}).get("p95")]
+        print(f"  {stage}: {', '.join(changes)}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--taxa", type=int, default=40, help="taxa harvested, recorded ones first")
+    parser.add_argument("--rows", type=int, default=1000, help="ENA runs per taxon")
+    parser.add_argument("--hits", type=int, default=500, help="EBI Search hits per recorded category")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent chat sessions")
+    parser.add_argument("--shards", action="store_true", help="harvest to gzipped shards instead of one file per run")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="replay the recorded service latencies times this (0: answer at once)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the median run is kept")
+    parser.add_argument("--fixtures", default=fixtures.FIXTURE_FILE)
+    parser.add_argument("--output", help="results file (default: RESULTS_DIR/<date and time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file; the latest other one in RESULTS_DIR if 'latest'")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args)))
+        return 0
+
+    params = {"taxa": args.taxa, "rows": args.rows, "hits": args.hits, "sessions": args.sessions,
+              "shards": args.shards, "latency_scale": args.latency_scale}
+    argv = [f"--taxa={args.taxa}", f"--rows={args.rows}", f"--hits={args.hits}", f"--sessions={args.sessions}",
+            f"--latency-scale={args.latency_scale}", f"--fixtures={args.fixtures}"] + (["--shards"] if args.shards else [])
+    commit, dirty = git_commit()
+    results = {"commit": commit + ("+dirty" if dirty else ""), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "cpus": os.cpu_count(), "fixtures": fixtures.fixture_hash(args.fixtures),
+               "params": params, "stages": {}}
+    print(f"Commit {results['commit']}, fixtures {results['fixtures']}, {params}")
+    for stage in args.stages:
+        runs = [stage_in_subprocess(stage, argv) for _ in range(args.repeat)]
+        results["stages"][stage] = median_run(runs)
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['date'].replace(':', '')}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nSaved {output}")
+
+    compare = args.compare
+    if compare == "latest":
+        earlier = sorted((path for path in glob.glob(os.path.join(RESULTS_DIR, "*.json"))
+                          if os.path.abspath(path) != os.path.abspath(output)), key=os.path.getmtime)
+        compare = earlier[-1] if earlier else None
+    if compare:
+        with open(compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
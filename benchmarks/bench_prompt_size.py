@@ -0,0 +1,91 @@
+"""
+Size of the demo.py system prompt before and after Example_retriever: all examples
+and the whole JSON-LD template pasted in, against the TOP_K examples closest to the
+question and the one-line-per-type schema summary. The example set is grown from
+data/sparql-examples.json and the queries of SPARQL/*.rq (their file names, split
+into words, stand in for questions) to show how each prompt scales once more
+examples are curated. The fixed instructions, the same both ways, are left out.
+
+Tokens are counted with tiktoken when it is installed and estimated otherwise
+(Example_retriever.count_tokens). Also reports the time to build and to reload the
+index and to select the examples of one question.
+
+Run from the repository root:
+    python -m benchmarks.bench_prompt_size [sizes...]
+"""
+
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+from defs import Example_retriever
+
+SCHEMA_FILE = "data/Pathogen_schemav2.json"
+EXAMPLE_FILE = "data/sparql-examples.json"
+QUESTIONS = [
+    "Provide an extensive list of the pathogens that have been sequenced in China",
+    "Which property IDs and values are attached to each disease?",
+    "Show the locations where pathogens were found",
+]
+
+
+def example_pool(size):
+    """size examples: the curated ones, then the SPARQL/*.rq queries, repeated with a numbered variant."""
+    with open(EXAMPLE_FILE, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    for path in sorted(glob.glob("SPARQL/*.rq")):
+        words = re.sub(r"([a-z])([A-Z])", r"\1 \2", os.path.splitext(os.path.basename(path))[0]).lower()
+        with open(path, 'r', encoding='utf-8') as f:
+            base.append({"question": f"Query the {words} of the pathogen graph",
+                         "query": "#+ endpoint: http://localhost:7007\n" + f.read()})
+    return [dict(example, question=example["question"] + (f" (variant {i // len(base)})" if i >= len(base) else ""))
+            for i, example in enumerate(base[i % len(base)] for i in range(size))]
+
+
+def main() -> int:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2, 8, 50, 200]
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+        template = json.load(f)
+    full_schema = json.dumps(template, indent=2)
+    summary = Example_retriever.schema_summary(template)
+    print(f"Tokens counted with {'tiktoken' if Example_retriever.tiktoken else 'the estimate'}; "
+          f"schema: {Example_retriever.count_tokens(full_schema)} tokens in full, "
+          f"{Example_retriever.count_tokens(summary)} as a summary")
+    print(f"{'examples':>8} {'before':>8} {'after':>8} {'build ms':>9} {'reload ms':>10} {'select ms':>10}")
+
+    with tempfile.TemporaryDirectory(prefix="pdn2rdf-examples-") as tmp:
+        for size in sizes:
+            examples = example_pool(size)
+            example_file = os.path.join(tmp, f"examples-{size}.json")
+            index_file = os.path.join(tmp, f"index-{size}.json")
+            with open(example_file, 'w', encoding='utf-8') as f:
+                json.dump(examples, f)
+
+            start = time.perf_counter()
+            Example_retriever.load_index(example_file, index_file)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            index = Example_retriever.load_index(example_file, index_file)
+            reload = time.perf_counter() - start
+
+            before = Example_retriever.count_tokens(json.dumps(examples, indent=2) + full_schema)
+            after = []
+            start = time.perf_counter()
+            for question in QUESTIONS:
+                after.append(Example_retriever.format_examples(index.search(question)) + summary)
+            select = (time.perf_counter() - start) / len(QUESTIONS)
+            after_tokens = max(Example_retriever.count_tokens(prompt) for prompt in after)
+            print(f"{size:8d} {before:8d} {after_tokens:8d} {build * 1e3:9.2f} {reload * 1e3:10.2f} "
+                  f"{select * 1e3:10.3f}")
+    print(f"Top {Example_retriever.TOP_K} for {QUESTIONS[0]!r}:")
+    for example in index.search(QUESTIONS[0]):
+        print(f"  {example['question']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
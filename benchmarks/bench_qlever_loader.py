@@ -0,0 +1,97 @@
+"""
+Exercises Qlever_loader against a stub SPARQL update endpoint: a first full
+load of the shards of an incremental harvest, then a second harvest after the
+stub ENA changed some runs and dropped others, pushed as SPARQL UPDATE batches.
+Reports the time of each load and checks that the endpoint ends up holding
+exactly what a fresh harvest of the changed data would load.
+
+Run from the repository root:
+    python -m benchmarks.bench_qlever_loader [number_of_taxa] [rows_per_taxon]
+"""
+
+import contextlib
+import glob
+import gzip
+import io
+import os
+import sys
+import tempfile
+
+from rdflib import Dataset
+
+from benchmarks.stub_services import StubServices, StubSparqlUpdate
+from defs import ENA_tax_eq
+from defs import Harvest_checkpoint
+from defs import Incremental_harvest
+from defs import Lookup_cache
+from defs import Qlever_loader
+from defs import Triple_sink
+from etl_ENA_REST import TAXON_LIST
+
+
+def harvest(taxa, shard_dir, append):
+    with contextlib.redirect_stdout(io.StringIO()):
+        with Triple_sink.ShardSink(shard_dir, append=append) as sink:
+            return Incremental_harvest.harvest_taxa(taxa, None, sink=sink)
+
+
+def shard_quads(shard_dir):
+    """Everything in the shards of a directory, as a set of N-Quads lines."""
+    lines = set()
+    for path in glob.glob(os.path.join(shard_dir, "*.nq.gz")):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines.update(f)
+    return lines
+
+
+def main() -> int:
+    taxa = TAXON_LIST[:int(sys.argv[1]) if len(sys.argv) > 1 else 3]
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ENA_tax_eq.TEMPLATE_FILE = os.path.abspath(ENA_tax_eq.TEMPLATE_FILE)
+    Lookup_cache.ENABLED = False
+    os.chdir(tempfile.mkdtemp(prefix="pdn2rdf-bench-"))
+
+    endpoint = StubSparqlUpdate()
+    endpoint.start()
+    updater = Qlever_loader.SparqlUpdater(endpoint.url, batch_triples=5000)
+
+    def stub_index():
+        """Stands in for qlever get-data + index: reload the endpoint from the shards."""
+        endpoint.dataset = type(endpoint.dataset)()
+        with contextlib.redirect_stdout(io.StringIO()):
+            updater.apply("INSERT DATA", shard_quads(Triple_sink.SHARD_DIR), quads=True)
+
+    loader = Qlever_loader.QleverLoader(updater=updater, rebuild_cmds=[stub_index])
+    lat = {"ena": 0, "uniprot": 0, "llm": 0}
+    with StubServices(latency=lat, rows_per_taxon=rows) as services:
+        harvest(taxa, Triple_sink.SHARD_DIR, append=False)
+        first = loader.load()
+
+        # A few runs change, the last 10% are withdrawn
+        fixture = services.ena.fixture
+        fixture.loc[0, "experiment_title"] = "Re-sequenced"
+        fixture.loc[0, "last_updated"] = "2099-01-01"
+        services.ena.rows_per_taxon = rows - rows // 10
+        harvest(taxa, Triple_sink.SHARD_DIR, append=True)
+        second = loader.load()
+        third = loader.load()
+
+        # What a fresh harvest of the current data loads
+        Incremental_harvest.DELTA_DIR = "fresh/deltas"
+        store = Harvest_checkpoint.CheckpointStore("fresh/harvest.sqlite")
+        with contextlib.redirect_stdout(io.StringIO()), Triple_sink.ShardSink("fresh/shards") as sink:
+            fresh = Incremental_harvest.harvest_taxa(taxa, None, sink=sink, store=store)
+    expected = Dataset()
+    expected.parse(data="".join(shard_quads("fresh/shards")), format="nquads")
+
+    for name, load in (("first load", first), ("second load", second), ("third load", third)):
+        print(f"{name:>11}: {load['action']:<8} {load['seconds']:6.2f}s  inserted {load['inserted']:>6}  "
+              f"deleted {load['deleted']:>5}")
+    print(f"Fresh harvest: {sum(s['fetched'] for s in fresh.values())} runs")
+    print(f"Endpoint matches a fresh load: {endpoint.triples() == set(expected.quads())}")
+    endpoint.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Triples and bytes written with and without Template_emitter.SharedTriples: the
+bundled ENA fixtures replicated over a number of taxa, each with its own pathogen
+name, converted to gzipped N-Quads shards (Triple_sink.ShardSink). The distinct
+triples must be the same both ways; only the repeats of the disease, agent class,
+taxon and place triples go. (They are then in the shared named graph rather than
+in the taxa's, so triples are compared without their graph.)
+
+The shard bytes stand in for the index size: building a QLever index needs the
+qlever CLI, so the benchmark does not do it.
+
+Run from the repository root:
+    python -m benchmarks.bench_shared_triples [taxa] [rows_per_taxon] [chunk_rows]
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_parallel_generation import fixture_rows
+from defs import ENA_tax_eq
+from defs import Template_emitter
+from defs import Triple_sink
+
+
+def batches(taxa, rows_per_taxon, chunk_rows):
+    df = fixture_rows(rows_per_taxon)
+    for taxon in range(1, taxa + 1):
+        taxon_df = df.assign(tax_id=str(taxon), run_accession=df["run_accession"] + f"_T{taxon}")
+        name = f"Stub pathogen {taxon}"
+        for start in range(0, rows_per_taxon, chunk_rows):
+            yield taxon, taxon_df.iloc[start:start + chunk_rows], (name, "Virus", ENA_tax_eq.clean_string(name))
+
+
+def run(taxa, rows_per_taxon, chunk_rows, shared):
+    output_dir = tempfile.mkdtemp(prefix="pdn2rdf-shared-")
+    emitter = Template_emitter.get_emitter(ENA_tax_eq.TEMPLATE_FILE)
+    start = time.perf_counter()
+    with Triple_sink.ShardSink(output_dir) as sink:
+        for taxon, df, names in batches(taxa, rows_per_taxon, chunk_rows):
+            sink.write(taxon, df["run_accession"], ENA_tax_eq.convert_frame(df, emitter, *names, shared))
+        if shared is not None:
+            shared.write_to(sink)
+    seconds = time.perf_counter() - start
+    lines = set()
+    for shard in sink.shards:
+        with gzip.open(os.path.join(output_dir, shard["file"]), "rt", encoding="utf-8") as f:
+            lines.update(line.rsplit(" ", 2)[0] for line in f)  # drop the graph and the final "."
+    return {"seconds": seconds, "triples": sum(shard["triples"] for shard in sink.shards),
+            "bytes": sum(shard["bytes"] for shard in sink.shards),
+            "compressed_bytes": sum(shard["compressed_bytes"] for shard in sink.shards), "distinct": lines}
+
+
+def main() -> int:
+    taxa = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rows_per_taxon = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    chunk_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    print(f"Taxa: {taxa}, rows per taxon: {rows_per_taxon}, chunk: {chunk_rows}")
+
+    shared = Template_emitter.SharedTriples()
+    before = run(taxa, rows_per_taxon, chunk_rows, None)
+    after = run(taxa, rows_per_taxon, chunk_rows, shared)
+    for label, result in (("every run", before), ("shared once", after)):
+        print(f"{label:>12}: {result['triples']:9d} triples  {result['bytes'] / 2**20:8.1f} MiB  "
+              f"{result['compressed_bytes'] / 2**20:7.2f} MiB gzipped  {result['seconds']:6.2f}s")
+    print(f"Triples: {after['triples'] / before['triples']:.1%} of before, "
+          f"bytes on disk: {after['compressed_bytes'] / before['compressed_bytes']:.1%}; "
+          f"shared triples written {shared.written}, repeated across batches {shared.cross_batch_repeats}")
+    print(f"Same distinct triples: {before['distinct'] == after['distinct']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
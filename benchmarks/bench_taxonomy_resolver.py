@@ -0,0 +1,51 @@
+"""
+Requests and latency needed to resolve the names and lineages of TAXON_LIST:
+one UniProt GET per taxon ID versus Taxonomy_resolver's batched id:(...) searches.
+
+Run from the repository root (stub UniProt by default, --live for rest.uniprot.org):
+    python -m benchmarks.bench_taxonomy_resolver [--live]
+"""
+
+import contextlib
+import statistics
+import sys
+import time
+
+from benchmarks.stub_services import StubServices
+from defs import Http
+from defs import Lookup_cache
+from defs import Taxonomy_resolver
+from defs import Tool_Pathogen_Name_from_Taxon_ID
+from etl_ENA_REST import TAXON_LIST
+
+latencies = []
+
+
+def _count(response, *args, **kwargs):
+    latencies.append(response.elapsed.total_seconds())
+
+
+def measure(label, resolve):
+    latencies.clear()
+    start = time.perf_counter()
+    resolve()
+    seconds = time.perf_counter() - start
+    p50 = statistics.median(latencies) * 1000 if latencies else 0.0
+    print(f"{label:<10} {len(latencies):>5} requests  {seconds:7.2f}s total  {p50:7.1f}ms p50 per request")
+
+
+def main() -> int:
+    Lookup_cache.ENABLED = False  # count what reaches UniProt
+    Http.session().hooks["response"].append(_count)
+    taxa = list(dict.fromkeys(TAXON_LIST))
+
+    services = contextlib.nullcontext() if "--live" in sys.argv else StubServices(latency={"uniprot": 0.1})
+    with services:
+        measure("per-ID", lambda: [Tool_Pathogen_Name_from_Taxon_ID.get_taxon_entry(t) for t in taxa])
+        measure("bulk", lambda: Taxonomy_resolver.resolve_taxa(taxa))
+        print(f"Resolved {len(Taxonomy_resolver.taxa)}/{len(taxa)} taxa in bulk")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
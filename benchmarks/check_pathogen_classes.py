@@ -0,0 +1,96 @@
+"""
+Checks the validation and retry path of Tool_Pathogen_Class.get_pathogen_classes
+against the stub OpenAI-compatible LLM (benchmarks/stub_services.py): the stub
+answers some names with a class outside the six, skips others, and sends one
+reply that is not JSON at all, and the check asserts that each retry asks for
+exactly the names still without a valid answer, that valid answers are kept and
+cached, and that a name never validly answered is left out after
+MAX_BATCH_ATTEMPTS completions. Exits with 1 if any check fails.
+
+Run from the repository root:
+    python -m benchmarks.check_pathogen_classes
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.stub_services import StubServices
+from defs import Lookup_cache
+from defs import Tool_Pathogen_Class
+
+VALID = {"Monkeypox virus": "Virus", "Escherichia coli": "Bacteria", "Candida auris": "Fungus",
+         "Plasmodium falciparum": "Protozoa", "Schistosoma mansoni": "Helminth", "Scrapie agent": "Prion"}
+INVALID_ONCE = "Escherichia coli"       # answered "Bacterium" first
+SKIPPED_ONCE = "Candida auris"          # left out of the first answer
+NOT_JSON_ONCE = "Schistosoma mansoni"   # its batch's first reply is not JSON
+NEVER_VALID = "Unknown agent"           # always answered "Virion"
+NAMES = list(VALID) + [NEVER_VALID]
+
+
+class ScriptedLLM:
+    """Structured answers of the stub LLM, recording the names asked for in each request."""
+
+    def __init__(self):
+        self.requests = []
+        self.seen = set()
+
+    def __call__(self, messages):
+        names = [pathogen["name"] for pathogen in json.loads(messages[-1]["content"])]
+        first = {name for name in names if name not in self.seen}
+        self.seen.update(names)
+        self.requests.append(names)
+        if NOT_JSON_ONCE in first:
+            return "Sorry, I cannot help with that."
+        classes = []
+        for name in names:
+            if name == NEVER_VALID:
+                classes.append({"name": name, "class": "Virion"})
+            elif name == INVALID_ONCE and name in first:
+                classes.append({"name": name, "class": "Bacterium"})
+            elif name == SKIPPED_ONCE and name in first:
+                continue
+            else:
+                classes.append({"name": name, "class": VALID[name]})
+        return json.dumps({"classes": classes})
+
+
+def check(label, condition):
+    print(f"{'ok  ' if condition else 'FAIL'} {label}")
+    return condition
+
+
+def main() -> int:
+    Lookup_cache.CACHE_FILE = os.path.join(tempfile.mkdtemp(prefix="pdn2rdf-cache-"), "lookups.sqlite")
+    Tool_Pathogen_Class.BATCH_SIZE = 3  # the retries regroup names from different batches
+    llm = ScriptedLLM()
+
+    with StubServices(latency={"uniprot": 0.0, "llm": 0.0}) as services:
+        services.llm.answer = llm
+        results = Tool_Pathogen_Class.get_pathogen_classes(NAMES + [None, "", "Monkeypox virus"])
+        first_requests = len(llm.requests)
+        cached = Tool_Pathogen_Class.get_pathogen_classes(NAMES)
+
+    attempts = Tool_Pathogen_Class.MAX_BATCH_ATTEMPTS
+    # Round 1: every distinct name once; round 2: the six without a valid answer, in two
+    # batches (the not-JSON reply fails its whole batch); then the one never validly answered
+    first_round, second_round, later = llm.requests[:3], llm.requests[3:5], llm.requests[5:first_requests]
+    failed_first = [INVALID_ONCE, SKIPPED_ONCE, "Plasmodium falciparum", NOT_JSON_ONCE, "Scrapie agent", NEVER_VALID]
+    ok = all([
+        check("first round asks for every distinct name once, BATCH_SIZE per request",
+              first_round == [NAMES[0:3], NAMES[3:6], NAMES[6:7]]),
+        check("second round asks for exactly the names without a valid answer",
+              second_round == [failed_first[0:3], failed_first[3:6]]),
+        check("later rounds ask only for the name never validly answered",
+              later == [[NEVER_VALID]] * (attempts - 2)),
+        check("every valid answer is returned, the invalid one left out", results == VALID),
+        check("a second call asks only for the uncached name, MAX_BATCH_ATTEMPTS times",
+              cached == VALID and llm.requests[first_requests:] == [[NEVER_VALID]] * attempts),
+    ])
+    print(f"{len(llm.requests)} completions: {llm.requests}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
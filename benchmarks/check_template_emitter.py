@@ -0,0 +1,128 @@
+"""
+Checks that Template_emitter writes the same graphs as the reference pyld/rdflib
+path (ENA_tax_eq.jsonld_row_to_ntriples): every row of data/input/*.tsv, and rows
+with nulls, null-like strings, relative and absolute place IRIs and characters
+that need escaping, through emit (row by row) and emit_frame (whole batch, with
+and without the shared triples split off). Blank nodes of both sides are turned
+back into blank nodes (de-skolemized) before the graphs are compared.
+Exits with 1 if any of them differs.
+
+Run from the repository root:
+    python -m benchmarks.check_template_emitter
+"""
+
+import glob
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+from rdflib import BNode, Graph, URIRef
+from rdflib.compare import graph_diff, isomorphic, to_isomorphic
+
+from defs import ENA_dump_ingest
+from defs import ENA_tax_eq
+from defs import Template_emitter
+
+INPUT_FILES = "data/input/*.tsv"
+COLUMNS = ["run_accession", "experiment_title", "tax_id", "country", "description"]
+
+EDGE_ROWS = [
+    # Nulls and null-like strings in every column
+    {"run_accession": "EDGE1", "experiment_title": None, "tax_id": None, "country": None, "description": None},
+    {"run_accession": "EDGE2", "experiment_title": "null", "tax_id": "NaN", "country": "NONE", "description": "  "},
+    {"run_accession": "EDGE3", "experiment_title": "", "tax_id": np.nan, "country": "none", "description": ""},
+    {"run_accession": None, "experiment_title": "No accession", "tax_id": "10244", "country": "Japan",
+     "description": "null"},
+    # Characters that need escaping in literals
+    {"run_accession": "EDGE4", "experiment_title": 'Title with "quotes" and a \\ backslash',
+     "tax_id": "10244", "country": "Côte d'Ivoire", "description": "Line one\nline two\r\n\ttabbed"},
+    {"run_accession": "EDGE5", "experiment_title": "Ünïcödé ☣ ßample", "tax_id": "11320",
+     "country": "USA: Georgia, Atlanta", "description": 'ends with a backslash \\'},
+    # A place that is an absolute IRI is kept as one, a relative one is dropped
+    {"run_accession": "EDGE6", "experiment_title": "IRI place", "tax_id": "12110",
+     "country": "http://example.org/place/1", "description": "absolute place IRI"},
+    {"run_accession": "EDGE7", "experiment_title": "Numeric", "tax_id": 10376, "country": "Brazil",
+     "description": 3.5},
+]
+
+EDGE_NAMES = [
+    ("Monkeypox virus", "Virus", "monkeypoxvirus"),
+    (None, None, ""),
+    ("NONE", "null", "none"),
+    ('Virus "quoted" \\ name', "Virus", ENA_tax_eq.clean_string('Virus "quoted" \\ name')),
+]
+
+
+def _deskolemized(ntriples):
+    """Graph of an N-Triples document with the skolem IRIs of either side as blank nodes."""
+    graph = Graph()
+    graph.parse(data=ntriples, format="nt")
+    bnodes = {}
+
+    def term(t):
+        if isinstance(t, URIRef) and (str(t).startswith(Template_emitter.SKOLEM_BASE) or "/.well-known/genid/" in str(t)):
+            return bnodes.setdefault(t, BNode())
+        return t
+
+    result = Graph()
+    for s, p, o in graph:
+        result.add((term(s), p, term(o)))
+    return result
+
+
+def compare(label, expected, actual):
+    expected_graph, actual_graph = _deskolemized(expected), _deskolemized(actual)
+    if isomorphic(expected_graph, actual_graph):
+        return True
+    _, only_expected, only_actual = graph_diff(to_isomorphic(expected_graph), to_isomorphic(actual_graph))
+    print(f"MISMATCH {label}")
+    for s, p, o in sorted(only_expected):
+        print(f"  only in reference: {s} {p} {o}")
+    for s, p, o in sorted(only_actual):
+        print(f"  only in emitter:   {s} {p} {o}")
+    return False
+
+
+def check_batch(label, df, names, template, emitter):
+    """Compares one batch through the reference, emit and emit_frame; returns the rows that differ."""
+    failures = 0
+    reference = [ENA_tax_eq.jsonld_row_to_ntriples(template, row, *names) for _, row in df.iterrows()]
+    rows = [emitter.emit(ENA_tax_eq.row_slot_values(row, *names)) for _, row in df.iterrows()]
+    frame = ENA_tax_eq.convert_frame(df, emitter, *names).tolist()
+    for i, accession in enumerate(df["run_accession"]):
+        failures += not compare(f"{label} {accession} emit", reference[i], rows[i])
+        failures += not compare(f"{label} {accession} emit_frame", reference[i], frame[i])
+    # The run documents and the shared triples split off together hold the same triples
+    shared = Template_emitter.SharedTriples()
+    split = ENA_tax_eq.convert_frame(df, emitter, *names, shared)
+    if set("".join(split).splitlines()) | {line.rstrip("\n") for line in shared.seen} != set("".join(frame).splitlines()):
+        print(f"MISMATCH {label} emit_frame with SharedTriples")
+        failures += 1
+    return failures
+
+
+def main() -> int:
+    with open(ENA_tax_eq.TEMPLATE_FILE, encoding="utf-8") as f:
+        template = json.load(f)
+    emitter = Template_emitter.TemplateEmitter(template)
+    checked = failures = 0
+
+    for path in sorted(glob.glob(INPUT_FILES)):
+        dump = pd.read_csv(path, sep="\t", dtype=str)
+        for taxon, df in dump.groupby("tax_id", sort=False, dropna=False):
+            names = ENA_dump_ingest.dump_taxon_names(df, taxon)
+            failures += check_batch(f"{path} taxon {taxon}", df[COLUMNS], names, template, emitter)
+            checked += len(df)
+
+    edge = pd.DataFrame(EDGE_ROWS, columns=COLUMNS)
+    for names in EDGE_NAMES:
+        failures += check_batch(f"edge rows, names {names}", edge, names, template, emitter)
+        checked += len(edge)
+
+    print(f"{checked} rows checked, {failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
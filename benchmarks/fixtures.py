@@ -0,0 +1,373 @@
+"""
+Recorded responses of ENA, UniProt, EBI Search, the LLM and QLever for offline
+benchmarks, and stub services that replay them at any scale.
+
+The fixture file (FIXTURE_FILE) holds, per taxon, its ENA runs, its UniProt name
+and lineage, and the LLM class of its name, plus EBI Search entries per category
+and chat answers with the results of their queries. It is seeded from the ENA
+exports in data/input/*.tsv and data/sparql-examples.json, so it can be rebuilt
+without network access, or recorded from the live services:
+
+    python -m benchmarks.fixtures seed [output]
+    python -m benchmarks.fixtures record [output] [runs_per_taxon]
+
+Replay scales it synthetically: taxa beyond the recorded ones get IDs from
+SYNTHETIC_TAXON_BASE and the entries of a recorded taxon under a new name, runs
+and EBI Search entries are repeated with new accessions up to the requested
+count, and each service answers after its recorded latency times latency_scale
+(0 by default, so that timings measure the pipeline only).
+"""
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import urllib.parse
+
+import pandas as pd
+
+from benchmarks.stub_services import (DEFAULT_LATENCY, StubEBISearch, StubLLM, StubService, StubServices,
+                                      StubSparqlQuery, StubUniProt)
+from defs import EBI_search
+from defs import ENA_tax_eq
+from defs import Lineage_classifier
+from defs import Tool_Pathogen_Class
+
+FIXTURE_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "pipeline.json")
+SEED_TSVS = os.path.join(os.path.dirname(__file__), "..", "data", "input", "*.tsv")
+SEED_EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "data", "sparql-examples.json")
+SYNTHETIC_TAXON_BASE = 900000000
+
+# ENA export column holding the accession each EBI Search category returns
+CATEGORY_COLUMNS = {"sra-run": "run_accession", "sra-experiment": "experiment_accession",
+                    "sra-sample": "sample_accession", "sra-study": "study_accession", "project": "study_accession",
+                    "taxonomy": "tax_id"}
+SUMMARY = "The query returned the pathogens listed above; most of them are viruses sequenced from human samples."
+ENDPOINT_COMMENT = re.compile(r"#\+ endpoint: \S+")
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _lineage(tax_lineage, taxon):
+    """UniProt-style lineage (closest ancestor first, without the taxon and the root) of an ENA tax_lineage."""
+    ids = [int(i) for i in str(tax_lineage).split(";") if i.strip().isdigit()]
+    names = {10239: "Viruses", 2: "Bacteria", 2759: "Eukaryota", 4751: "Fungi"}
+    return [{"taxonId": i, "scientificName": names.get(i, ""), "rank": ""} for i in reversed(ids)
+            if i not in (1, int(taxon))]
+
+
+def seed_fixtures(tsv_pattern=SEED_TSVS, examples_file=SEED_EXAMPLES):
+    """Fixtures built from ENA exports and the SPARQL examples, without network access."""
+    frames = [pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False) for path in sorted(glob.glob(tsv_pattern))]
+    dump = pd.concat(frames, ignore_index=True).drop_duplicates("run_accession")
+    fields = ENA_tax_eq.ENA_FIELDS.split(",")
+
+    taxa, classes = {}, {}
+    for taxon, df in dump.groupby("tax_id", sort=True):
+        name = df["scientific_name"].iat[0]
+        lineage = _lineage(df["tax_lineage"].iat[0], taxon)
+        taxa[taxon] = {"scientificName": name, "lineage": lineage, "runs": df[fields].values.tolist()}
+        agent_class = Lineage_classifier.classify_lineage(taxon, lineage) or "Virus"
+        classes[name] = {"class": agent_class, "tool_call": True, "prompt_tokens": 120, "completion_tokens": 2}
+
+    ebisearch = {}
+    for category in EBI_search.CATEGORIES:
+        column = CATEGORY_COLUMNS.get(category)
+        if column is None:
+            ebisearch[category] = []
+            continue
+        entries = dump.drop_duplicates(column)
+        ebisearch[category] = [[acc, description, title] for acc, description, title in
+                               zip(entries[column], entries["description"], entries["experiment_title"])]
+
+    with open(examples_file, encoding='utf-8') as f:
+        examples = json.load(f)
+    chat = [{"question": example["question"],
+             "answer": f"Here is the query:\n\n```sparql\n{example['query'].strip()}\n```\n"} for example in examples]
+    bindings = [{"name": {"type": "literal", "value": name}} for name in sorted(dump["scientific_name"].unique())]
+
+    return {"source": "seeded from " + ", ".join(os.path.basename(p) for p in sorted(glob.glob(tsv_pattern))),
+            "created": datetime.date.today().isoformat(), "latency": {**DEFAULT_LATENCY, "sparql": 0.2},
+            "ena_fields": fields, "taxa": taxa, "classes": classes, "ebisearch": ebisearch,
+            "chat": chat, "summary": SUMMARY, "bindings": bindings}
+
+
+def record_fixtures(base, runs_per_taxon=100, queries=("MPox",)):
+    """
+    Fixtures fetched from the live services for the taxa and categories of base
+    (seed_fixtures()), keeping its chat answers and query results.
+    """
+    from defs import Lookup_cache
+    from defs import Tool_Pathogen_Name_from_Taxon_ID
+
+    Lookup_cache.ENABLED = False
+    latency = {}
+
+    def timed(service, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        latency.setdefault(service, []).append(time.perf_counter() - start)
+        return result
+
+    fields = ENA_tax_eq.ENA_FIELDS.split(",")
+    taxa, classes = {}, {}
+    for taxon in base["taxa"]:
+        df = timed("ena", ENA_tax_eq.fetch_taxon_frame, int(taxon), runs_per_taxon)
+        entry = timed("uniprot", Tool_Pathogen_Name_from_Taxon_ID.get_taxon_entry, int(taxon))
+        taxa[taxon] = {"scientificName": entry["scientificName"], "lineage": entry["lineage"],
+                       "runs": df.reindex(columns=fields).fillna("").astype(str).values.tolist()}
+        agent_class = timed("llm", Tool_Pathogen_Class.get_pathogen_class, entry["scientificName"])
+        classes[entry["scientificName"]] = {"class": agent_class, "tool_call": True, "prompt_tokens": 120,
+                                            "completion_tokens": 2}
+
+    ebisearch = {}
+    for category in base["ebisearch"]:
+        entries = []
+        for query in queries:
+            _, rows = timed("ebisearch", EBI_search.fetch_page, category, query)
+            entries.extend(row[1:] for row in rows)
+        ebisearch[category] = entries
+
+    recorded = {service: round(sum(seconds) / len(seconds), 3) for service, seconds in latency.items()}
+    return {**base, "source": "recorded from the live services", "created": datetime.date.today().isoformat(),
+            "latency": {**base["latency"], **recorded}, "taxa": taxa, "classes": classes, "ebisearch": ebisearch}
+
+
+def save_fixtures(fixtures, path=FIXTURE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+
+
+def load_fixtures(path=FIXTURE_FILE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fixture_hash(path=FIXTURE_FILE):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def taxon_ids(fixtures, count):
+    """The recorded taxa, then synthetic ones, count in all."""
+    recorded = [int(taxon) for taxon in fixtures["taxa"]]
+    return recorded[:count] + [SYNTHETIC_TAXON_BASE + i for i in range(max(0, count - len(recorded)))]
+
+
+def replayed_taxon(fixtures, taxon):
+    """Name, lineage and runs of a taxon: recorded, or those of a recorded taxon under a synthetic name."""
+    taxon = str(taxon)
+    if taxon in fixtures["taxa"]:
+        return fixtures["taxa"][taxon]
+    recorded = list(fixtures["taxa"].values())
+    source = recorded[int(taxon) % len(recorded)]
+    return {**source, "scientificName": f"{source['scientificName']} {taxon}"}
+
+
+def replayed_class(fixtures, name):
+    """Recorded class of a pathogen name, synthetic names answered as the taxon they copy."""
+    if name in fixtures["classes"]:
+        return fixtures["classes"][name]
+    base = name.rsplit(" ", 1)[0]
+    return fixtures["classes"].get(base, {"class": "Virus", "tool_call": False, "prompt_tokens": 120,
+                                          "completion_tokens": 2})
+
+
+def scaled(rows, count, accession_column=0):
+    """count rows cycled from rows; repeats get the accession suffixed with the cycle."""
+    result = []
+    for i in range(count):
+        row = list(rows[i % len(rows)])
+        if i >= len(rows):
+            row[accession_column] = f"{row[accession_column]}x{i // len(rows)}"
+        result.append(row)
+    return result
+
+
+class ReplayENA(StubService):
+    """ENA portal search answering tax_eq(...) queries with the recorded runs of the taxon, rows_per_taxon of them."""
+
+    def __init__(self, latency, fixtures, rows_per_taxon):
+        super().__init__(latency)
+        self.fixtures = fixtures
+        self.rows_per_taxon = rows_per_taxon
+
+    def respond(self, url, body):
+        form = urllib.parse.parse_qs(body or url.query)
+        taxon, since = re.fullmatch(r"tax_eq\((\w+)\)(?: AND last_updated>=([\d-]+))?", form["query"][0]).groups()
+        fields = form.get("fields", [ENA_tax_eq.ENA_FIELDS])[0].split(",")
+        offset = int(form.get("offset", ["0"])[0])
+        limit = int(form.get("limit", ["0"])[0]) or self.rows_per_taxon
+        recorded = self.fixtures["ena_fields"]
+        rows = scaled(replayed_taxon(self.fixtures, taxon)["runs"], self.rows_per_taxon,
+                      recorded.index("run_accession"))
+        if since:
+            rows = [row for row in rows if row[recorded.index("last_updated")] >= since]
+        rows = rows[offset:offset + limit]
+        if not rows:
+            return "text/plain", b""
+        df = pd.DataFrame(rows, columns=recorded)
+        df["tax_id"] = taxon
+        return "text/plain", df.reindex(columns=fields).to_csv(sep="\t", index=False).encode()
+
+
+class ReplayUniProt(StubUniProt):
+    """UniProt taxonomy entries and name searches with the recorded names and lineages."""
+
+    def __init__(self, latency, fixtures):
+        super().__init__(latency)
+        self.fixtures = fixtures
+        self.by_name = {}
+
+    def _entry(self, taxon):
+        recorded = replayed_taxon(self.fixtures, taxon)
+        self.by_name[recorded["scientificName"]] = recorded
+        return {"taxonId": int(taxon), "scientificName": recorded["scientificName"], "lineage": recorded["lineage"]}
+
+    def respond(self, url, body):
+        query = urllib.parse.parse_qs(url.query).get("query", [""])[0]
+        if url.path.endswith("/search") and not query.startswith("id:("):
+            recorded = self.by_name.get(query) or next(
+                (entry for entry in self.fixtures["taxa"].values() if entry["scientificName"] == query), None)
+            lineage = recorded["lineage"] if recorded else self.LINEAGE
+            payload = {"results": [{"scientificName": query, "lineage": lineage}]}
+            return "application/json", json.dumps(payload).encode()
+        return super().respond(url, body)
+
+
+class ReplayLLM(StubLLM):
+    """
+    The recorded pathogen classes: a tool call to get_InfectiousAgentClass first when
+    it was recorded, then the class; batched structured-output requests get the
+    class of each name.
+    """
+
+    def __init__(self, latency, fixtures):
+        super().__init__(latency)
+        self.fixtures = fixtures
+
+    def _completion(self, message, usage):
+        payload = {"id": "replay", "object": "chat.completion", "created": 0, "model": "gpt-4.1",
+                   "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", **message}}],
+                   "usage": {**usage, "total_tokens": sum(usage.values())}}
+        return "application/json", json.dumps(payload).encode()
+
+    def respond(self, url, body):
+        request = json.loads(body or "{}")
+        messages = request["messages"]
+        if "response_format" in request:
+            pathogens = json.loads(messages[-1]["content"])
+            content = json.dumps({"classes": [{"name": p["name"], "class": replayed_class(self.fixtures, p["name"])["class"]}
+                                              for p in pathogens]})
+            return self._completion({"content": content}, {"prompt_tokens": _tokens(body),
+                                                           "completion_tokens": _tokens(content)})
+
+        name = next(m["content"] for m in messages if m["role"] == "user")
+        recorded = replayed_class(self.fixtures, name)
+        usage = {"prompt_tokens": recorded["prompt_tokens"], "completion_tokens": recorded["completion_tokens"]}
+        if request.get("tools") and recorded["tool_call"] and messages[-1]["role"] != "tool":
+            call = {"id": "call_replay", "type": "function",
+                    "function": {"name": "get_InfectiousAgentClass", "arguments": json.dumps({"pathogen_name": name})}}
+            return self._completion({"content": None, "tool_calls": [call]}, usage)
+        return self._completion({"content": recorded["class"]}, usage)
+
+
+class ReplayChatLLM(StubLLM):
+    """
+    Streams the recorded chat answer of a question, with its query pointed at
+    sparql_url, and the recorded summary for the follow-up requests.
+    """
+
+    def __init__(self, latency, fixtures, sparql_url, token_delay=0.0):
+        super().__init__(latency, token_delay=token_delay)
+        answers = {entry["question"]: entry["answer"] for entry in fixtures["chat"]}
+        summary = fixtures["summary"]
+
+        def answer(messages):
+            request = messages[-1]["content"] if messages[-1]["role"] == "user" else messages[1]["content"]
+            if messages[0]["role"] == "user" and "summarize" in messages[0]["content"]:
+                return summary
+            if messages[0]["role"] == "user" and "fix the query" in messages[0]["content"]:
+                request = next(iter(answers))
+            recorded = answers.get(request, next(iter(answers.values())))
+            return ENDPOINT_COMMENT.sub(f"#+ endpoint: {sparql_url}", recorded)
+
+        self.answer = answer
+
+
+class ReplayEBISearch(StubEBISearch):
+    """EBI Search answering every query with the recorded entries of the category, hits_per_category of them."""
+
+    def __init__(self, latency, fixtures, hits_per_category=None):
+        super().__init__(latency)
+        self.fixtures = fixtures
+        self.hits_per_category = hits_per_category
+
+    def respond(self, url, body):
+        params = urllib.parse.parse_qs(url.query)
+        category = url.path.rsplit("/", 1)[-1]
+        recorded = self.fixtures["ebisearch"].get(category, [])
+        count = len(recorded) if self.hits_per_category is None or not recorded else self.hits_per_category
+        start = int(params.get("start", ["0"])[0])
+        size = int(params.get("size", ["15"])[0])
+        fields = params["fields"][0].split(",")
+        entries = []
+        for acc, description, name in scaled(recorded, min(count, start + size))[start:]:
+            values = {"acc": [acc], "description": [description], "name": [name]}
+            entries.append({"id": acc, "source": category,
+                            "fields": {field: values.get(field, []) for field in fields}})
+        payload = {"hitCount": count, "entries": entries, "facets": []}
+        return "application/json", json.dumps(payload).encode()
+
+
+class ReplayServices(StubServices):
+    """
+    Replays a fixture file through the ENA, EBI Search, UniProt and LLM stubs, plus
+    a chat LLM (chat_llm) and a SPARQL endpoint (sparql) for the chat loop, and
+    points the pipeline modules at them for the duration of a with-block.
+    """
+
+    def __init__(self, fixtures, rows_per_taxon=100, hits_per_category=None, latency_scale=0.0, host_limits=None,
+                 token_delay=0.0):
+        self.fixtures = fixtures
+        latency = {service: seconds * latency_scale for service, seconds in fixtures["latency"].items()}
+        self.ena = ReplayENA(latency["ena"], fixtures, rows_per_taxon)
+        self.ebisearch = ReplayEBISearch(latency["ebisearch"], fixtures, hits_per_category)
+        self.uniprot = ReplayUniProt(latency["uniprot"], fixtures)
+        self.llm = ReplayLLM(latency["llm"], fixtures)
+        self.sparql = StubSparqlQuery(latency["sparql"], fixtures["bindings"])
+        self.chat_llm = ReplayChatLLM(latency["llm"], fixtures, self.sparql.url + "/sparql", token_delay)
+        self.host_limits = {"ena": 4, "ebisearch": 4, "uniprot": 4, "llm": 2, **(host_limits or {})}
+        self._saved = []
+
+    def _services(self):
+        return self.ena, self.ebisearch, self.uniprot, self.llm, self.sparql, self.chat_llm
+
+
+def main() -> int:
+    command = sys.argv[1] if len(sys.argv) > 1 else "seed"
+    path = sys.argv[2] if len(sys.argv) > 2 else FIXTURE_FILE
+    fixtures = seed_fixtures()
+    if command == "record":
+        fixtures = record_fixtures(fixtures, int(sys.argv[3]) if len(sys.argv) > 3 else 100)
+    elif command != "seed":
+        print(f"Unknown command: {command} (seed or record)")
+        return 1
+    save_fixtures(fixtures, path)
+    runs = sum(len(taxon["runs"]) for taxon in fixtures["taxa"].values())
+    print(f"{path}: {len(fixtures['taxa'])} taxa, {runs} runs, "
+          f"{sum(map(len, fixtures['ebisearch'].values()))} EBI Search entries, {len(fixtures['chat'])} chat answers "
+          f"({fixtures['source']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Local stand-ins for the remote services the pipeline calls: the ENA portal search,
+EBI Search, the UniProt taxonomy REST API and the OpenAI-compatible LLM endpoint. Each runs on
+its own port with a configurable latency, so benchmarks measure the pipeline and
+not ebi.ac.uk/uniprot.org/ANL variance.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pandas as pd
+
+from defs import EBI_search
+from defs import ENA_tax_eq
+from defs import Http
+from defs import Taxonomy_resolver
+from defs import Tool_Pathogen_Class
+from defs import Tool_Pathogen_Name_from_Taxon_ID
+
+FIXTURE_TSV = os.path.join(os.path.dirname(__file__), "..", "data", "input", "japan.tsv")
+
+# Seconds per request, roughly what the real services answer in
+DEFAULT_LATENCY = {"ena": 0.3, "ebisearch": 0.3, "uniprot": 0.1, "llm": 0.8}
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms to replies
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self._answer(urllib.parse.urlsplit(self.path), None)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            self._answer(urllib.parse.urlsplit(self.path), body)
+
+        def _answer(self, url, body):
+            time.sleep(service.latency)
+            service.requests += 1
+            content_type, payload, *headers = service.respond(url, body)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            for name, value in (headers[0] if headers else {}).items():
+                self.send_header(name, value)
+            if isinstance(payload, bytes):
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            # An iterator of chunks is streamed as it is produced
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in payload:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client closed the stream early
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # a burst of concurrent clients must not overflow the listen backlog
+
+
+class StubService:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.server = _Server(("127.0.0.1", 0), _handler(self))
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubENA(StubService):
+    """
+    ENA portal search answering tax_eq(...), optionally AND last_updated>=..., with
+    rows cycled from a fixture TSV.
+    """
+
+    def __init__(self, latency, rows_per_taxon, fixture_tsv=FIXTURE_TSV):
+        super().__init__(latency)
+        self.rows_per_taxon = rows_per_taxon
+        fields = ENA_tax_eq.ENA_FIELDS.split(",")
+        self.fixture = pd.read_csv(fixture_tsv, sep="\t", dtype=str, usecols=fields)[fields]
+
+    def respond(self, url, body):
+        form = urllib.parse.parse_qs(body or url.query)
+        query = re.fullmatch(r"tax_eq\((\w+)\)(?: AND last_updated>=([\d-]+))?", form["query"][0])
+        taxon, since = query.groups()
+        fields = form.get("fields", [ENA_tax_eq.ENA_FIELDS])[0].split(",")
+        offset = int(form.get("offset", ["0"])[0])
+        limit = int(form.get("limit", ["0"])[0]) or self.rows_per_taxon
+        positions = range(self.rows_per_taxon)
+        if since:
+            dates = self.fixture["last_updated"]
+            positions = [i for i in positions if dates.iat[i % len(self.fixture)] >= since]
+        positions = positions[offset:offset + limit]
+        if not positions:
+            return "text/plain", b""
+        rows = self.fixture.iloc[[i % len(self.fixture) for i in positions]].copy()
+        rows["run_accession"] = [f"T{taxon}R{i}" for i in positions]
+        rows["tax_id"] = taxon
+        return "text/plain", rows[fields].to_csv(sep="\t", index=False).encode()
+
+
+class StubEBISearch(StubService):
+    """
+    EBI Search domains answering any query with hits_per_category entries, paged with
+    start/size. Accessions depend on the category and the position only, so the same
+    accessions come back for every query.
+    """
+
+    PREFIXES = {"sra-run": "SRR", "sra-experiment": "SRX", "sra-sample": "SAMN", "sra-study": "SRP",
+                "project": "PRJNA", "taxonomy": ""}
+
+    def __init__(self, latency, hits_per_category=250):
+        super().__init__(latency)
+        self.hits_per_category = hits_per_category
+
+    def respond(self, url, body):
+        params = urllib.parse.parse_qs(url.query)
+        category = url.path.rsplit("/", 1)[-1]
+        query = params["query"][0]
+        start = int(params.get("start", ["0"])[0])
+        size = int(params.get("size", ["15"])[0])
+        prefix = self.PREFIXES.get(category, category.upper().replace("-", "_") + "_")
+        entries = []
+        for i in range(start, min(start + size, self.hits_per_category)):
+            values = {"acc": [f"{prefix}{1000 + i}"], "name": [f"{query} {category} {i}"],
+                      "description": [f"Stub {category} entry {i}"]}
+            entries.append({"id": f"{prefix}{1000 + i}", "source": category,
+                            "fields": {field: values.get(field, []) for field in params["fields"][0].split(",")}})
+        payload = {"hitCount": self.hits_per_category, "entries": entries, "facets": []}
+        return "application/json", json.dumps(payload).encode()
+
+
+class StubUniProt(StubService):
+    """
+    UniProt taxonomy entries and searches with a fixed viral lineage. Searches for
+    ``id:(a OR b ...)`` return one result per ID, paged with a Link header.
+    """
+
+    LINEAGE = [{"scientificName": "Viruses", "rank": "superkingdom", "taxonId": 10239}]
+
+    def _entry(self, taxon):
+        return {"taxonId": int(taxon), "scientificName": f"Stub pathogen {taxon}", "lineage": self.LINEAGE}
+
+    def respond(self, url, body):
+        params = urllib.parse.parse_qs(url.query)
+        if not url.path.endswith("/search"):
+            taxon = url.path.rsplit("/", 1)[-1]
+            return "application/json", json.dumps(self._entry(taxon)).encode()
+
+        query = params.get("query", [""])[0]
+        if not query.startswith("id:("):
+            payload = {"results": [{"scientificName": query, "lineage": self.LINEAGE}]}
+            return "application/json", json.dumps(payload).encode()
+
+        ids = query.removeprefix("id:(").removesuffix(")").split(" OR ")
+        size = int(params.get("size", ["25"])[0])
+        cursor = int(params.get("cursor", ["0"])[0])
+        payload = {"results": [self._entry(taxon) for taxon in ids[cursor:cursor + size]]}
+        headers = {}
+        if cursor + size < len(ids):
+            next_query = urllib.parse.urlencode({**{k: v[0] for k, v in params.items()}, "cursor": cursor + size})
+            headers["Link"] = f'<{self.url}{url.path}?{next_query}>; rel="next"'
+        return "application/json", json.dumps(payload).encode(), headers
+
+
+class StubLLM(StubService):
+    """
+    OpenAI-compatible chat completions that always answer with one class name, or,
+    for structured-output requests listing pathogens as JSON, with that class for
+    every pathogen. Streaming requests get the answer in server-sent events of a few
+    characters each, token_delay seconds apart, after the latency (the time to
+    first token). answer may be a function of the request's messages returning the
+    message content, for structured-output requests the JSON answer itself.
+    """
+
+    def __init__(self, latency, answer="Virus", token_delay=0.0, token_chars=4):
+        super().__init__(latency)
+        self.answer = answer
+        self.token_delay = token_delay
+        self.token_chars = token_chars
+        self.url = self.url + "/v1"
+
+    def _stream(self, content):
+        for start in range(0, len(content), self.token_chars):
+            if start:
+                time.sleep(self.token_delay)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4.1",
+                     "choices": [{"index": 0, "finish_reason": None,
+                                  "delta": {"content": content[start:start + self.token_chars]}}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    def respond(self, url, body):
+        request = json.loads(body or "{}")
+        content = self.answer(request["messages"]) if callable(self.answer) else self.answer
+        if "response_format" in request and not callable(self.answer):
+            pathogens = json.loads(request["messages"][-1]["content"])
+            content = json.dumps({"classes": [{"name": p["name"], "class": self.answer} for p in pathogens]})
+        if request.get("stream"):
+            return "text/event-stream", self._stream(content)
+        payload = {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "gpt-4.1",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 1, "total_tokens": 1},
+        }
+        return "application/json", json.dumps(payload).encode()
+
+
+class StubSparqlUpdate(StubService):
+    """
+    SPARQL endpoint applying application/sparql-update requests (INSERT DATA /
+    DELETE DATA) to an in-memory rdflib Dataset, standing in for a QLever server.
+    """
+
+    def __init__(self, latency=0.0):
+        from rdflib import Dataset
+
+        super().__init__(latency)
+        self.dataset = Dataset()
+        self.lock = threading.Lock()
+
+    def respond(self, url, body):
+        with self.lock:
+            self.dataset.update(body)
+        return "application/json", b'{"status": "ok"}'
+
+    def triples(self):
+        """(subject, predicate, object, graph) of everything loaded, as a set."""
+        with self.lock:
+            return {(s, p, o, g) for s, p, o, g in self.dataset.quads()}
+
+
+class StubSparqlQuery(StubService):
+    """
+    SPARQL endpoint answering every query (GET or form POST) with the same JSON
+    bindings, standing in for QLever serving the chat demo.
+    """
+
+    def __init__(self, latency, bindings=None):
+        super().__init__(latency)
+        self.bindings = bindings if bindings is not None else [
+            {"name": {"type": "literal", "value": f"Stub pathogen {i}"}} for i in range(10)]
+
+    def respond(self, url, body):
+        payload = {"head": {"vars": ["name"]}, "results": {"bindings": self.bindings}}
+        return "application/sparql-results+json", json.dumps(payload).encode()
+
+
+class StubSparqlTable(StubService):
+    """
+    SPARQL endpoint answering every query with rows(offset, limit) as QLever TSV
+    (or JSON bindings for application/sparql-results+json), honouring a trailing
+    LIMIT/OFFSET. rows yields lists of N-Triples terms.
+    """
+
+    def __init__(self, latency, variables, rows, total):
+        super().__init__(latency)
+        self.variables = variables
+        self.rows = rows
+        self.total = total
+        self.json = False
+
+    def respond(self, url, body):
+        query = urllib.parse.parse_qs(body or url.query).get("query", [""])[0]
+        limit = re.search(r"LIMIT (\d+)", query)
+        offset = re.search(r"OFFSET (\d+)", query)
+        start = int(offset.group(1)) if offset else 0
+        stop = min(self.total, start + int(limit.group(1))) if limit else self.total
+        if self.json:
+            bindings = [{var: {"type": "uri" if term.startswith("<") else "literal", "value": term.strip('<>"')}
+                         for var, term in zip(self.variables, row)} for row in self.rows(start, stop - start)]
+            payload = {"head": {"vars": self.variables}, "results": {"bindings": bindings}}
+            return "application/sparql-results+json", json.dumps(payload).encode()
+
+        def chunks():
+            yield ("\t".join("?" + var for var in self.variables) + "\n").encode()
+            lines = []
+            for row in self.rows(start, stop - start):
+                lines.append("\t".join(row))
+                if len(lines) == 10000:
+                    yield ("\n".join(lines) + "\n").encode()
+                    lines = []
+            if lines:
+                yield ("\n".join(lines) + "\n").encode()
+        return "text/tab-separated-values", chunks()
+
+
+class StubServices:
+    """
+    Starts the ENA, EBI Search, UniProt and LLM stubs and points the pipeline modules
+    at them for the duration of a with-block.
+    """
+
+    def __init__(self, latency=None, rows_per_taxon=100, host_limits=None, hits_per_category=250):
+        latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.ena = StubENA(latency["ena"], rows_per_taxon)
+        self.ebisearch = StubEBISearch(latency["ebisearch"], hits_per_category)
+        self.uniprot = StubUniProt(latency["uniprot"])
+        self.llm = StubLLM(latency["llm"])
+        self.host_limits = {"ena": 4, "ebisearch": 4, "uniprot": 4, "llm": 2, **(host_limits or {})}
+        self._saved = []
+
+    def _services(self):
+        return self.ena, self.ebisearch, self.uniprot, self.llm
+
+    def _override(self, module, name, value):
+        self._saved.append((module, name, getattr(module, name)))
+        setattr(module, name, value)
+
+    def __enter__(self):
+        from openai import OpenAI
+
+        for service in self._services():
+            service.start()
+        self._override(ENA_tax_eq, "ENA_SEARCH_URL", self.ena.url + "/ena/portal/api/search")
+        self._override(EBI_search, "BASE_URL", self.ebisearch.url + "/ebisearch/ws/rest")
+        self._override(Tool_Pathogen_Name_from_Taxon_ID, "UNIPROT_TAXONOMY_URL", self.uniprot.url + "/taxonomy")
+        self._override(Tool_Pathogen_Class, "UNIPROT_TAXONOMY_URL", self.uniprot.url + "/taxonomy")
+        self._override(Taxonomy_resolver, "UNIPROT_TAXONOMY_URL", self.uniprot.url + "/taxonomy")
+        self._override(Tool_Pathogen_Class, "client", OpenAI(base_url=self.llm.url, api_key="."))
+        for key, service in (("ena", self.ena), ("ebisearch", self.ebisearch), ("uniprot", self.uniprot),
+                             ("llm", self.llm)):
+            Http.HOST_LIMITS[urllib.parse.urlsplit(service.url).netloc] = self.host_limits[key]
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, value in reversed(self._saved):
+            setattr(module, name, value)
+        for service in self._services():
+            service.stop()
@@ -0,0 +1,126 @@
+"""
+Concurrent multi-taxon harvesting. A bounded thread pool runs the ENA, UniProt and
+LLM calls of several taxa at once, each host capped by Http.HOST_LIMITS. A single
+writer thread drains converted batches from a bounded queue, so workers block
+instead of piling up output in memory when the disk falls behind. With processes
+set, the conversion itself runs in a Parallel_generation process pool.
+"""
+
+import queue
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from defs import ENA_tax_eq
+from defs import Instrumentation
+from defs import Parallel_generation
+from defs import Template_emitter
+from defs import Triple_sink
+
+_DONE = object()
+
+
+def harvest_taxa(taxon_list, call_limit=100, max_workers=8, queue_size=16, stream=False,
+                 output_dir=ENA_tax_eq.OUTPUT_DIR, sink=None, processes=0, shared=None):
+    """
+    Harvests a list of taxa concurrently, writing the same files as calling
+    serviceCallByTaxonID (or serviceCallByTaxonIDStreaming) on each taxon in turn.
+
+    Args:
+        taxon_list (list): NCBI taxonomy IDs; duplicates are harvested once.
+        call_limit (int): Max ENA results per taxon when not streaming.
+        max_workers (int): Taxa in flight at once.
+        queue_size (int): Converted batches allowed to wait for the writer.
+        stream (bool): Page through every run of each taxon with fetch_ena_chunks.
+        output_dir (str): Directory of the per-run N-Triples files.
+        sink: Triple_sink sink the writer appends to; a RunFileSink on output_dir
+            if None. The caller closes it.
+        processes (int): Convert in this many worker processes instead of in the
+            harvesting threads (0), to use more than one core.
+        shared (Template_emitter.SharedTriples): Collect the triples of entities
+            shared across runs and taxa there instead of in the run documents; the
+            caller writes them with shared.write_to(sink).
+
+    Returns:
+        dict: Taxon ID to number of runs written.
+    """
+    emitter = Template_emitter.get_emitter(ENA_tax_eq.TEMPLATE_FILE)
+    template_file = os.path.abspath(ENA_tax_eq.TEMPLATE_FILE)
+    process_pool = Parallel_generation.process_pool(processes) if processes else None
+    sink = sink or Triple_sink.RunFileSink(output_dir)
+    batches = queue.Queue(maxsize=queue_size)
+    written = {}
+    writer_errors = []
+
+    def writer():
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                return
+            if writer_errors:
+                continue  # keep draining so workers never block on a dead writer
+            taxon, run_accessions, documents = item
+            try:
+                with Instrumentation.span("write", taxon=taxon) as trace:
+                    count = sink.write(taxon, run_accessions, documents)
+                    trace.add(runs=count)
+                written[taxon] = written.get(taxon, 0) + count
+            except Exception as e:
+                writer_errors.append(e)
+
+    def convert(taxon, df, names):
+        if process_pool is None:
+            return ENA_tax_eq.convert_traced(taxon, df, emitter, names, shared)
+        with Instrumentation.span("convert", taxon=taxon, processes=processes) as trace:
+            documents = process_pool.submit(Parallel_generation.convert_chunk, template_file,
+                                            Parallel_generation.project(df), names, shared is not None).result()
+            if shared is not None:
+                documents = shared.collect(*documents)
+            triples = Instrumentation.count_triples(documents)
+            trace.add(rows=len(df), triples=triples)
+        Instrumentation.count("rows", len(df), source="ena")
+        Instrumentation.count("triples", triples, source="ena")
+        return documents
+
+    def harvest(index, taxon):
+        print(f"\nProcessing taxon {index}/{len(unique_taxa)}: {taxon}")
+        with Instrumentation.span("taxon", taxon=taxon) as taxon_trace:
+            if stream:
+                chunks = ENA_tax_eq.fetch_ena_chunks(taxon)
+            else:
+                # One chunk, fetched lazily so that traced_chunks times the request
+                chunks = (ENA_tax_eq.fetch_taxon_frame(taxon, call_limit) for _ in range(1))
+            with Instrumentation.span("resolve_names", taxon=taxon):
+                names = ENA_tax_eq.resolve_taxon_names(taxon)
+            for df in ENA_tax_eq.traced_chunks(taxon, chunks):
+                if writer_errors:
+                    raise writer_errors[0]  # stop harvesting for a writer that no longer writes
+                documents = convert(taxon, df, names)
+                # Blocks while queue_size batches are already waiting for the writer
+                with Instrumentation.span("queue_wait", taxon=taxon):
+                    batches.put((taxon, df['run_accession'], documents))
+                taxon_trace.add(rows=len(df))
+
+    unique_taxa = list(dict.fromkeys(taxon_list))
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(harvest, index, taxon) for index, taxon in enumerate(unique_taxa, 1)]
+            # Like the sequential loop, stop at the first failure: taxa not started yet are
+            # cancelled, those in flight finish, and the first failure is re-raised
+            _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.result()
+    finally:
+        batches.put(_DONE)
+        writer_thread.join()
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    if writer_errors:
+        raise writer_errors[0]
+    return written
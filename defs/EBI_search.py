@@ -0,0 +1,197 @@
+"""
+Concurrent, paginated harvesting of EBI Search (www.ebi.ac.uk/ebisearch) into one
+TSV file per query.
+
+Every (query, category) pair is fetched in parallel through the pooled keep-alive
+sessions of Http, so requests are capped by Http.HOST_LIMITS and paced by
+Http.HOST_RATES. The first page of a pair gives its hit count; the remaining pages
+are then fetched with start/size paging. Rows are written to the query's TSV as
+their page arrives, by the calling thread only.
+"""
+
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from defs import Http
+from defs import Instrumentation
+
+# Base URL for all endpoints
+BASE_URL = "https://www.ebi.ac.uk/ebisearch/ws/rest"
+
+# remove categories of less interest
+CATEGORIES = [
+    "genome_assembly",
+    "embl",
+    "emblstandard",
+    "emblcon",
+    "wgs_masters",
+    "tsa_masters",
+    "tls_masters",
+    "coding",
+    "coding_con",
+    "coding_std",
+    "coding_wgs",
+    "coding_tsa",
+    "coding_tls",
+    "non-coding",
+    "non-coding_con",
+    "non-coding_std",
+    "non-coding_wgs",
+    "non-coding_tsa",
+    "non-coding_tls",
+    "sra-experiment",
+    "sra-run",
+    "sra-analysis",
+    "sra-study",
+    "project",
+    "taxonomy",
+    "sra-sample",
+    "sra-submission"
+]
+
+# Fields to request, add more fields if needed
+FIELDS = "acc,description,name"
+PAGE_SIZE = 100  # the largest size EBI Search accepts
+
+
+def _field_value(field_data):
+    """First value of an EBI Search field, which comes as a list."""
+    if isinstance(field_data, list):
+        return field_data[0] if len(field_data) > 0 else ''
+    return field_data if field_data else ''
+
+
+def fetch_page(category, query, start=0, size=PAGE_SIZE, fields=FIELDS):
+    """
+    Fetches one page of EBI Search results.
+
+    Args:
+        category (str): EBI Search domain, e.g. "sra-run".
+        query (str): Search terms.
+        start (int): Offset of the first entry.
+        size (int): Entries per page.
+        fields (str): Comma-separated fields to return.
+
+    Returns:
+        tuple: The total hit count of the query in the category, and one row per
+        entry: the category followed by the fields.
+    """
+    params = {'query': query, 'fields': fields, 'start': start, 'size': size, 'format': 'json'}
+    with Instrumentation.span("ebisearch_page", category=category, query=query) as trace:
+        response = Http.get(f"{BASE_URL}/{category}", params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        rows = []
+        for entry in data.get('entries', []):
+            values = entry.get('fields', {})
+            rows.append([category] + [_field_value(values.get(field, '')) for field in fields.split(',')])
+        trace.add(rows=len(rows))
+    Instrumentation.count("rows", len(rows), source="ebisearch")
+    return data.get('hitCount', 0), rows
+
+
+def harvest(queries, categories=None, output_dir=".", max_workers=8, page_size=PAGE_SIZE, max_hits=None,
+            fields=FIELDS, converter=None):
+    """
+    Fetches every page of every (query, category) pair concurrently and streams the
+    rows into "{output_dir}/{query}.tsv".
+
+    Args:
+        queries (list): Search terms, one TSV file each.
+        categories (list): EBI Search domains; CATEGORIES if None.
+        output_dir (str): Directory of the TSV files.
+        max_workers (int): Pages in flight at once (further bounded by Http.HOST_LIMITS).
+        page_size (int): Entries per request.
+        max_hits (int): Stop paging a pair after this many entries; all hits if None.
+        fields (str): Comma-separated fields to request, the TSV columns after "category".
+        converter (EBI_search_rdf.EntryConverter): Also converts the rows to RDF,
+            if given, in the order of categories, then queries: pages of the
+            earliest (category, query) pair not complete yet go to it as they
+            arrive, those of later pairs once the pairs before them are complete.
+
+    Returns:
+        dict: Pages fetched, rows written, failed pages, seconds, pages per second,
+        and rows and hit counts per query.
+    """
+    categories = CATEGORIES if categories is None else categories
+    os.makedirs(output_dir, exist_ok=True)
+    first_size = page_size if max_hits is None else min(page_size, max_hits)
+    pairs = [(category, query) for category in categories for query in queries]
+    todo = deque((query, category, 0, first_size) for category, query in pairs)
+    follow_ups = {pair: deque() for pair in pairs}
+    # Pages not done yet and pages held back from the converter, per pair
+    outstanding = dict.fromkeys(pairs, 1)
+    held = {pair: [] for pair in pairs}
+    head = 0
+    running = {}
+    files = {}
+    writers = {}
+    summary = {"pages": 0, "rows": 0, "errors": 0,
+               "queries": {query: {"rows": 0, "hits": 0} for query in queries}}
+    start_time = time.perf_counter()
+
+    try:
+        for query in queries:
+            files[query] = open(os.path.join(output_dir, f"{query}.tsv"), 'w', newline='', encoding='utf-8')
+            writers[query] = csv.writer(files[query], delimiter='\t')
+            writers[query].writerow(['category'] + fields.split(','))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while todo or running or any(follow_ups.values()):
+                # First pages are queued before any follow-up page, so hit counts come in early;
+                # follow-up pages go by pair, so the converter holds back few pages
+                while len(running) < 2 * max_workers:
+                    pages = todo or next((pages for pages in follow_ups.values() if pages), None)
+                    if not pages:
+                        break
+                    query, category, start, size = pages.popleft()
+                    future = pool.submit(fetch_page, category, query, start, size, fields)
+                    running[future] = (query, category, start, size)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query, category, start, size = running.pop(future)
+                    outstanding[category, query] -= 1
+                    try:
+                        hit_count, rows = future.result()
+                    except requests.exceptions.RequestException as e:
+                        print(f"Error fetching data for {category} with query '{query}' at {start}: {e}")
+                        summary["errors"] += 1
+                        rows = None
+                    if rows is not None:
+                        writers[query].writerows(rows)
+                        if converter is not None:
+                            held[category, query].append(rows)
+                        summary["pages"] += 1
+                        summary["rows"] += len(rows)
+                        summary["queries"][query]["rows"] += len(rows)
+                        if start == 0:
+                            summary["queries"][query]["hits"] += hit_count
+                            total = hit_count if max_hits is None else min(hit_count, max_hits)
+                            print(f"  {query} / {category}: {hit_count} hits")
+                            offsets = range(page_size, total, page_size)
+                            follow_ups[category, query].extend(
+                                (query, category, offset, min(page_size, total - offset)) for offset in offsets)
+                            outstanding[category, query] += len(offsets)
+                    # Hand the converter the pages of the earliest pairs, the complete ones passed over
+                    while head < len(pairs):
+                        for page in held[pairs[head]]:
+                            converter.write(page, fields)
+                        held[pairs[head]] = []
+                        if outstanding[pairs[head]]:
+                            break
+                        head += 1
+    finally:
+        for f in files.values():
+            f.close()
+    if converter is not None:
+        converter.flush()
+
+    summary["seconds"] = time.perf_counter() - start_time
+    summary["pages_per_second"] = summary["pages"] / summary["seconds"] if summary["seconds"] else 0.0
+    return summary
@@ -0,0 +1,180 @@
+"""
+Converts EBI Search hits (EBI_search) to schema.org triples with the compiled
+template approach of Template_emitter, using data/EBI_search_schema.json.
+
+Each category maps to a schema.org type and an entry IRI: ENA records point at the
+ENA browser, taxonomy entries at the same UniProt taxonomy IRIs the ENA template
+uses for its Taxon nodes. An accession is converted once, however many categories
+or queries return it, with its row of the earliest category in
+EBI_search.CATEGORIES, so the output is the same on every run; pages are converted
+and written in blocks of CHUNK_ROWS entries as they arrive. All entries go to
+the sink in one named graph, EBI_SEARCH_GRAPH; as shards, in SHARD_DIR, a shard set
+of its own that the ENA harvests do not replace.
+"""
+
+import pandas as pd
+
+from defs import EBI_search
+from defs import ENA_tax_eq
+from defs import Template_emitter
+
+TEMPLATE_FILE = "./data/EBI_search_schema.json"
+OUTPUT_DIR = "data/output/ebisearch"  # per-entry files, kept apart from the ENA run files
+SHARD_DIR = "data/shards/ebisearch"  # shards with their own manifest, kept apart from the ENA shards
+CHUNK_ROWS = 50000  # entries converted at a time
+EBI_SEARCH_GRAPH = "https://example.com/graphs/ebisearch"
+
+ENA_ENTRY_IRI = "https://www.ebi.ac.uk/ena/browser/view/{acc}"
+ENTRY_IRIS = {
+    "taxonomy": Template_emitter.TAXON_IRI.replace("{tax_id}", "{acc}"),
+}
+
+# schema.org type of the entries of each category; Dataset for the rest
+CATEGORY_TYPES = {
+    "taxonomy": "Taxon",
+    "project": "ResearchProject",
+    "sra-study": "ResearchProject",
+    "sra-submission": "CreativeWork",
+}
+DEFAULT_TYPE = "Dataset"
+
+
+class EntryConverter:
+    """
+    Converts pages of EBI Search rows as they arrive and writes each accession once
+    to a sink, remembering the accessions written in a set.
+
+    An accession returned by several categories is written with its row of the
+    earliest category in categories. Either the pages come in that category order
+    (EBI_search.harvest feeds them so), or best_rank gives each accession's
+    earliest category up front (convert_tsv reads it from the files first).
+
+    Args:
+        sink: Triple_sink sink to write to. The caller closes it.
+        template_file (str): JSON-LD template with {slot} placeholders.
+        seen (set): Accessions already written, e.g. shared with another converter.
+        categories (list): Category order deciding which row of an accession
+            returned by several categories is written; others come after, by name.
+        chunk_rows (int): Entries converted and written at a time.
+        best_rank (dict): Rank in categories of each accession's earliest category;
+            a row of any other category is left out.
+    """
+
+    def __init__(self, sink, template_file=TEMPLATE_FILE, seen=None, categories=EBI_search.CATEGORIES,
+                 chunk_rows=CHUNK_ROWS, best_rank=None):
+        self.sink = sink
+        self.emitter = Template_emitter.get_emitter(template_file, slots=[])
+        self.seen = set() if seen is None else seen
+        self.rank = {category: index for index, category in enumerate(categories)}
+        self.chunk_rows = chunk_rows
+        self.best_rank = best_rank
+        self.block = []
+        self.pending = 0
+        self.rows = 0
+        self.duplicates = 0
+
+    def write(self, rows, fields=EBI_search.FIELDS):
+        """
+        Adds a page of rows, each accession not seen before once, and writes the
+        entries collected so far once they reach chunk_rows.
+
+        Args:
+            rows (list): Rows as EBI_search.fetch_page returns them: the category,
+                then the values of fields.
+            fields (str): Comma-separated field names of the rows.
+
+        Returns:
+            int: Entries written.
+        """
+        self.rows += len(rows)
+        df = pd.DataFrame(rows, columns=['category'] + fields.split(','), dtype=str)
+        df = df[ENA_tax_eq.valid_values(df['acc']).notna()]
+        rank = df['category'].map(self.rank).fillna(len(self.rank))
+        df = df.assign(_rank=rank).sort_values(['_rank', *df.columns], kind='stable')
+        keep = ~df['acc'].duplicated() & ~df['acc'].isin(self.seen)
+        if self.best_rank is not None:
+            keep &= df['_rank'] == df['acc'].map(self.best_rank)
+        self.duplicates += len(df) - int(keep.sum())
+        df = df[keep].drop(columns='_rank')
+        self.seen.update(df['acc'])
+        self.block.append(df)
+        self.pending += len(df)
+        return self.flush() if self.pending >= self.chunk_rows else 0
+
+    def flush(self):
+        """
+        Writes the entries not written yet (the last, partial block).
+
+        Returns:
+            int: Entries written.
+        """
+        if not self.pending:
+            self.block = []
+            return 0
+        df = pd.concat(self.block, ignore_index=True)
+        self.block = []
+        self.pending = 0
+        documents = self.emitter.emit_frame(entry_slot_values(df), df.index)
+        return self.sink.write(None, df['acc'], documents, graph=EBI_SEARCH_GRAPH)
+
+
+def best_ranks(paths, categories=EBI_search.CATEGORIES, chunk_rows=CHUNK_ROWS):
+    """
+    Rank of the earliest category each accession of EBI_search TSV files has.
+
+    Args:
+        paths (list): TSV files written by EBI_search.harvest.
+        categories (list): Category order; others come after.
+        chunk_rows (int): Rows read at a time.
+
+    Returns:
+        dict: Rank in categories per accession.
+    """
+    rank = {category: index for index, category in enumerate(categories)}
+    best = {}
+    for path in paths:
+        for chunk in pd.read_csv(path, sep='\t', dtype=str, keep_default_na=False, usecols=['category', 'acc'],
+                                 chunksize=chunk_rows):
+            ranks = chunk['category'].map(rank).fillna(len(rank)).groupby(chunk['acc']).min()
+            for acc, value in ranks.items():
+                if value < best.get(acc, len(rank) + 1):
+                    best[acc] = value
+    return best
+
+
+def entry_slot_values(df):
+    """Maps a DataFrame of EBI Search rows to the template slots as columns."""
+    category = df['category']
+    iri_template = category.map(ENTRY_IRIS).fillna(ENA_ENTRY_IRI)
+    return {
+        'entry_iri': pd.Series([iri.replace("{acc}", acc) for iri, acc in zip(iri_template, df['acc'])],
+                               index=df.index, dtype=object),
+        'schema_type': category.map(CATEGORY_TYPES).fillna(DEFAULT_TYPE),
+        'acc': df['acc'],
+        'name': ENA_tax_eq.valid_values(df['name']) if 'name' in df else None,
+        'description': ENA_tax_eq.valid_values(df['description']) if 'description' in df else None,
+        'category': category,
+    }
+
+
+def convert_tsv(paths, sink, chunk_rows=CHUNK_ROWS, seen=None):
+    """
+    Converts {query}.tsv files written by EBI_search.harvest, in two passes: the
+    earliest category of each accession first (best_ranks), then the rows.
+
+    Args:
+        paths (list): TSV files.
+        sink: Triple_sink sink to write to. The caller closes it.
+        chunk_rows (int): Rows read at a time.
+        seen (set): Accessions already written.
+
+    Returns:
+        EntryConverter: The converter, with its counts of rows and duplicates.
+    """
+    converter = EntryConverter(sink, seen=seen, chunk_rows=chunk_rows, best_rank=best_ranks(paths, chunk_rows=chunk_rows))
+    for path in paths:
+        # Written by csv.writer, so values with tabs or quotes are quoted
+        for chunk in pd.read_csv(path, sep='\t', dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            converter.write(chunk.values.tolist(), ",".join(chunk.columns[1:]))
+    converter.flush()
+    return converter
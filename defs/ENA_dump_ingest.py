@@ -0,0 +1,139 @@
+"""
+Offline ingestion of pre-downloaded ENA read_run exports, e.g. data/input/virus.tsv
+or the output of the curl recipes in data/input/mpox.curl.sh.
+
+The TSV (optionally gzipped) is stream-read in chunks, memory-mapped when it is not
+compressed, and only the columns the template needs are parsed. Pathogen names and
+agent classes come from the export's own scientific_name and tax_lineage columns
+and the lineage rules, so nothing touches the network unless resolve_names is set.
+"""
+
+import csv
+import time
+
+import pandas as pd
+
+from defs import ENA_tax_eq
+from defs import Lineage_classifier
+from defs import Parallel_generation
+from defs import Template_emitter
+
+TEMPLATE_FIELDS = ['run_accession', 'experiment_title', 'tax_id', 'country', 'description']
+NAME_FIELDS = ['scientific_name', 'tax_lineage']  # present in fields=ALL exports
+
+
+def read_ena_dump(path, chunk_rows=50000):
+    """
+    Stream-reads an ENA TSV export.
+
+    Args:
+        path (str): TSV file; .gz/.bz2/.xz/.zst compression is inferred from the name.
+        chunk_rows (int): Rows per DataFrame chunk.
+
+    Returns:
+        Iterator of pandas.DataFrame: Chunks of the ENA_FIELDS and NAME_FIELDS columns
+        the file has, all read as str.
+    """
+    header = pd.read_csv(path, sep='\t', nrows=0, quoting=csv.QUOTE_NONE).columns
+    missing = [field for field in TEMPLATE_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"{path} has no column(s) {', '.join(missing)}")
+    wanted = ENA_tax_eq.ENA_FIELDS.split(',') + NAME_FIELDS
+    compressed = path.endswith(('.gz', '.bz2', '.xz', '.zst', '.zip'))
+    # ENA exports are not quoted; a value starting with '"' is just text
+    return pd.read_csv(path, sep='\t', dtype=str, quoting=csv.QUOTE_NONE, chunksize=chunk_rows,
+                       usecols=[field for field in wanted if field in header], memory_map=not compressed)
+
+
+def dump_taxon_names(df, taxon):
+    """
+    Pathogen name, agent class and cleaned name of a taxon from the export itself:
+    scientific_name, and the lineage rules applied to the tax_lineage taxon IDs.
+    Either is None when the export does not have it.
+    """
+    pathogen_name = None
+    agent_name = None
+    if 'scientific_name' in df:
+        names = df['scientific_name'].dropna()
+        pathogen_name = names.iat[0] if len(names) else None
+    if 'tax_lineage' in df and pd.notna(taxon):
+        lineages = df['tax_lineage'].dropna()
+        if len(lineages):
+            lineage = [{"taxonId": int(t)} for t in lineages.iat[0].split(';') if t.strip().isdigit()]
+            agent_name = Lineage_classifier.classify_lineage(taxon, lineage)
+    return pathogen_name, agent_name, ENA_tax_eq.clean_string(pathogen_name)
+
+
+def dump_batches(paths, chunk_rows=50000, resolve_names=False, names=None):
+    """
+    Yields (taxon, DataFrame, names) batches of one or more exports, one batch per
+    taxon per chunk.
+
+    Args:
+        paths (list): TSV files.
+        chunk_rows (int): Rows read at a time.
+        resolve_names (bool): Look names and classes up like the live harvest
+            (UniProt, the LLM) instead of reading them from the export.
+        names (dict): Taxon ID (str) to names, filled in as taxa are seen; the
+            runs without a tax_id under None.
+    """
+    names = {} if names is None else names
+    for path in paths:
+        for chunk in read_ena_dump(path, chunk_rows):
+            for taxon, df in chunk.groupby('tax_id', sort=False, dropna=False):
+                # NaN keys of different chunks are different objects, so the runs without a tax_id share None
+                key = taxon if pd.notna(taxon) else None
+                if key not in names:
+                    if key is None:
+                        print(f"Runs without a tax_id in {path}: written without an agent class")
+                    names[key] = (ENA_tax_eq.resolve_taxon_names(taxon) if resolve_names and key is not None
+                                  else dump_taxon_names(df, taxon))
+                yield taxon, df, names[key]
+
+
+def ingest_dumps(paths, sink, chunk_rows=50000, processes=0, resolve_names=False, shared=None):
+    """
+    Converts ENA exports to RDF and writes them to a sink.
+
+    Args:
+        paths (list): TSV files, optionally compressed.
+        sink: Triple_sink sink to write to. The caller closes it.
+        chunk_rows (int): Rows read and converted at a time.
+        processes (int): Worker processes for the conversion (Parallel_generation);
+            0 converts in this process.
+        resolve_names (bool): See dump_batches.
+        shared (Template_emitter.SharedTriples): Collect the triples of entities
+            shared across runs and taxa there instead of in the run documents; the
+            caller writes them with shared.write_to(sink).
+
+    Returns:
+        dict: Runs written, seconds taken and rows per second, the number of taxa,
+        the taxa without an agent class (their runs have no agent-class triple) and
+        the number of runs without a tax_id.
+    """
+    start = time.perf_counter()
+    names = {}
+    runs_without_taxon = 0
+
+    def counted(batches):
+        nonlocal runs_without_taxon
+        for taxon, df, batch_names in batches:
+            if pd.isna(taxon):
+                runs_without_taxon += len(df)
+            yield taxon, df, batch_names
+
+    batches = counted(dump_batches(paths, chunk_rows, resolve_names, names))
+    if processes:
+        runs = Parallel_generation.generate(batches, sink, processes, shared=shared)
+    else:
+        emitter = Template_emitter.get_emitter(ENA_tax_eq.TEMPLATE_FILE)
+        runs = 0
+        for taxon, df, taxon_names in batches:
+            documents = ENA_tax_eq.convert_traced(taxon, df, emitter, taxon_names, shared)
+            runs += ENA_tax_eq.write_traced(taxon, df['run_accession'], documents, sink)
+    seconds = time.perf_counter() - start
+    return {"runs": runs, "seconds": seconds, "rows_per_second": runs / seconds if seconds else 0.0,
+            "taxa": len([taxon for taxon in names if taxon is not None]),
+            "unclassified": [taxon for taxon, (_, agent_name, _) in names.items()
+                             if taxon is not None and agent_name is None],
+            "runs_without_taxon": runs_without_taxon}
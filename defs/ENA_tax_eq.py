@@ -1,14 +1,14 @@
-import requests
 import pandas as pd
 from io import StringIO
 import os
 import json
-from pyld import jsonld
-from rdflib import Graph
 import re
 
 from defs import Tool_Pathogen_Name_from_Taxon_ID
-from defs import Tool_Pathogen_Class
+from defs import Lineage_classifier
+from defs import Template_emitter
+from defs import Http
+from defs import Instrumentation
 
 # Helper function to lower cases and remove special characters from a string
 def clean_string(s):
@@ -20,26 +20,221 @@ def clean_string(s):
     s = re.sub(r'[^a-z0-9]', '', s)
     return s
 
+INVALID_STRINGS = ['', 'null', 'NONE', 'NaN', 'none']  # Add more if needed
+
 # Helper function to check if a value is valid (not null-like, NONE, empty, etc.)
 def is_valid_value(value):
     if pd.isna(value):
         return False
     str_value = str(value).strip()
-    invalid_strings = ['', 'null', 'NONE', 'NaN', 'none']  # Add more if needed
-    return str_value not in invalid_strings
+    return str_value not in INVALID_STRINGS
+
+# Column version of is_valid_value: the column as strings, NaN where the value is not valid
+def valid_values(column):
+    text = column.astype(str)
+    return text.where(column.notna() & ~text.str.strip().isin(INVALID_STRINGS))
+
+def jsonld_row_to_ntriples(json_ld_template, row, pathogen_name, agent_name, pathogen_name_clean):
+    """
+    Reference conversion of one ENA row through pyld and rdflib.
+
+    This is the original per-row path; serviceCallByTaxonID now uses the compiled
+    Template_emitter, whose output is isomorphic to this one.
+    """
+    # Create a copy of the template
+    json_ld_doc = json.loads(json.dumps(json_ld_template))
+
+    # set the relation URI between the graphs
+    json_ld_doc["@graph"][0]["@id"] = "https://example.com/diseases/" + str(pathogen_name_clean)
+    json_ld_doc["@graph"][1]["associatedDisease"]["@id"] = "https://example.com/diseases/" + str(pathogen_name_clean)
+
+    if is_valid_value(pathogen_name):
+        json_ld_doc["@graph"][0]["name"] = pathogen_name
+    else:
+        json_ld_doc["@graph"][0].pop("name", None)
+
+    if is_valid_value(agent_name):
+        json_ld_doc["@graph"][0]["infectiousAgentClass"]["name"] = agent_name
+    else:
+        json_ld_doc["@graph"][0]["infectiousAgentClass"].pop("name", None)
+
+
+    # matches for the Pathogen_schemav2
+    tax_id = row['tax_id']
+    if is_valid_value(tax_id):
+        json_ld_doc["@graph"][1]["@id"] = "https://purl.uniprot.org/taxonomy/" + str(tax_id)
+    else:
+        json_ld_doc["@graph"][1].pop("@id", None)
+
+    if is_valid_value(tax_id):
+        json_ld_doc["@graph"][1]["name"] = "https://purl.uniprot.org/taxonomy/" + str(tax_id)
+    else:
+        json_ld_doc["@graph"][1].pop("name", None)
+
+    if is_valid_value(tax_id):
+        json_ld_doc["@graph"][1]["identifier"] = "NCBI:txid" + str(tax_id)
+    else:
+        json_ld_doc["@graph"][1].pop("identifier", None)
+
+    run_accession = row['run_accession']
+    if is_valid_value(run_accession):
+        json_ld_doc["@graph"][0]["additionalProperty"][0]["value"] = str(run_accession)
+    else:
+        json_ld_doc["@graph"][0]["additionalProperty"][0].pop("value", None)
+
+    experiment_title = row['experiment_title']
+    if is_valid_value(experiment_title):
+        json_ld_doc["@graph"][0]["additionalProperty"][1]["value"] = str(experiment_title)
+    else:
+        json_ld_doc["@graph"][0]["additionalProperty"][1].pop("value", None)
+
+    description = row['description']
+    if pd.notna(description) and str(description).strip():
+        json_ld_doc["@graph"][0]["additionalProperty"][2]["value"] = str(description)
+    else:
+        json_ld_doc["@graph"][0]["additionalProperty"][2].pop("value", None)
+
+    country = row['country']
+    if is_valid_value(country):
+        json_ld_doc["@graph"][0]["spatialCoverage"]["name"] = str(country)
+    else:
+        json_ld_doc["@graph"][0]["spatialCoverage"].pop("name", None)
+
+    if is_valid_value(country):
+        json_ld_doc["@graph"][0]["spatialCoverage"]["@id"] = str(country)
+    else:
+        json_ld_doc["@graph"][0]["spatialCoverage"].pop("@id", None)
+
+
+    # --------------------------------------------
+    # Convert JSON-LD to N-Quads; pyld and rdflib are only imported for this reference path
+    from pyld import jsonld
+    from rdflib import Graph
+
+    nquads = jsonld.to_rdf(json_ld_doc, {'format': 'application/n-quads'})
+
+    # Parse with rdflib and skolemize blank nodes
+    g = Graph()
+    g.parse(data=nquads, format='nquads')
+    g = g.skolemize()  # Replace blank nodes with skolem IRIs
+
+    # Serialize to N-Triples
+    ntriples = g.serialize(format='nt')
+
+    return ntriples
+
+
+def row_slot_values(row, pathogen_name, agent_name, pathogen_name_clean):
+    """
+    Maps one ENA row to the Template_emitter slots, None marking a slot the
+    row has no valid value for.
+    """
+    description = row['description']
+    return {
+        'pathogen_name_clean': str(pathogen_name_clean),
+        'pathogen_name': pathogen_name if is_valid_value(pathogen_name) else None,
+        'agent_name': agent_name if is_valid_value(agent_name) else None,
+        'tax_id': str(row['tax_id']) if is_valid_value(row['tax_id']) else None,
+        'run_accession': str(row['run_accession']) if is_valid_value(row['run_accession']) else None,
+        'experiment_title': str(row['experiment_title']) if is_valid_value(row['experiment_title']) else None,
+        'description': str(description) if pd.notna(description) and str(description).strip() else None,
+        'country': str(row['country']) if is_valid_value(row['country']) else None,
+    }
 
-def serviceCallByTaxonID(taxonid, call_limit):
-    # Make the API request
-    url = "https://www.ebi.ac.uk/ena/portal/api/search"
 
-    # Data to be sent in the POST request body
+def frame_slot_values(df, pathogen_name, agent_name, pathogen_name_clean):
+    """
+    Maps a whole ENA DataFrame to the Template_emitter slots as columns, applying
+    the same validity rules as row_slot_values with whole-column operations.
+    """
+    description = df['description'].astype(str)
+    return {
+        'pathogen_name_clean': str(pathogen_name_clean),
+        'pathogen_name': pathogen_name if is_valid_value(pathogen_name) else None,
+        'agent_name': agent_name if is_valid_value(agent_name) else None,
+        'tax_id': valid_values(df['tax_id']),
+        'run_accession': valid_values(df['run_accession']),
+        'experiment_title': valid_values(df['experiment_title']),
+        'description': description.where(df['description'].notna() & (description.str.strip() != '')),
+        'country': valid_values(df['country']),
+    }
+
+
+ENA_SEARCH_URL = "https://www.ebi.ac.uk/ena/portal/api/search"
+ENA_FIELDS = 'run_accession,experiment_title,tax_id,country,description,last_updated'  #sequencing_longitude,sequencing_location'
+TEMPLATE_FILE = "./data/Pathogen_schemav2.json"  # You can change this path as needed
+OUTPUT_DIR = "data/output"
+
+
+def ena_search_data(taxonid, limit, offset=0, since=None, fields=None):
+    """
+    Form data for an ENA portal read_run search on one taxon, optionally only for
+    runs updated on or after the date `since` (YYYY-MM-DD).
+    """
+    query = f'tax_eq({taxonid})'
+    if since:
+        query += f' AND last_updated>={since}'
     data = {
         'result': 'read_run',
-        'query':  f'tax_eq({taxonid})',  # 'tag=\"pathogen:virus\"',  #'tax_eq(10244)',
-        'fields': 'run_accession,experiment_title,tax_id,country,description',  #sequencing_longitude,sequencing_location',
+        'query':  query,  # 'tag=\"pathogen:virus\"',  #'tax_eq(10244)',
+        'fields': fields or ENA_FIELDS,
         'format': 'tsv',
-        'limit': call_limit
+        'limit': limit
     }
+    if offset:
+        data['offset'] = offset
+    return data
+
+
+def fetch_ena_chunks(taxonid, page_size=100000, chunk_rows=10000, url=None, session=None, since=None,
+                     fields=None):
+    """
+    Pages through the ENA portal search for a taxon with offset/limit and yields the
+    streamed TSV body as DataFrame chunks, so memory stays bounded by chunk_rows
+    whatever the size of the taxon.
+
+    Args:
+        taxonid (int): NCBI taxonomy ID.
+        page_size (int): Rows requested per POST.
+        chunk_rows (int): Rows parsed per DataFrame chunk.
+        url (str): ENA portal search endpoint, ENA_SEARCH_URL if None (point it at a
+            local fake server to test).
+        session (requests.Session): Session to reuse; the shared Http session if None.
+        since (str): Only runs with last_updated on or after this date (YYYY-MM-DD).
+        fields (str): Comma-separated ENA fields, ENA_FIELDS if None.
+
+    Yields:
+        pandas.DataFrame: Up to chunk_rows rows, all columns read as str.
+    """
+    url = url or ENA_SEARCH_URL
+    session = session or Http.session()
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    offset = 0
+    while True:
+        rows = 0
+        with session.post(url, data=ena_search_data(taxonid, page_size, offset, since, fields), headers=headers,
+                          stream=True, timeout=Http.DEFAULT_TIMEOUT) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            try:
+                # dtype=str keeps tax_id formatting identical across chunks
+                for chunk in pd.read_csv(response.raw, sep='\t', dtype=str, chunksize=chunk_rows):
+                    rows += len(chunk)
+                    yield chunk
+            except pd.errors.EmptyDataError:
+                pass  # ENA answers an empty body once the offset is past the last run
+        if rows < page_size:
+            return
+        offset += rows
+
+
+def fetch_taxon_frame(taxonid, call_limit):
+    """Single ENA portal search for a taxon, parsed into a DataFrame."""
+    # Make the API request
+    url = ENA_SEARCH_URL
+
+    # Data to be sent in the POST request body
+    data = ena_search_data(taxonid, call_limit)
 
     # Headers
     headers = {
@@ -47,119 +242,155 @@ def serviceCallByTaxonID(taxonid, call_limit):
     }
 
     # Make the POST request
-    response = requests.post(url, data=data, headers=headers)
+    response = Http.post(url, data=data, headers=headers)
     response.raise_for_status()  # Raise an exception for bad status codes
 
-    # Since the format is TSV, parse it into a DataFrame
-    df = pd.read_csv(StringIO(response.text), sep='\t')
+    # Since the format is TSV, parse it into a DataFrame; dtype=str as in fetch_taxon_chunks, so a
+    # column with a missing value is not read as float (10244.0) and the runs hash the same either way
+    return pd.read_csv(StringIO(response.text), sep='\t', dtype=str)
 
-    # Display the DataFrame
-    print(df.head())
-
-    print(f"\nDataFrame shape: {df.shape}")
-    print(f"\nColumns: {df.columns.tolist()}")
-
-    # Create an output directory if it doesn't exist
-    output_dir = "data/output"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Read JSON-LD template from file
-    template_file = "./data/Pathogen_schemav2.json"  # You can change this path as needed
-    with open(template_file, 'r', encoding='utf-8') as f:
-        json_ld_template = json.load(f)
-
-    # Iterate through each row in the DataFrame
 
+def resolve_taxon_names(taxonid):
+    """Returns the pathogen name, its infectious agent class and the cleaned name used in IRIs."""
     pathogen_name = Tool_Pathogen_Name_from_Taxon_ID.get_pathogen_name_by_taxon_id(taxonid)
-    agent_name = Tool_Pathogen_Class.get_pathogen_class(pathogen_name)
-    pathogen_name_clean = clean_string(pathogen_name)
-
-    for index, row in df.iterrows():
-        # Create a copy of the template
-        json_ld_doc = json.loads(json.dumps(json_ld_template))
+    agent_name = Lineage_classifier.get_pathogen_class_by_taxon_id(taxonid, pathogen_name)
+    return pathogen_name, agent_name, clean_string(pathogen_name)
+
+
+def convert_frame(df, emitter, pathogen_name, agent_name, pathogen_name_clean, shared=None):
+    """
+    Converts all rows of a batch at once; returns one N-Triples document per row.
+    With shared (a Template_emitter.SharedTriples), the disease, agent class, taxon
+    and place triples are collected there instead of being written in every run.
+    """
+    values = frame_slot_values(df, pathogen_name, agent_name, pathogen_name_clean)
+    if shared is None:
+        return emitter.emit_frame(values, df.index)
+    shared_lines = []
+    documents = emitter.emit_frame(values, df.index, shared_lines)
+    return shared.collect(documents, shared_lines)
+
+
+def write_documents(run_accessions, documents, output_dir=OUTPUT_DIR):
+    """Writes one N-Triples file per run accession."""
+    os.makedirs(output_dir, exist_ok=True)
 
-        # set the relation URI between the graphs
-        json_ld_doc["@graph"][0]["@id"] = "https://example.com/diseases/" + str(pathogen_name_clean)
-        json_ld_doc["@graph"][1]["associatedDisease"]["@id"] = "https://example.com/diseases/" + str(pathogen_name_clean)
+    for run_accession, ntriples in zip(run_accessions, documents):
+        # Create filename using the run_accession
+        filename = f"{run_accession}.nt"
+        filepath = os.path.join(output_dir, filename)
 
-        if is_valid_value(pathogen_name):
-            json_ld_doc["@graph"][0]["name"] = pathogen_name
-        else:
-            json_ld_doc["@graph"][0].pop("name", None)
+        # Write the N-Triples file
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(ntriples)
 
-        if is_valid_value(agent_name):
-            json_ld_doc["@graph"][0]["infectiousAgentClass"]["name"] = agent_name
-        else:
-            json_ld_doc["@graph"][0]["infectiousAgentClass"].pop("name", None)
+        print(f"Created: {filepath}")
 
+    return len(documents)
 
-        # matches for the Pathogen_schemav2
-        tax_id = row['tax_id']
-        if is_valid_value(tax_id):
-            json_ld_doc["@graph"][1]["@id"] = "https://purl.uniprot.org/taxonomy/" + str(tax_id)
-        else:
-            json_ld_doc["@graph"][1].pop("@id", None)
 
-        if is_valid_value(tax_id):
-            json_ld_doc["@graph"][1]["name"] = "https://purl.uniprot.org/taxonomy/" + str(tax_id)
-        else:
-            json_ld_doc["@graph"][1].pop("name", None)
+def write_run_files(df, emitter, pathogen_name, agent_name, pathogen_name_clean, output_dir=OUTPUT_DIR, shared=None):
+    """Converts a batch of ENA rows and writes one N-Triples file per run accession."""
+    documents = convert_frame(df, emitter, pathogen_name, agent_name, pathogen_name_clean, shared)
+    return write_documents(df['run_accession'], documents, output_dir)
 
-        if is_valid_value(tax_id):
-            json_ld_doc["@graph"][1]["identifier"] = "NCBI:txid" + str(tax_id)
-        else:
-            json_ld_doc["@graph"][1].pop("identifier", None)
 
-        run_accession = row['run_accession']
-        if is_valid_value(run_accession):
-            json_ld_doc["@graph"][0]["additionalProperty"][0]["value"] = str(run_accession)
-        else:
-            json_ld_doc["@graph"][0]["additionalProperty"][0].pop("value", None)
+def traced_chunks(taxonid, chunks):
+    """Yields the chunks, each one fetched within an "ena_fetch" span of the taxon."""
+    chunks = iter(chunks)
+    while True:
+        with Instrumentation.span("ena_fetch", taxon=taxonid) as trace:
+            chunk = next(chunks, None)
+            trace.add(rows=0 if chunk is None else len(chunk))
+        if chunk is None:
+            return
+        yield chunk
 
-        experiment_title = row['experiment_title']
-        if is_valid_value(experiment_title):
-            json_ld_doc["@graph"][0]["additionalProperty"][1]["value"] = str(experiment_title)
-        else:
-            json_ld_doc["@graph"][0]["additionalProperty"][1].pop("value", None)
 
-        description = row['description']
-        if pd.notna(description) and str(description).strip():
-            json_ld_doc["@graph"][0]["additionalProperty"][2]["value"] = str(description)
-        else:
-            json_ld_doc["@graph"][0]["additionalProperty"][2].pop("value", None)
+def convert_traced(taxonid, df, emitter, names, shared=None):
+    """convert_frame within a "convert" span of the taxon, counting rows and triples."""
+    with Instrumentation.span("convert", taxon=taxonid) as trace:
+        documents = convert_frame(df, emitter, *names, shared)
+        triples = Instrumentation.count_triples(documents)
+        trace.add(rows=len(df), triples=triples)
+    Instrumentation.count("rows", len(df), source="ena")
+    Instrumentation.count("triples", triples, source="ena")
+    return documents
 
-        country = row['country']
-        if is_valid_value(country):
-            json_ld_doc["@graph"][0]["spatialCoverage"]["name"] = str(country)
-        else:
-            json_ld_doc["@graph"][0]["spatialCoverage"].pop("name", None)
 
-        if is_valid_value(country):
-            json_ld_doc["@graph"][0]["spatialCoverage"]["@id"] = str(country)
+def write_traced(taxonid, run_accessions, documents, sink=None):
+    """Writes converted runs to sink, or one file per run, within a "write" span of the taxon."""
+    with Instrumentation.span("write", taxon=taxonid) as trace:
+        if sink is not None:
+            written = sink.write(taxonid, run_accessions, documents)
         else:
-            json_ld_doc["@graph"][0]["spatialCoverage"].pop("@id", None)
-
-
-        # --------------------------------------------
-        # Convert JSON-LD to N-Quads
-        nquads = jsonld.to_rdf(json_ld_doc, {'format': 'application/n-quads'})
-
-        # Parse with rdflib and skolemize blank nodes
-        g = Graph()
-        g.parse(data=nquads, format='nquads')
-        g = g.skolemize()  # Replace blank nodes with skolem IRIs
-
-        # Serialize to N-Triples
-        ntriples = g.serialize(format='nt')
-
-        # Create filename using the run_accession
-        filename = f"{row['run_accession']}.nt"
-        filepath = os.path.join(output_dir, filename)
-
-        # Write the N-Triples file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(ntriples)
-
-        print(f"Created: {filepath}")
-
-    print(f"\nGenerated {len(df)} N-Triples files in {output_dir}/")
+            written = write_documents(run_accessions, documents)
+        trace.add(runs=written)
+    return written
+
+
+def serviceCallByTaxonID(taxonid, call_limit, sink=None, shared=None):
+    """
+    Harvests up to call_limit runs of a taxon. The runs go to sink (see
+    Triple_sink) when given, otherwise to one N-Triples file per run in OUTPUT_DIR.
+    With shared (Template_emitter.SharedTriples), the shared-entity triples are
+    collected there, for the caller to write with shared.write_to(sink).
+    """
+    with Instrumentation.span("taxon", taxon=taxonid) as taxon_trace:
+        with Instrumentation.span("ena_fetch", taxon=taxonid) as trace:
+            df = fetch_taxon_frame(taxonid, call_limit)
+            trace.add(rows=len(df))
+
+        # Display the DataFrame
+        print(df.head())
+
+        print(f"\nDataFrame shape: {df.shape}")
+        print(f"\nColumns: {df.columns.tolist()}")
+
+        # Compiled triple pattern for the JSON-LD template (built once per process)
+        emitter = Template_emitter.get_emitter(TEMPLATE_FILE)
+
+        with Instrumentation.span("resolve_names", taxon=taxonid):
+            names = resolve_taxon_names(taxonid)
+
+        documents = convert_traced(taxonid, df, emitter, names, shared)
+        write_traced(taxonid, df['run_accession'], documents, sink)
+        taxon_trace.add(rows=len(df))
+
+    if sink is not None:
+        print(f"\nWrote {len(df)} runs to {sink.output_dir}/")
+        return
+
+    print(f"\nGenerated {len(df)} N-Triples files in {OUTPUT_DIR}/")
+
+
+def serviceCallByTaxonIDStreaming(taxonid, page_size=100000, chunk_rows=10000, url=None, sink=None, shared=None):
+    """
+    Harvests every run of a taxon, converting each streamed chunk as it arrives
+    instead of holding the whole ENA response in memory.
+
+    Args:
+        taxonid (int): NCBI taxonomy ID.
+        page_size (int): Rows requested per ENA POST.
+        chunk_rows (int): Rows parsed and converted at a time.
+        url (str): ENA portal search endpoint, ENA_SEARCH_URL if None.
+        sink: Triple_sink sink to write to; one N-Triples file per run in OUTPUT_DIR if None.
+        shared (Template_emitter.SharedTriples): Write shared-entity triples only once.
+
+    Returns:
+        int: Number of runs written.
+    """
+    emitter = Template_emitter.get_emitter(TEMPLATE_FILE)
+
+    total = 0
+    with Instrumentation.span("taxon", taxon=taxonid) as taxon_trace:
+        with Instrumentation.span("resolve_names", taxon=taxonid):
+            names = resolve_taxon_names(taxonid)
+
+        for chunk in traced_chunks(taxonid, fetch_ena_chunks(taxonid, page_size, chunk_rows, url)):
+            documents = convert_traced(taxonid, chunk, emitter, names, shared)
+            total += write_traced(taxonid, chunk['run_accession'], documents, sink)
+        taxon_trace.add(rows=total)
+
+    print(f"\nGenerated {total} runs in {sink.output_dir if sink is not None else OUTPUT_DIR}/")
+    return total
@@ -0,0 +1,200 @@
+"""
+Few-shot example selection and a compact schema summary for the demo.py prompt.
+
+Instead of pasting every example of data/sparql-examples.json and the whole JSON-LD
+template into each system message, a BM25 index over the example questions picks
+the TOP_K examples closest to the user's question, and the template is reduced to
+one line per type listing its properties and what they point to. The index is
+built once and kept in INDEX_FILE; it is rebuilt when the examples file changes.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts are estimated without it
+    tiktoken = None
+
+INDEX_FILE = "data/cache/sparql_examples_index.json"
+TOP_K = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {"a", "all", "an", "and", "are", "as", "be", "by", "for", "from", "have", "has", "in", "is", "it",
+             "list", "me", "of", "on", "or", "provide", "show", "that", "the", "their", "them", "there", "these",
+             "to", "what", "which", "with", "you", "your"}
+
+_encoding = None
+
+
+def tokenize(text):
+    """Lower-cased words of a text without stopwords."""
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+
+def count_tokens(text):
+    """
+    LLM tokens of a text: exact with tiktoken (o200k_base), otherwise estimated as
+    the number of words and punctuation marks.
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class ExampleIndex:
+    """
+    BM25 index over the questions of a list of {"question", "query"} examples.
+
+    Args:
+        examples (list): The examples.
+        source_hash (str): Hash of the file the examples came from.
+        doc_terms (list): Term counts of each question, as saved by to_json;
+            computed from the examples if None.
+    """
+
+    def __init__(self, examples, source_hash=None, doc_terms=None):
+        self.examples = examples
+        self.source_hash = source_hash
+        if doc_terms is None:
+            doc_terms = [Counter(tokenize(example["question"])) for example in examples]
+        self.doc_terms = [Counter(terms) for terms in doc_terms]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        document_frequency = Counter(term for terms in self.doc_terms for term in terms)
+        n = len(examples)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, question):
+        terms = tokenize(question)
+        scores = []
+        for doc_terms, length in zip(self.doc_terms, self.doc_lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            for term in terms:
+                tf = doc_terms.get(term, 0)
+                if tf:
+                    score += self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def search(self, question, k=TOP_K):
+        """
+        The k examples that best match a question, best first. Examples sharing no
+        word with the question are only used when nothing matches, in file order.
+        """
+        scores = self.scores(question)
+        ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+        matching = [i for i in ranked if scores[i] > 0]
+        return [self.examples[i] for i in (matching or ranked)[:k]]
+
+    def to_json(self):
+        return {"source_hash": self.source_hash, "examples": self.examples, "doc_terms": self.doc_terms}
+
+
+def load_index(example_file, index_file=INDEX_FILE):
+    """
+    The index of an examples file, read from index_file when it was built from the
+    same file content, otherwise built and saved there.
+    """
+    with open(example_file, 'rb') as f:
+        content = f.read()
+    source_hash = hashlib.sha256(content).hexdigest()
+    if os.path.exists(index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("source_hash") == source_hash:
+            return ExampleIndex(cached["examples"], source_hash, cached["doc_terms"])
+
+    index = ExampleIndex(json.loads(content), source_hash)
+    os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+    with open(index_file + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(index.to_json(), f)
+    os.replace(index_file + ".tmp", index_file)
+    return index
+
+
+def format_examples(examples):
+    """Examples as question / query pairs for the prompt."""
+    return "\n\n".join(f"Question: {example['question']}\n```sparql\n{example['query'].strip()}\n```"
+                       for example in examples)
+
+
+def _compact(term, prefixes):
+    for prefix, namespace in prefixes.items():
+        if term.startswith(namespace):
+            return f"{prefix}:{term[len(namespace):]}"
+    return term
+
+
+def schema_summary(json_ld_template):
+    """
+    One line per node type of a JSON-LD template: the IRI pattern of its nodes, and
+    each property with the type it points to, or the values of propertyID for
+    PropertyValue nodes.
+    """
+    contexts = json_ld_template.get("@context", {})
+    context = {}
+    for ctx in contexts if isinstance(contexts, list) else [contexts]:
+        context.update(ctx)
+    vocab = context.pop("@vocab", "")
+    prefixes = {"schema": vocab, **context} if vocab else context
+
+    def expand(term):
+        prefix, sep, suffix = term.partition(":")
+        if sep and prefix in context:
+            return context[prefix] + suffix
+        return term if sep else vocab + term
+
+    def type_names(node):
+        types = node.get("@type", [])
+        return [_compact(expand(t), prefixes) for t in ([types] if isinstance(types, str) else types)]
+
+    nodes = []
+
+    def collect(node):
+        nodes.append(node)
+        for key, value in node.items():
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict) and not key.startswith("@") and "@type" in item:
+                    collect(item)
+
+    for node in json_ld_template.get("@graph", [json_ld_template]):
+        collect(node)
+    types_by_id = {node["@id"]: type_names(node) for node in nodes if "@id" in node and "@type" in node}
+
+    lines = {}
+    for node in nodes:
+        name = ", ".join(type_names(node))
+        if name in lines:
+            continue
+        iri = node.get("@id", "")
+        head = f"{name} <{iri.rsplit('/', 1)[0]}/...>" if "/" in iri else f"{name} (blank node)"
+        properties = []
+        for key, value in node.items():
+            if key.startswith("@"):
+                continue
+            prop = _compact(expand(key), prefixes)
+            items = value if isinstance(value, list) else [value]
+            if all(isinstance(item, dict) for item in items):
+                targets = []
+                for item in items:
+                    target = ", ".join(type_names(item) or types_by_id.get(item.get("@id"), []))
+                    if target and target not in targets:
+                        targets.append(target)
+                ids = [f'"{item["propertyID"]}"' for item in items if "propertyID" in item]
+                detail = f" (schema:propertyID {' | '.join(ids)}, schema:value)" if ids else ""
+                properties.append(f"{prop} -> {' | '.join(targets) or 'IRI'}{detail}")
+            else:
+                properties.append(prop)
+        lines[name] = f"{head}: {'; '.join(properties)}"
+    prefix_line = "Prefixes: " + ", ".join(f"{prefix}: <{namespace}>" for prefix, namespace in prefixes.items())
+    return "\n".join([prefix_line, *lines.values()])
@@ -0,0 +1,370 @@
+"""
+PageRank, degree, connected components and Louvain communities of a graph exported
+by Graph_export (.npz), computed on a SciPy sparse matrix and integer-indexed NumPy
+arrays instead of a networkx dict-of-dicts graph, and written back as RDF so QLever
+can rank by them.
+
+Edges are taken as undirected, as the notebook graphs are: every edge is stored
+in both directions, and parallel edges (e.g. with different predicates) add up as
+weights, in a scipy.sparse.csr_array. PageRank is a sparse matrix-vector product
+per iteration, components come from scipy.sparse.csgraph.connected_components, and
+each local-moving sweep of Louvain scores every node against its neighbouring
+communities with one sparse product (adjacency @ membership), moves a random half
+of the nodes that gain, and then merges the communities into nodes and repeats.
+
+Without SciPy the same metrics are computed with NumPy alone: PageRank and
+components over the edge arrays (np.bincount, np.minimum.at), and Louvain moving
+one node at a time, only revisiting the neighbours of moved nodes.
+
+Each node gets one triple per metric, METRIC_IRI with the metric name, in the
+named graph METRICS_GRAPH. Nodes that are IRIs keep their IRI; nodes that are
+names (e.g. the pathogen and place names of Graph_export.PATHOGEN_PLACE_QUERY) get
+NODE_IRI and a schema:name triple, so they can be joined on the name.
+"""
+
+import urllib.parse
+from collections import deque
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:  # declared in pyproject.toml; the NumPy versions below are used without it
+    sparse = None
+    csgraph = None
+
+METRIC_IRI = "https://example.com/graph-metrics/{metric}"
+NODE_IRI = "https://example.com/graph-nodes/{label}"
+METRICS_GRAPH = "https://example.com/graphs/graph-metrics"
+OUTPUT_DIR = "data/output/graph-metrics"  # metric files for Triple_sink.RunFileSink
+SHARD_DIR = "data/shards/metrics"  # shards with their own manifest, kept apart from the ENA shards
+SCHEMA_NAME = "https://schema.org/name"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+PAGERANK_ALPHA = 0.85
+PAGERANK_TOL = 1.0e-6  # L1 change per node, as networkx.pagerank
+PAGERANK_MAX_ITER = 100
+LOUVAIN_RESOLUTION = 1.0
+LOUVAIN_MAX_LEVELS = 10
+LOUVAIN_MAX_SWEEPS = 100  # local-moving sweeps per level with SciPy
+LOUVAIN_PATIENCE = 3  # sweeps in a row without a modularity gain before a level stops
+LOUVAIN_THRESHOLD = 1.0e-5  # with SciPy, a sweep gaining less modularity ends the local moving of a level
+NODES_PER_DOCUMENT = 10000  # nodes per document handed to the sink
+
+
+class Graph:
+    """
+    Undirected weighted graph in CSR form: matrix, a scipy.sparse.csr_array (None
+    without SciPy), and its indptr, src, dst and weights as NumPy arrays.
+
+    Args:
+        n (int): Number of nodes.
+        src (np.ndarray): Edge sources.
+        dst (np.ndarray): Edge targets.
+        weights (np.ndarray): Edge weights; 1 per edge if None.
+        nodes (np.ndarray): Node labels, indexed by node ID.
+    """
+
+    def __init__(self, n, src, dst, weights=None, nodes=None):
+        self.n = n
+        self.nodes = nodes
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+        # Both directions, except for self-loops, which are their own reverse
+        loop = src == dst
+        both_src = np.concatenate([src, dst[~loop]])
+        both_dst = np.concatenate([dst, src[~loop]])
+        both_weights = np.concatenate([weights, weights[~loop]])
+        # Parallel edges become one weighted edge
+        if sparse is not None:
+            self.matrix = sparse.csr_array((both_weights, (both_src, both_dst)), shape=(n, n))
+            self.matrix.sum_duplicates()
+            self.indptr = self.matrix.indptr.astype(np.int64)
+            self.dst = self.matrix.indices.astype(np.int64)
+            self.weights = self.matrix.data
+            self.src = np.repeat(np.arange(n), np.diff(self.indptr))
+            return
+        self.matrix = None
+        keys, inverse = np.unique(both_src * n + both_dst, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=both_weights)
+        self.src = keys // n
+        self.dst = keys % n
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n), out=self.indptr[1:])
+
+    def degree(self):
+        """Neighbours of each node, a self-loop counted twice (as networkx.Graph.degree)."""
+        loops = self.src == self.dst
+        return np.bincount(self.src, minlength=self.n) + np.bincount(self.src[loops], minlength=self.n)
+
+    def strength(self):
+        """Weighted degree, a self-loop counted twice; sums to twice the total weight."""
+        loops = self.src == self.dst
+        return (np.bincount(self.src, weights=self.weights, minlength=self.n)
+                + np.bincount(self.src[loops], weights=self.weights[loops], minlength=self.n))
+
+
+def load_graph(path):
+    """Graph of a Graph_export .npz file."""
+    with np.load(path) as data:
+        indptr = data["indptr"]
+        n = len(indptr) - 1
+        src = np.repeat(np.arange(n), np.diff(indptr))
+        return Graph(n, src, data["indices"], nodes=data["nodes"])
+
+
+def pagerank(graph, alpha=PAGERANK_ALPHA, tol=PAGERANK_TOL, max_iter=PAGERANK_MAX_ITER):
+    """
+    PageRank by power iteration. The rank of nodes without edges is spread over
+    all nodes, as networkx.pagerank does.
+    """
+    n = graph.n
+    if n == 0:
+        return np.zeros(0)
+    # Row sums of the adjacency matrix, where a self-loop is one entry
+    row_sum = np.bincount(graph.src, weights=graph.weights, minlength=n)
+    dangling = row_sum == 0
+    share = graph.weights / row_sum[graph.src]
+    if graph.matrix is not None:
+        # Column-stochastic transition matrix: rank flows from src to dst by its share
+        transition = sparse.csr_array((share, (graph.dst, graph.src)), shape=(n, n))
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = rank
+        if graph.matrix is not None:
+            rank = alpha * (transition @ previous)
+        else:
+            rank = alpha * np.bincount(graph.dst, weights=previous[graph.src] * share, minlength=n)
+        rank += (alpha * previous[dangling].sum() + 1.0 - alpha) / n
+        if np.abs(rank - previous).sum() < n * tol:
+            break
+    return rank
+
+
+def connected_components(graph):
+    """
+    Component number of each node, 0 for the component with the lowest node ID.
+    Without SciPy, labels are hooked to the smallest neighbouring label and
+    shortened by pointer jumping until nothing changes.
+    """
+    if graph.matrix is not None:
+        count, labels = csgraph.connected_components(graph.matrix, directed=False)
+        lowest = np.full(count, graph.n)
+        np.minimum.at(lowest, labels, np.arange(graph.n))
+        return np.unique(lowest[labels], return_inverse=True)[1]
+    labels = np.arange(graph.n)
+    while True:
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[graph.src], labels[graph.dst])
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            break
+        labels = hooked
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def modularity(graph, communities, resolution=LOUVAIN_RESOLUTION):
+    strength = graph.strength()
+    total = strength.sum()
+    if total == 0:
+        return 0.0
+    same = communities[graph.src] == communities[graph.dst]
+    inside = graph.weights[same].sum() + graph.weights[graph.src == graph.dst].sum()
+    degree_sums = np.bincount(communities, weights=strength)
+    return float(inside / total - resolution * ((degree_sums / total) ** 2).sum())
+
+
+def _sweep_nodes(graph, resolution, rng):
+    """
+    Local moving phase of Louvain on the sparse matrix: community of each node, and
+    whether any node moved. Each sweep finds the best neighbouring community of
+    every node at once and moves the nodes that would gain. Neighbours moving into
+    each other's communities can undo each other, so a sweep that does not raise
+    the modularity is dropped and the next one moves a random half as many nodes;
+    LOUVAIN_PATIENCE of them in a row, or a sweep gaining less than
+    LOUVAIN_THRESHOLD, end the phase.
+    """
+    n = graph.n
+    nodes = np.arange(n)
+    strength = graph.strength()
+    total = strength.sum()
+    # Links to other nodes only: a self-loop moves with its node
+    off = graph.src != graph.dst
+    adjacency = sparse.csr_array((graph.weights[off], (graph.src[off], graph.dst[off])), shape=(n, n))
+    loops = graph.weights[~off].sum()
+
+    def score(community):
+        # modularity, with what does not depend on the communities computed once
+        inside = graph.weights[off][community[graph.src[off]] == community[graph.dst[off]]].sum() + loops
+        return inside / total - resolution * ((np.bincount(community, weights=strength) / total) ** 2).sum()
+
+    community = nodes.copy()
+    best = score(community)
+    moved_any = False
+    misses = 0
+    share = 1.0
+    for _ in range(LOUVAIN_MAX_SWEEPS):
+        # Weight between each node and each community it has links into
+        links = adjacency @ sparse.csr_array((np.ones(n), (nodes, community)), shape=(n, n))
+        links.sum_duplicates()
+        rows = np.repeat(nodes, np.diff(links.indptr))
+        cols = links.indices
+        community_strength = np.bincount(community, weights=strength, minlength=n)
+        own = cols == community[rows]
+        # Gain of joining a community, relative to being alone, with the node taken out of its own
+        without = community_strength[cols] - np.where(own, strength[rows], 0.0)
+        gains = links.data - resolution * without * strength[rows] / total
+        stay = -resolution * (community_strength[community] - strength) * strength / total
+        stay[rows[own]] = gains[own]
+        # Best community of each node: largest gain, ties to the lowest community
+        order = np.lexsort((cols, -gains, rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = rows[order][1:] != rows[order][:-1]
+        best_rows, best_cols, best_gains = rows[order][first], cols[order][first], gains[order][first]
+        gaining = (best_gains > stay[best_rows] + 1e-12) & (best_cols != community[best_rows])
+        if not gaining.any():
+            break
+        movers = rng.random(gaining.sum()) < share
+        if not movers.any():
+            continue
+        candidate = community.copy()
+        candidate[best_rows[gaining][movers]] = best_cols[gaining][movers]
+        candidate_score = score(candidate)
+        if candidate_score > best + 1e-12:
+            gain = candidate_score - best
+            community, best, moved_any, misses = candidate, candidate_score, True, 0
+            if gain < LOUVAIN_THRESHOLD:
+                break
+        else:
+            misses += 1
+            share /= 2
+            if misses >= LOUVAIN_PATIENCE:
+                break
+    return np.unique(community, return_inverse=True)[1], moved_any
+
+
+def _move_nodes(graph, resolution, rng):
+    """
+    Local moving phase of Louvain without SciPy: community of each node, and
+    whether any node moved. Nodes are visited from a queue, in random order first; when a node
+    moves, its neighbours outside its new community are queued again, so later
+    rounds only look at the nodes whose surroundings changed.
+    """
+    n = graph.n
+    strength = graph.strength()
+    total = strength.sum()
+    community = np.arange(n)
+    community_strength = strength.copy()
+    queue = deque(rng.permutation(n).tolist())
+    queued = np.ones(n, dtype=bool)
+    moved_any = False
+    while queue:
+        node = queue.popleft()
+        queued[node] = False
+        begin, end = graph.indptr[node], graph.indptr[node + 1]
+        neighbours = graph.dst[begin:end]
+        weights = graph.weights[begin:end]
+        own = community[node]
+        community_strength[own] -= strength[node]
+        outside = neighbours != node
+        candidates, inverse = np.unique(community[neighbours[outside]], return_inverse=True)
+        links = np.bincount(inverse, weights=weights[outside])
+        # Gain of joining a community, relative to staying alone
+        gains = links - resolution * community_strength[candidates] * strength[node] / total
+        stay = np.searchsorted(candidates, own)
+        own_gain = (links[stay] if stay < len(candidates) and candidates[stay] == own else 0.0) \
+            - resolution * community_strength[own] * strength[node] / total
+        best = own
+        if len(gains) and gains.max() > own_gain + 1e-12:
+            best = candidates[gains.argmax()]
+        community[node] = best
+        community_strength[best] += strength[node]
+        if best != own:
+            moved_any = True
+            requeue = neighbours[(community[neighbours] != best) & ~queued[neighbours]]
+            queued[requeue] = True
+            queue.extend(requeue.tolist())
+    return np.unique(community, return_inverse=True)[1], moved_any
+
+
+def louvain_communities(graph, resolution=LOUVAIN_RESOLUTION, max_levels=LOUVAIN_MAX_LEVELS, seed=42):
+    """
+    Louvain community of each node: nodes move to the neighbouring community with
+    the largest modularity gain, communities are merged into single nodes, and
+    this repeats until no node moves.
+    """
+    rng = np.random.default_rng(seed)
+    membership = np.arange(graph.n)
+    level = graph
+    for _ in range(max_levels):
+        if level.weights.sum() == 0:
+            break
+        move = _sweep_nodes if level.matrix is not None else _move_nodes
+        communities, moved = move(level, resolution, rng)
+        if not moved:
+            break
+        membership = communities[membership]
+        # The community graph: weights between communities, and the weight inside each
+        # as a self-loop. Level edges are stored both ways, so one direction is kept.
+        keep = level.src <= level.dst
+        level = Graph(communities.max() + 1, communities[level.src[keep]], communities[level.dst[keep]],
+                      level.weights[keep])
+    return membership
+
+
+def analyse(graph):
+    """All metrics of a graph, as arrays indexed by node ID."""
+    return {"degree": graph.degree(), "pagerank": pagerank(graph), "component": connected_components(graph),
+            "community": louvain_communities(graph)}
+
+
+def _escape_literal(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _node_term(label):
+    if label.startswith(("http://", "https://", "urn:")):
+        return f"<{label}>", None
+    iri = NODE_IRI.format(label=urllib.parse.quote(label, safe=""))
+    return f"<{iri}>", f'<{iri}> <{SCHEMA_NAME}> "{_escape_literal(label)}" .\n'
+
+
+def metric_documents(nodes, metrics, nodes_per_document=NODES_PER_DOCUMENT):
+    """
+    N-Triples of the metrics, NODES_PER_DOCUMENT nodes per document.
+
+    Yields:
+        str: A document.
+    """
+    columns = []
+    for name, values in metrics.items():
+        datatype = "double" if np.issubdtype(values.dtype, np.floating) else "integer"
+        text = values.astype(str) if datatype == "integer" else np.char.mod("%.6e", values)
+        columns.append((f"<{METRIC_IRI.format(metric=name)}>", f"^^<{XSD}{datatype}>", text))
+    for start in range(0, len(nodes), nodes_per_document):
+        lines = []
+        for i in range(start, min(start + nodes_per_document, len(nodes))):
+            subject, name_line = _node_term(str(nodes[i]))
+            if name_line:
+                lines.append(name_line)
+            for predicate, datatype, text in columns:
+                lines.append(f'{subject} {predicate} "{text[i]}"{datatype} .\n')
+        yield "".join(lines)
+
+
+def write_metrics(graph, metrics, sink):
+    """
+    Writes the metrics of a graph to a Triple_sink sink, in METRICS_GRAPH.
+
+    Returns:
+        int: Documents written.
+    """
+    documents = list(metric_documents(graph.nodes, metrics))
+    names = [f"graph_metrics_{i:05d}" for i in range(len(documents))]
+    return sink.write(None, names, documents, graph=METRICS_GRAPH)
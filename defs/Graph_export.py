@@ -0,0 +1,296 @@
+"""
+Exports the result of a SPARQL edge query as a graph file, without holding the
+result in memory.
+
+The rows, (source, predicate, target[, source type, target type]) or just
+(source, target), are read as a stream: from the QLever endpoint as TSV, one
+LIMIT/OFFSET page at a time, or from a TSV/CSV result saved with
+`qlever query`. Every node gets an integer ID the first time it is seen, and each
+row is written out straight away, so only the node table grows with the graph:
+
+    graphml  GraphML, readable with networkx.read_graphml (node IDs are the terms, as
+             in triplestore/graphlpg/rdfGraphs.graphml, but each node only once)
+    gexf     GEXF 1.2 for Gephi, replacing the rdf2gephi jar of triplestore/visualize
+    edgelist tab-separated integer edges, with the nodes in a .nodes.tsv next to it
+    npz      CSR arrays (indptr, indices) plus node and predicate labels, ready for
+             NumPy/SciPy without parsing text again
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+from array import array
+from xml.sax.saxutils import escape, quoteattr
+
+from defs import Http
+
+SPARQL_ENDPOINT = "http://localhost:7007"  # [server] PORT in the Qleverfile
+PAGE_SIZE = 100000  # rows per LIMIT/OFFSET request; None for a single streamed request
+FORMATS = ("graphml", "gexf", "edgelist", "npz")
+
+# Typed edges between all nodes, the query of triplestore/graphlpg/rdfGraphs.ipynb
+TYPE_EDGES_QUERY = """PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+SELECT DISTINCT ?source ?type ?target ?sType ?tType
+WHERE {
+    ?source a ?sType .
+    ?target a ?tType .
+    ?source ?type ?target .
+}
+"""
+
+# Pathogen to place names, the second graph of the notebook
+PATHOGEN_PLACE_QUERY = """PREFIX schema: <https://schema.org/>
+SELECT DISTINCT ?name ?predicate ?spatial_name ?sType ?tType
+WHERE {
+    ?subject a schema:InfectiousDisease .
+    ?subject schema:name ?name .
+    ?subject schema:spatialCoverage ?spatialcoverage .
+    ?spatialcoverage schema:name ?spatial_name .
+    BIND("spatialCoverage" AS ?predicate)
+    BIND("pathogen" AS ?sType)
+    BIND("geospatial" AS ?tType)
+}
+"""
+
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def term_value(term):
+    """Value of a term in QLever's TSV output: the IRI without <>, or the literal without quotes and tag."""
+    if term.startswith("<") and term.endswith(">"):
+        return term[1:-1]
+    if term.startswith('"'):
+        end = term.rfind('"')
+        value = term[1:end if end > 0 else None]
+        if "\\" not in value:
+            return value
+        out = []
+        i = 0
+        while i < len(value):
+            if value[i] == "\\" and i + 1 < len(value):
+                out.append(_ESCAPES.get(value[i + 1], value[i + 1]))
+                i += 2
+            else:
+                out.append(value[i])
+                i += 1
+        return "".join(out)
+    return term
+
+
+def _tsv_rows(lines):
+    """Value rows of TSV result lines, header skipped."""
+    header = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if header:
+            header = False
+            continue
+        if line:
+            yield [term_value(term) for term in line.split("\t")]
+
+
+def sparql_rows(query, endpoint=SPARQL_ENDPOINT, page_size=PAGE_SIZE):
+    """
+    Streams the rows of a SELECT query as TSV. With a page_size, LIMIT/OFFSET
+    pages are requested until one comes back short; the query should then have a
+    deterministic order (QLever returns the same order for the same index), and
+    must not have its own LIMIT.
+
+    Yields:
+        list: The values of a row.
+    """
+    offset = 0
+    while True:
+        paged = query if page_size is None else f"{query.rstrip()}\nLIMIT {page_size} OFFSET {offset}"
+        response = Http.post(endpoint, data={"query": paged}, headers={"Accept": "text/tab-separated-values"},
+                             stream=True)
+        count = 0
+        try:
+            response.raise_for_status()
+            for row in _tsv_rows(response.iter_lines()):
+                count += 1
+                yield row
+        finally:
+            response.close()
+        if page_size is None or count < page_size:
+            return
+        offset += page_size
+
+
+def file_rows(path):
+    """
+    Streams the rows of a saved query result: QLever TSV (N-Triples terms) for
+    .tsv files, SPARQL CSV (plain values) otherwise.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith(".tsv"):
+            yield from _tsv_rows(f)
+        else:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
+
+
+def _edges(rows):
+    """(source, predicate, target, source type, target type) of result rows."""
+    for row in rows:
+        if len(row) == 2:
+            yield row[0], None, row[1], None, None
+        else:
+            source, predicate, target = row[:3]
+            yield (source, predicate, target, row[3] if len(row) > 3 else None,
+                   row[4] if len(row) > 4 else None)
+
+
+class GraphWriter:
+    """
+    Writes nodes and edges of one graph file as they arrive.
+
+    Args:
+        path (str): Output file.
+        fmt (str): One of FORMATS.
+        directed (bool): Whether edges are directed; the notebook graphs are not.
+    """
+
+    def __init__(self, path, fmt, directed=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown graph format {fmt!r}, expected one of {FORMATS}")
+        self.path = path
+        self.fmt = fmt
+        self.directed = directed
+        self.node_ids = {}
+        self.node_types = []
+        self.predicate_ids = {}
+        self.edges = 0
+        self.tmp_dir = tempfile.mkdtemp(prefix="pdn2rdf-graph-", dir=os.path.dirname(path) or ".")
+        self.out = open(path, 'w', encoding='utf-8', newline='\n') if fmt != "npz" else None
+        if fmt == "graphml":
+            self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                           '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                           '  <key id="type" for="node" attr.name="type" attr.type="string"/>\n'
+                           '  <key id="predicate" for="edge" attr.name="predicate" attr.type="string"/>\n'
+                           f'  <graph id="G" edgedefault="{"directed" if directed else "undirected"}">\n')
+        elif fmt == "gexf":
+            # Nodes must come before edges, so edges wait in a file of their own
+            self.edge_file = open(os.path.join(self.tmp_dir, "edges.xml"), 'w', encoding='utf-8')
+            self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                           '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n'
+                           f'  <graph mode="static" defaultedgetype="{"directed" if directed else "undirected"}">\n'
+                           '    <attributes class="node">\n'
+                           '      <attribute id="type" title="type" type="string"/>\n'
+                           '    </attributes>\n'
+                           '    <nodes>\n')
+        elif fmt == "edgelist":
+            self.node_file = open(os.path.splitext(path)[0] + ".nodes.tsv", 'w', encoding='utf-8', newline='\n')
+            self.node_file.write("id\tlabel\ttype\n")
+            self.out.write("source\ttarget\tpredicate\n")
+        else:
+            self.edge_file = open(os.path.join(self.tmp_dir, "edges.bin"), 'wb')
+            self.buffer = array('i')
+
+    def node(self, label, node_type=None):
+        """Integer ID of a node, written out the first time it is seen."""
+        node_id = self.node_ids.get(label)
+        if node_id is not None:
+            return node_id
+        node_id = self.node_ids[label] = len(self.node_ids)
+        node_type = node_type or ""
+        self.node_types.append(node_type)
+        if self.fmt == "graphml":
+            self.out.write(f'    <node id={quoteattr(label)}><data key="type">{escape(node_type)}</data></node>\n')
+        elif self.fmt == "gexf":
+            self.out.write(f'      <node id="{node_id}" label={quoteattr(label)}><attvalues>'
+                           f'<attvalue for="type" value={quoteattr(node_type)}/></attvalues></node>\n')
+        elif self.fmt == "edgelist":
+            self.node_file.write(f"{node_id}\t{_tsv_field(label)}\t{_tsv_field(node_type)}\n")
+        return node_id
+
+    def edge(self, source, predicate, target, source_type=None, target_type=None):
+        source_id = self.node(source, source_type)
+        target_id = self.node(target, target_type)
+        predicate = predicate or ""
+        predicate_id = self.predicate_ids.setdefault(predicate, len(self.predicate_ids))
+        if self.fmt == "graphml":
+            self.out.write(f'    <edge source={quoteattr(source)} target={quoteattr(target)}>'
+                           f'<data key="predicate">{escape(predicate)}</data></edge>\n')
+        elif self.fmt == "gexf":
+            self.edge_file.write(f'      <edge id="{self.edges}" source="{source_id}" target="{target_id}" '
+                                 f'label={quoteattr(predicate)}/>\n')
+        elif self.fmt == "edgelist":
+            self.out.write(f"{source_id}\t{target_id}\t{_tsv_field(predicate)}\n")
+        else:
+            self.buffer.extend((source_id, target_id, predicate_id))
+            if len(self.buffer) >= 3 * 65536:
+                self.buffer.tofile(self.edge_file)
+                del self.buffer[:]
+        self.edges += 1
+
+    def close(self):
+        try:
+            if self.fmt == "graphml":
+                self.out.write("  </graph>\n</graphml>\n")
+            elif self.fmt == "gexf":
+                self.edge_file.close()
+                self.out.write("    </nodes>\n    <edges>\n")
+                with open(self.edge_file.name, 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, self.out)
+                self.out.write("    </edges>\n  </graph>\n</gexf>\n")
+            elif self.fmt == "edgelist":
+                self.node_file.close()
+            else:
+                self.buffer.tofile(self.edge_file)
+                self.edge_file.close()
+                self._write_csr()
+        finally:
+            if self.out is not None:
+                self.out.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write_csr(self):
+        import numpy as np
+
+        edges = np.fromfile(self.edge_file.name, dtype=np.int32).reshape(-1, 3)
+        order = np.argsort(edges[:, 0], kind="stable")
+        indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges[:, 0], minlength=len(self.node_ids)), out=indptr[1:])
+        types = sorted(set(self.node_types))
+        type_index = {t: i for i, t in enumerate(types)}
+        with open(self.path, 'wb') as f:
+            np.savez(f, indptr=indptr, indices=edges[order, 1], edge_predicate=edges[order, 2],
+                     nodes=np.array(list(self.node_ids), dtype=str),
+                     node_type=np.array([type_index[t] for t in self.node_types], dtype=np.int32),
+                     types=np.array(types, dtype=str), predicates=np.array(list(self.predicate_ids), dtype=str),
+                     directed=np.array(self.directed))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _tsv_field(value):
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def export(rows, path, fmt=None, directed=False):
+    """
+    Writes result rows as a graph file.
+
+    Args:
+        rows (iterable): Rows from sparql_rows or file_rows.
+        path (str): Output file.
+        fmt (str): One of FORMATS; taken from the file extension if None.
+        directed (bool): Whether edges are directed.
+
+    Returns:
+        dict: Nodes and edges written.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".")
+    with GraphWriter(path, fmt, directed) as writer:
+        for edge in _edges(rows):
+            writer.edge(*edge)
+    return {"nodes": len(writer.node_ids), "edges": writer.edges, "predicates": len(writer.predicate_ids)}
@@ -0,0 +1,141 @@
+"""
+Checkpoint/manifest store for incremental harvesting.
+
+For every taxon it records the last harvested state: number of runs, the
+last_updated watermark and a content hash over the runs' N-Triples. For every run
+it keeps the ENA row and the hash of its document, so a re-run can tell new,
+changed and deleted runs apart and rebuild the triples it previously emitted.
+Harvests are numbered; a harvest that did not finish is resumed, skipping the
+taxa it already committed.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CHECKPOINT_FILE = "data/cache/harvest.sqlite"
+
+
+def document_hash(ntriples):
+    return hashlib.sha256(ntriples.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite-backed harvest checkpoints. Safe to share between worker threads.
+
+    Args:
+        path (str): SQLite file; CHECKPOINT_FILE if None.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CHECKPOINT_FILE
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS harvests (
+                    harvest_id INTEGER PRIMARY KEY,
+                    started REAL NOT NULL,
+                    finished REAL);
+                CREATE TABLE IF NOT EXISTS taxa (
+                    taxon_id TEXT PRIMARY KEY,
+                    harvest_id INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    last_updated TEXT,
+                    content_hash TEXT NOT NULL,
+                    names TEXT NOT NULL,
+                    finished REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS runs (
+                    taxon_id TEXT NOT NULL,
+                    run_accession TEXT NOT NULL,
+                    last_updated TEXT,
+                    content_hash TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    PRIMARY KEY (taxon_id, run_accession));
+            """)
+
+    def begin_harvest(self):
+        """Returns the ID of the unfinished harvest to resume, or of a new one."""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT harvest_id FROM harvests WHERE finished IS NULL "
+                                    "ORDER BY harvest_id DESC LIMIT 1").fetchone()
+            if row is not None:
+                return row[0]
+            return self.conn.execute("INSERT INTO harvests (started) VALUES (?)", (time.time(),)).lastrowid
+
+    def finish_harvest(self, harvest_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE harvests SET finished = ? WHERE harvest_id = ?", (time.time(), harvest_id))
+
+    def finished_taxa(self, harvest_id):
+        """Taxon IDs (as str) already committed by a harvest."""
+        with self.lock:
+            rows = self.conn.execute("SELECT taxon_id FROM taxa WHERE harvest_id = ?", (harvest_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def taxon_state(self, taxon_id):
+        """Last committed state of a taxon as a dict, or None if it was never harvested."""
+        with self.lock:
+            row = self.conn.execute("SELECT harvest_id, row_count, last_updated, content_hash, names, finished "
+                                    "FROM taxa WHERE taxon_id = ?", (str(taxon_id),)).fetchone()
+        if row is None:
+            return None
+        return {"harvest_id": row[0], "row_count": row[1], "last_updated": row[2], "content_hash": row[3],
+                "names": json.loads(row[4]), "finished": row[5]}
+
+    def run_hashes(self, taxon_id):
+        """Run accession to document hash for every run of a taxon."""
+        with self.lock:
+            rows = self.conn.execute("SELECT run_accession, content_hash FROM runs WHERE taxon_id = ?",
+                                     (str(taxon_id),)).fetchall()
+        return dict(rows)
+
+    def stored_rows(self, taxon_id, batch_size=10000):
+        """
+        Yields the stored ENA rows of a taxon in batches, as lists of dicts.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT row FROM runs WHERE taxon_id = ? ORDER BY run_accession",
+                                     (str(taxon_id),)).fetchall()
+        for start in range(0, len(rows), batch_size):
+            yield [json.loads(row[0]) for row in rows[start:start + batch_size]]
+
+    def commit_taxon(self, harvest_id, taxon_id, names, upserts, deletes):
+        """
+        Records a harvested taxon in one transaction.
+
+        Args:
+            harvest_id (int): Harvest committing the taxon.
+            taxon_id (int): NCBI taxonomy ID.
+            names (tuple): Pathogen name, agent class and cleaned name used for the triples.
+            upserts (list): (run_accession, last_updated, content_hash, row dict) of new or changed runs.
+            deletes (list): Run accessions that are gone.
+
+        Returns:
+            dict: The new taxon state, as taxon_state returns it.
+        """
+        taxon_id = str(taxon_id)
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM runs WHERE taxon_id = ? AND run_accession = ?",
+                                  [(taxon_id, accession) for accession in deletes])
+            self.conn.executemany("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                                  [(taxon_id, accession, last_updated, content_hash, json.dumps(row))
+                                   for accession, last_updated, content_hash, row in upserts])
+            digest = hashlib.sha256()
+            row_count = 0
+            for accession, content_hash in self.conn.execute(
+                    "SELECT run_accession, content_hash FROM runs WHERE taxon_id = ? ORDER BY run_accession",
+                    (taxon_id,)):
+                digest.update(f"{accession} {content_hash}\n".encode('utf-8'))
+                row_count += 1
+            last_updated = self.conn.execute("SELECT MAX(last_updated) FROM runs WHERE taxon_id = ?",
+                                             (taxon_id,)).fetchone()[0]
+            self.conn.execute("INSERT OR REPLACE INTO taxa VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (taxon_id, harvest_id, row_count, last_updated, digest.hexdigest(),
+                               json.dumps(list(names)), time.time()))
+        return self.taxon_state(taxon_id)
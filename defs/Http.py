@@ -0,0 +1,154 @@
+"""
+Shared HTTP plumbing for the pipeline: one pooled keep-alive requests.Session per
+thread, and per-host concurrency limits so that concurrent harvesting never has more
+than HOST_LIMITS[host] requests in flight against any one service. Hosts listed in
+HOST_RATES are additionally held to that many requests started per second.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from defs import Instrumentation
+
+# Maximum number of concurrent requests per host[:port] (ENA, UniProt, the LLM endpoint)
+HOST_LIMITS = {
+    "www.ebi.ac.uk": 4,
+    "rest.uniprot.org": 4,
+    "lambda5.cels.anl.gov:44497": 2,
+}
+DEFAULT_HOST_LIMIT = 4
+
+# Maximum number of requests started per second per host[:port]; hosts not listed are not rate limited
+HOST_RATES = {
+    "www.ebi.ac.uk": 10,
+}
+
+DEFAULT_TIMEOUT = 60  # seconds, applied by get() and post()
+
+# Transient failures (rate limiting, gateway errors) are retried with backoff
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+              allowed_methods=None, raise_on_status=False)
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+_next_start = {}
+_rate_lock = threading.Lock()
+_local = threading.local()
+
+
+def host_slot(url):
+    """
+    Returns the semaphore bounding concurrent requests to the host of a URL.
+
+    Use it as a context manager around calls that do not go through session(),
+    e.g. the OpenAI client: ``with Http.host_slot(url): ...``.
+    """
+    host = urlsplit(url).netloc
+    with _semaphores_lock:
+        if host not in _semaphores:
+            _semaphores[host] = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _semaphores[host]
+
+
+def wait_for_rate(url):
+    """Sleeps until a request to the host of a URL is allowed by HOST_RATES."""
+    host = urlsplit(url).netloc
+    rate = HOST_RATES.get(host)
+    if not rate:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        start = max(now, _next_start.get(host, now))
+        _next_start[host] = start + 1.0 / rate
+    time.sleep(start - now)
+
+
+def _hold_until_released(response, slot):
+    """
+    Keeps the host slot of a streamed response until its connection is released:
+    when the body has been read to the end, or the response is closed.
+    """
+    release_conn = response.raw.release_conn
+    held = [True]
+    lock = threading.Lock()
+
+    def release():
+        try:
+            release_conn()
+        finally:
+            with lock:
+                was_held, held[0] = held[0], False
+            if was_held:
+                slot.release()
+
+    response.raw.release_conn = release
+
+
+class HostLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that holds the host slot, and keeps to the host rate, while a request
+    is being sent and its body read: a streamed (stream=True) response keeps the slot
+    until its body has been read or it is closed, so callers must close it (``with``).
+    With Instrumentation on, each request is a span with its wait for the slot,
+    status and bytes.
+    """
+
+    def _send(self, request, trace=None, **kwargs):
+        slot = host_slot(request.url)
+        start = time.perf_counter()
+        slot.acquire()
+        try:
+            wait_for_rate(request.url)
+            if trace is not None:
+                trace.add(wait_seconds=round(time.perf_counter() - start, 6))
+            response = super().send(request, **kwargs)
+            if not kwargs.get("stream"):
+                response.content  # read the body while holding the slot
+        except BaseException:
+            slot.release()
+            raise
+        if kwargs.get("stream"):
+            _hold_until_released(response, slot)
+        else:
+            slot.release()
+        return response
+
+    def send(self, request, **kwargs):
+        if not Instrumentation.ENABLED:
+            return self._send(request, **kwargs)
+
+        host = urlsplit(request.url).netloc
+        with Instrumentation.span("http", host=host, method=request.method) as trace:
+            response = self._send(request, trace, **kwargs)
+            # A streamed body is read later by the caller; count what the server announced
+            size = int(response.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(response.content)
+            trace.add(status=response.status_code, bytes=size)
+        Instrumentation.count("http_requests", host=host, status=response.status_code)
+        Instrumentation.count("http_bytes", size, host=host)
+        return response
+
+
+def session():
+    """Returns this thread's keep-alive session, creating it on first use."""
+    if getattr(_local, "session", None) is None:
+        s = requests.Session()
+        adapter = HostLimitedAdapter(pool_maxsize=max(HOST_LIMITS.values()), max_retries=RETRY)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        _local.session = s
+    return _local.session
+
+
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    return session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    return session().post(url, **kwargs)
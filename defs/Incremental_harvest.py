@@ -0,0 +1,203 @@
+"""
+Incremental harvesting with per-taxon checkpoints (Harvest_checkpoint).
+
+A taxon that was harvested before is only re-fetched from its last_updated
+watermark, plus a bare list of its run accessions to spot deleted runs. Runs whose
+N-Triples hash is unchanged are left alone; new and changed runs are written to the
+sink again and deleted runs removed from it (per-run files only; shards are
+append-only). Each harvest also writes the triples it adds and removes per taxon
+to DELTA_DIR/<harvest_id>/<taxon>.add.nt and .delete.nt, so the triplestore can be
+updated without reloading everything.
+
+A harvest that fails part way is resumed by the next call, skipping the taxa it
+already committed.
+"""
+
+import os
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from defs import ENA_tax_eq
+from defs import Harvest_checkpoint
+from defs import Template_emitter
+from defs import Triple_sink
+
+DELTA_DIR = "data/deltas"
+
+
+def _rows(df):
+    """ENA rows of a DataFrame as dicts of str, None for missing values."""
+    fields = ENA_tax_eq.ENA_FIELDS.split(',')
+    df = df.reindex(columns=fields)
+    return [{field: None if pd.isna(value) else str(value) for field, value in zip(fields, values)}
+            for values in df.itertuples(index=False)]
+
+
+def _documents(emitter, rows, names):
+    """N-Triples documents of stored/canonical rows, in order."""
+    df = pd.DataFrame(rows, columns=ENA_tax_eq.ENA_FIELDS.split(','), dtype=object)
+    return ENA_tax_eq.convert_frame(df, emitter, *names)
+
+
+def _delta_paths(delta_dir, harvest_id, taxon):
+    directory = os.path.join(delta_dir, str(harvest_id))
+    return os.path.join(directory, f"{taxon}.add.nt"), os.path.join(directory, f"{taxon}.delete.nt")
+
+
+def _removed_triples(store, emitter, taxon, old_names, names, replaced, upserts):
+    """
+    Triples of the replaced (changed or deleted) runs' previous documents that no
+    current document of the taxon still asserts. Shared disease, taxon and
+    agent-class triples therefore survive as long as any run carries them.
+    """
+    removed = set()
+    for rows in store.stored_rows(taxon):
+        rows = [row for row in rows if row['run_accession'] in replaced]
+        if rows:
+            for ntriples in _documents(emitter, rows, old_names):
+                removed.update(ntriples.splitlines(keepends=True))
+    if not removed:
+        return removed
+
+    for rows in store.stored_rows(taxon):
+        rows = [row for row in rows if row['run_accession'] not in replaced]
+        if rows:
+            for ntriples in _documents(emitter, rows, names):
+                removed.difference_update(ntriples.splitlines(keepends=True))
+    new_rows = [row for _, _, _, row in upserts]
+    for start in range(0, len(new_rows), 10000):
+        for ntriples in _documents(emitter, new_rows[start:start + 10000], names):
+            removed.difference_update(ntriples.splitlines(keepends=True))
+    return removed
+
+
+def harvest_taxon(taxon, store, harvest_id, call_limit=100, sink=None, delta_dir=DELTA_DIR):
+    """
+    Brings one taxon up to date against its checkpoint and commits the new state.
+
+    Args:
+        taxon (int): NCBI taxonomy ID.
+        store (Harvest_checkpoint.CheckpointStore): Checkpoint store.
+        harvest_id (int): Harvest this taxon is committed under.
+        call_limit (int): Max ENA results per taxon, or None to page through every
+            run. Only uncapped harvests can use the last_updated watermark; a capped
+            harvest re-fetches its call_limit rows and compares their hashes.
+        sink: Triple_sink sink for new and changed runs; a RunFileSink on
+            ENA_tax_eq.OUTPUT_DIR if None.
+        delta_dir (str): Directory of the add/delete delta files.
+
+    Returns:
+        dict: Counts of fetched, new, changed, deleted and unchanged runs, and the
+        watermark the fetch started from (None for a full fetch).
+    """
+    emitter = Template_emitter.get_emitter(ENA_tax_eq.TEMPLATE_FILE)
+    sink = sink or Triple_sink.RunFileSink()
+    state = store.taxon_state(taxon)
+    names = ENA_tax_eq.resolve_taxon_names(taxon)
+    previous = store.run_hashes(taxon)
+
+    # New names change every document, so the taxon is then fetched in full
+    since = None
+    if state is not None and call_limit is None and state["names"] == list(names):
+        since = state["last_updated"]
+    if call_limit is not None:
+        chunks = [ENA_tax_eq.fetch_taxon_frame(taxon, call_limit)]
+    else:
+        chunks = ENA_tax_eq.fetch_ena_chunks(taxon, since=since)
+
+    add_path, delete_path = _delta_paths(delta_dir, harvest_id, taxon)
+    for path in (add_path, delete_path):
+        if os.path.exists(path):
+            os.remove(path)  # left over from an attempt that did not commit
+
+    upserts = []
+    seen = set()
+    for df in chunks:
+        rows = [row for row in _rows(df) if row['run_accession'] is not None]
+        changed = []
+        for row, ntriples in zip(rows, _documents(emitter, rows, names)):
+            accession = row['run_accession']
+            seen.add(accession)
+            content_hash = Harvest_checkpoint.document_hash(ntriples)
+            if previous.get(accession) != content_hash:
+                upserts.append((accession, row['last_updated'], content_hash, row))
+                changed.append((accession, ntriples))
+        if changed:
+            accessions, documents = zip(*changed)
+            sink.write(taxon, accessions, documents)
+            os.makedirs(os.path.dirname(add_path), exist_ok=True)
+            with open(add_path, 'a', encoding='utf-8') as f:
+                f.writelines(documents)
+
+    if since is None:
+        current = seen
+    else:
+        current = set()
+        for df in ENA_tax_eq.fetch_ena_chunks(taxon, fields='run_accession'):
+            current.update(df['run_accession'].dropna())
+    deletes = [accession for accession in previous if accession not in current]
+    sink.remove(taxon, deletes)
+
+    replaced = {accession for accession, _, _, _ in upserts if accession in previous}.union(deletes)
+    if replaced:
+        removed = _removed_triples(store, emitter, taxon, state["names"], names, replaced, upserts)
+        if removed:
+            os.makedirs(os.path.dirname(delete_path), exist_ok=True)
+            with open(delete_path, 'w', encoding='utf-8') as f:
+                f.writelines(sorted(removed))
+
+    store.commit_taxon(harvest_id, taxon, names, upserts, deletes)
+    changed_count = len([1 for accession, _, _, _ in upserts if accession in previous])
+    return {
+        "fetched": len(seen),
+        "new": len(upserts) - changed_count,
+        "changed": changed_count,
+        "deleted": len(deletes),
+        "unchanged": len(current) - len(upserts),
+        "watermark": since,
+    }
+
+
+def harvest_taxa(taxon_list, call_limit=100, max_workers=8, sink=None, delta_dir=DELTA_DIR, store=None):
+    """
+    Incrementally harvests a list of taxa, resuming the last harvest if it did not
+    finish.
+
+    Args:
+        taxon_list (list): NCBI taxonomy IDs; duplicates are harvested once.
+        call_limit (int): Max ENA results per taxon, or None for every run.
+        max_workers (int): Taxa in flight at once.
+        sink: Triple_sink sink for new and changed runs; a RunFileSink on
+            ENA_tax_eq.OUTPUT_DIR if None. The caller closes it.
+        delta_dir (str): Directory of the add/delete delta files.
+        store (Harvest_checkpoint.CheckpointStore): Checkpoint store; the default
+            CHECKPOINT_FILE if None.
+
+    Returns:
+        dict: Taxon ID to the summary harvest_taxon returned, for the taxa harvested
+        by this call.
+    """
+    store = store or Harvest_checkpoint.CheckpointStore()
+    sink = sink or Triple_sink.RunFileSink()
+    harvest_id = store.begin_harvest()
+    done = store.finished_taxa(harvest_id)
+    pending = [taxon for taxon in dict.fromkeys(taxon_list) if str(taxon) not in done]
+    if done:
+        print(f"\nResuming harvest {harvest_id}: {len(done)} taxa already done, {len(pending)} to go")
+
+    def harvest(index, taxon):
+        print(f"\nProcessing taxon {index}/{len(pending)}: {taxon}")
+        return harvest_taxon(taxon, store, harvest_id, call_limit, sink, delta_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(harvest, index, taxon) for index, taxon in enumerate(pending, 1)]
+        # Stop at the first failure: taxa not started yet are cancelled, those in flight finish,
+        # and the first failure is re-raised; taxa committed so far are skipped on resume
+        _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        summaries = {taxon: future.result() for taxon, future in zip(pending, futures) if not future.cancelled()}
+
+    store.finish_harvest(harvest_id)
+    return summaries
@@ -0,0 +1,265 @@
+"""
+Timing spans and counters for the pipeline stages, so a slow run shows whether it
+waits on ENA, UniProt, the LLM, conversion or the disk.
+
+Off by default, and then span() hands back one shared no-op object and count()
+returns straight away. configure() turns it on, or the environment does for any
+entry point: PDN2RDF_TRACE=<file> writes the trace, PDN2RDF_METRICS_PORT=<port>
+serves the metrics. While on:
+
+- every span is appended to the trace as one JSON line: start time, stage,
+  seconds, its labels (taxon, host, ...) and the fields added to it (rows,
+  triples, bytes, ...); counters go into the trace when it is closed;
+- spans are also summarized per stage (count, sum, p50, p95) and counters
+  (bytes, rows, triples, cache lookups, LLM tokens) are summed per label set, for
+  snapshot() and for a Prometheus text endpoint (serve()).
+
+Worker processes inherit the environment and append their spans to the same
+trace; their counters and summaries stay in the worker, and only the main process
+serves the port.
+"""
+
+import atexit
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+TRACE_ENV = "PDN2RDF_TRACE"
+PORT_ENV = "PDN2RDF_METRICS_PORT"
+METRICS_WINDOW = 1000  # latest samples kept per metric
+PREFIX = "pdn2rdf"
+
+ENABLED = False
+
+_lock = threading.Lock()
+_trace = None
+_server = None
+_stage_totals = {}  # stage -> [count, seconds]
+_counters = {}  # (name, sorted label items) -> value
+
+
+class LatencyMetrics:
+    """Latest METRICS_WINDOW samples (seconds) of each named latency."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.samples = {}
+
+    def record(self, name, seconds):
+        self.samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self):
+        """Count, mean, p50 and p95 of each metric, in seconds."""
+        result = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[name] = {"count": len(ordered), "mean": round(statistics.fmean(ordered), 4),
+                            "p50": round(ordered[len(ordered) // 2], 4),
+                            "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4)}
+        return result
+
+
+STAGES = LatencyMetrics()
+
+
+class _NullSpan:
+    """What span() returns while instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed stage; fields added while it runs are written with it."""
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.fields = labels
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        _record(self.stage, seconds, self.wall, self.fields)
+        return False
+
+    def add(self, **fields):
+        """Adds to the span's numeric fields (rows=..., bytes=...), or sets other ones."""
+        for key, value in fields.items():
+            if isinstance(value, (int, float)) and isinstance(self.fields.get(key), (int, float)):
+                self.fields[key] += value
+            else:
+                self.fields[key] = value
+
+
+def span(stage, **labels):
+    """
+    Times a stage: ``with Instrumentation.span("convert", taxon=taxon) as s: ...``,
+    then ``s.add(rows=..., triples=...)``.
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(stage, labels)
+
+
+def count(name, value=1, **labels):
+    """Adds value to the counter name with these labels (keep them few: host, namespace, kind)."""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def count_triples(documents):
+    """Triples in a list of N-Triples documents, 0 while off (it scans the text)."""
+    if not ENABLED:
+        return 0
+    return sum(document.count("\n") for document in documents)
+
+
+def _record(stage, seconds, wall, fields):
+    with _lock:
+        STAGES.record(stage, seconds)
+        totals = _stage_totals.setdefault(stage, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        if _trace is not None:
+            _trace.write(json.dumps({"ts": round(wall, 6), "stage": stage, "seconds": round(seconds, 6), **fields},
+                                    default=str) + "\n")
+
+
+def configure(trace_file=None, port=None, enabled=True):
+    """
+    Turns instrumentation on (or off with enabled=False), appending spans to
+    trace_file when given and serving the metrics on port when given.
+    """
+    global ENABLED, _trace
+    with _lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+        if enabled and trace_file:
+            os.makedirs(os.path.dirname(trace_file) or ".", exist_ok=True)
+            # Line-buffered, so each span is one append that other processes do not interleave
+            _trace = open(trace_file, 'a', encoding='utf-8', buffering=1)
+        ENABLED = enabled
+    if enabled and port:
+        serve(port)
+
+
+def snapshot():
+    """Per-stage count, total seconds, p50 and p95, and every counter."""
+    with _lock:
+        summary = STAGES.summary()
+        stages = {stage: {"count": n, "seconds": round(seconds, 6), "p50": summary[stage]["p50"],
+                          "p95": summary[stage]["p95"]}
+                  for stage, (n, seconds) in _stage_totals.items()}
+        counters = [{"name": name, **dict(labels), "value": value} for (name, labels), value in _counters.items()]
+    return {"stages": stages, "counters": counters}
+
+
+def print_summary():
+    """Prints the time spent in each stage and the counters, when instrumentation is on."""
+    if not ENABLED:
+        return
+    data = snapshot()
+    for stage, totals in sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"  {stage}: {totals['count']} spans, {totals['seconds']:.2f}s, p50 {totals['p50']:.3f}s, "
+              f"p95 {totals['p95']:.3f}s")
+    for counter in sorted(data["counters"], key=lambda c: c["name"]):
+        labels = ", ".join(f"{key}={value}" for key, value in counter.items() if key not in ("name", "value"))
+        print(f"  {counter['name']}{f' ({labels})' if labels else ''}: {counter['value']}")
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{_label_value(value)}"' for key, value in labels)
+
+
+def prometheus_text():
+    """The metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = [f"# TYPE {PREFIX}_stage_seconds summary"]
+    for stage, totals in sorted(data["stages"].items()):
+        label = _label_text([("stage", stage)])
+        for quantile in ("p50", "p95"):
+            lines.append(f'{PREFIX}_stage_seconds{{{label},quantile="0.{quantile[1:]}"}} {totals[quantile]}')
+        lines.append(f"{PREFIX}_stage_seconds_sum{{{label}}} {totals['seconds']}")
+        lines.append(f"{PREFIX}_stage_seconds_count{{{label}}} {totals['count']}")
+    typed = set()
+    for counter in sorted(data["counters"], key=lambda c: c["name"]):
+        metric = f"{PREFIX}_{counter['name']}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        labels = [(key, value) for key, value in counter.items() if key not in ("name", "value")]
+        lines.append(f"{metric}{{{_label_text(labels)}}} {counter['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port):
+    """Serves prometheus_text() on every path of port, from a daemon thread; returns the port."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            payload = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    if _server is None:
+        _server = ThreadingHTTPServer(("", port), MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server.server_port
+
+
+def close():
+    """Appends the counters to the trace and closes it."""
+    global _trace
+    if _trace is None:
+        return
+    data = snapshot()
+    with _lock:
+        _trace.write(json.dumps({"ts": round(time.time(), 6), "stage": "counters", "pid": os.getpid(),
+                                 "counters": data["counters"]}) + "\n")
+        _trace.close()
+        _trace = None
+
+
+atexit.register(close)
+
+if os.environ.get(TRACE_ENV) or os.environ.get(PORT_ENV):
+    import multiprocessing
+
+    # Worker processes inherit the variables; only the main process serves the port
+    port = int(os.environ.get(PORT_ENV) or 0) if multiprocessing.parent_process() is None else 0
+    configure(os.environ.get(TRACE_ENV), port or None)
@@ -0,0 +1,122 @@
+"""
+Rule-based fast path for the infectious agent class (Virus, Fungus, Helminth,
+Bacteria, Prion or Protozoa). The UniProt lineage of a taxon already fixes the
+answer for the big clades, so it is looked up in a small local table and the LLM
+(Tool_Pathogen_Class.get_pathogen_class) is only asked when no rule matches or the
+rules disagree. Which path answered each taxon is recorded for the hit rate.
+"""
+
+import threading
+
+from defs import Tool_Pathogen_Class
+from defs import Tool_Pathogen_Name_from_Taxon_ID
+from defs import Taxonomy_resolver
+
+# NCBI taxonomy IDs of clades whose members all belong to one class
+CLADE_CLASSES = {
+    10239: "Virus",      # Viruses
+    2: "Bacteria",       # Bacteria
+    4751: "Fungus",      # Fungi (includes Microsporidia)
+    6157: "Helminth",    # Platyhelminthes
+    6231: "Helminth",    # Nematoda
+    10232: "Helminth",   # Acanthocephala
+    5794: "Protozoa",    # Apicomplexa
+    33682: "Protozoa",   # Euglenozoa (Trypanosoma, Leishmania)
+    554915: "Protozoa",  # Amoebozoa (Entamoeba, Acanthamoeba)
+    5719: "Protozoa",    # Parabasalia (Trichomonas)
+    207245: "Protozoa",  # Fornicata (Giardia)
+    5752: "Protozoa",    # Heterolobosea (Naegleria)
+}
+
+# Same clades by scientific name, for lineage entries without a taxon ID
+CLADE_NAME_CLASSES = {
+    "Viruses": "Virus",
+    "Bacteria": "Bacteria",
+    "Fungi": "Fungus",
+    "Platyhelminthes": "Helminth",
+    "Nematoda": "Helminth",
+    "Acanthocephala": "Helminth",
+    "Apicomplexa": "Protozoa",
+    "Euglenozoa": "Protozoa",
+    "Amoebozoa": "Protozoa",
+    "Parabasalia": "Protozoa",
+    "Fornicata": "Protozoa",
+    "Heterolobosea": "Protozoa",
+}
+
+answered_by = {}  # taxon ID -> "lineage" or "llm"
+_batch_answers = {}  # pathogen name -> class, from prefetch_classes
+_lock = threading.Lock()
+
+
+def classify_lineage(taxon_id, lineage):
+    """
+    Returns the class fixed by the taxon and its lineage, or None when no rule
+    matches or the matching rules disagree.
+    """
+    classes = set()
+    if int(taxon_id) in CLADE_CLASSES:
+        classes.add(CLADE_CLASSES[int(taxon_id)])
+    for entry in lineage:
+        if entry.get("taxonId") in CLADE_CLASSES:
+            classes.add(CLADE_CLASSES[entry["taxonId"]])
+        elif entry.get("scientificName") in CLADE_NAME_CLASSES:
+            classes.add(CLADE_NAME_CLASSES[entry["scientificName"]])
+    return classes.pop() if len(classes) == 1 else None
+
+
+def get_pathogen_class_by_taxon_id(taxon_id, pathogen_name):
+    """
+    Infectious agent class of a taxon: from the lineage rules when they apply,
+    otherwise from the LLM.
+
+    Args:
+        taxon_id (int): NCBI taxonomy ID.
+        pathogen_name (str): Scientific name, passed to the LLM on fallback.
+
+    Returns:
+        str: One of Virus, Fungus, Helminth, Bacteria, Prion or Protozoa.
+    """
+    lineage = Tool_Pathogen_Name_from_Taxon_ID.get_lineage_by_taxon_id(taxon_id)
+    agent_class = classify_lineage(taxon_id, lineage)
+    path = "lineage"
+    if agent_class is None:
+        with _lock:
+            agent_class = _batch_answers.get(pathogen_name)
+        if agent_class is None:
+            agent_class = Tool_Pathogen_Class.get_pathogen_class(pathogen_name)
+        path = "llm"
+    with _lock:
+        answered_by[taxon_id] = path
+    return agent_class
+
+
+def prefetch_classes(taxon_ids):
+    """
+    Classifies a whole taxon list up front: names and lineages in bulk from
+    UniProt, the lineage rules, then one batched LLM classification
+    (Tool_Pathogen_Class.get_pathogen_classes) for all the taxa the rules leave
+    open, instead of a UniProt request and two completions per taxon later on.
+    """
+    Taxonomy_resolver.resolve_taxa(taxon_ids)
+    pending = []
+    for taxon_id in dict.fromkeys(taxon_ids):
+        entry = Tool_Pathogen_Name_from_Taxon_ID.get_taxon_entry(taxon_id)
+        if classify_lineage(taxon_id, entry["lineage"]) is None:
+            pending.append(entry["scientificName"])
+    if pending:
+        answers = Tool_Pathogen_Class.get_pathogen_classes(pending)
+        with _lock:
+            _batch_answers.update(answers)
+
+
+def stats():
+    """Number of taxa answered by each path and the share answered without the LLM."""
+    with _lock:
+        paths = list(answered_by.values())
+    lineage = paths.count("lineage")
+    return {
+        "lineage": lineage,
+        "llm": paths.count("llm"),
+        "hit_rate": lineage / len(paths) if paths else 0.0,
+    }
@@ -0,0 +1,179 @@
+"""
+Persistent cache for the taxon-name, lineage and pathogen-class lookups.
+
+Answers are kept in a SQLite file keyed by namespace and key (taxon ID or pathogen
+name), with an in-process LRU in front of it. An entry is ignored once it is older
+than its TTL or was written under another version, so bumping a namespace version
+(e.g. when the model or prompt changes) invalidates all of its entries.
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from defs import Instrumentation
+
+CACHE_FILE = "data/cache/lookups.sqlite"
+DEFAULT_TTL = 90 * 24 * 3600  # seconds
+LRU_SIZE = 4096
+
+ENABLED = True  # Set to False to always call UniProt and the LLM
+
+_MISS = object()
+_caches = {}
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _connection(path):
+    with _connections_lock:
+        if path not in _connections:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("""CREATE TABLE IF NOT EXISTS lookups (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                version TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (namespace, key))""")
+            conn.commit()
+            _connections[path] = (conn, threading.Lock())
+        return _connections[path]
+
+
+class LookupCache:
+    """
+    One namespace of the lookup cache.
+
+    Args:
+        namespace (str): Kind of lookup, e.g. "taxon_name".
+        version (str): Entries written under another version are misses.
+        ttl (float): Seconds an entry stays valid.
+        path (str): SQLite file; CACHE_FILE if None.
+    """
+
+    def __init__(self, namespace, version="1", ttl=DEFAULT_TTL, path=None):
+        self.namespace = namespace
+        self.version = str(version)
+        self.ttl = ttl
+        self.path = path
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        key = str(key)
+        with self.lock:
+            if key in self.memory:
+                value, created = self.memory[key]
+                if created + self.ttl >= time.time():
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    Instrumentation.count("cache_lookups", namespace=self.namespace, result="memory")
+                    return value
+                del self.memory[key]  # expired, as its row on disk
+
+        conn, conn_lock = _connection(self.path or CACHE_FILE)
+        with conn_lock:
+            row = conn.execute("SELECT value, version, created FROM lookups WHERE namespace = ? AND key = ?",
+                               (self.namespace, key)).fetchone()
+        with self.lock:
+            if row is None or row[1] != self.version or row[2] + self.ttl < time.time():
+                self.misses += 1
+                Instrumentation.count("cache_lookups", namespace=self.namespace, result="miss")
+                return _MISS
+            self.hits += 1
+            self.disk_hits += 1
+            Instrumentation.count("cache_lookups", namespace=self.namespace, result="disk")
+            value = json.loads(row[0])
+            self._remember(key, value, row[2])
+            return value
+
+    def get_many(self, keys):
+        """Cached values of the keys that are hits, as a dict."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not _MISS:
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        key = str(key)
+        created = time.time()
+        conn, conn_lock = _connection(self.path or CACHE_FILE)
+        with conn_lock:
+            conn.execute("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)",
+                         (self.namespace, key, json.dumps(value), self.version, created))
+            conn.commit()
+        with self.lock:
+            self._remember(key, value, created)
+
+    def _remember(self, key, value, created):
+        """Keeps a value in the LRU with the time it was written, so it expires as on disk."""
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > LRU_SIZE:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+def get_cache(namespace, version="1", ttl=DEFAULT_TTL):
+    """
+    Returns the cache of a namespace, creating it on first use.
+
+    Raises:
+        ValueError: The namespace is already in use under another version. Entries
+            are keyed by namespace and key only, so two versions of one namespace
+            would overwrite each other's answers; give the lookup its own namespace.
+    """
+    if namespace not in _caches:
+        _caches[namespace] = LookupCache(namespace, version, ttl)
+    elif _caches[namespace].version != str(version):
+        raise ValueError(f"Lookup cache namespace {namespace!r} is version {_caches[namespace].version!r}, "
+                         f"not {str(version)!r}")
+    return _caches[namespace]
+
+
+def cached(namespace, version="1", ttl=DEFAULT_TTL, keep=None):
+    """
+    Decorator caching a single-argument lookup function under a namespace.
+
+    Exceptions are not cached, and neither are values for which ``keep(value)``
+    is false (e.g. an empty name). The wrapped function stays reachable as
+    ``func.uncached``.
+    """
+    cache = get_cache(namespace, version, ttl)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            key = args[0] if args else next(iter(kwargs.values()))
+            value = cache.get(key)
+            if value is _MISS:
+                value = func(*args, **kwargs)
+                if keep is None or keep(value):
+                    cache.set(key, value)
+            return value
+
+        wrapper.uncached = func
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def stats():
+    """Hit/miss counters of every namespace."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
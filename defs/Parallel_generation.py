@@ -0,0 +1,100 @@
+"""
+Process-pool RDF generation. Converting ENA rows to N-Triples is pure Python and
+holds the GIL, so threads do not speed it up; this stage ships chunks of rows and
+their pre-resolved pathogen names to worker processes and hands the documents they
+return, in order, to a single writer (a Triple_sink sink).
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from defs import ENA_tax_eq
+from defs import Template_emitter
+
+
+def convert_chunk(template_file, df, names, split_shared=False):
+    """
+    Worker side: converts one chunk of ENA rows.
+
+    Args:
+        template_file (str): JSON-LD template; compiled once per process.
+        df (pandas.DataFrame): ENA rows.
+        names (tuple): Pathogen name, agent class and cleaned name of the taxon.
+        split_shared (bool): Return the shared-entity triples apart from the run
+            documents, for the writer to deduplicate with a SharedTriples.
+
+    Returns:
+        list: One N-Triples document per row, or (documents, shared lines) with split_shared.
+    """
+    emitter = Template_emitter.get_emitter(template_file)
+    if not split_shared:
+        return ENA_tax_eq.convert_frame(df, emitter, *names).tolist()
+    shared_lines = []
+    documents = emitter.emit_frame(ENA_tax_eq.frame_slot_values(df, *names), df.index, shared_lines)
+    return documents.tolist(), shared_lines
+
+
+def project(df):
+    """The columns the template needs, so only those are pickled to the workers."""
+    return df.reindex(columns=ENA_tax_eq.ENA_FIELDS.split(','))
+
+
+def process_pool(processes=None):
+    """
+    A pool for convert_chunk; one process per core if processes is None. Workers
+    are not forked from the (multi-threaded) harvester but started by a fork
+    server, or spawned where there is none.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count(),
+                               mp_context=multiprocessing.get_context(method))
+
+
+def generate(batches, sink, processes=None, max_pending=None, template_file=None, pool=None, shared=None):
+    """
+    Converts batches of ENA rows in worker processes and writes them in order.
+
+    Args:
+        batches (iterable): (taxon, DataFrame, names) tuples, names as returned by
+            ENA_tax_eq.resolve_taxon_names.
+        sink: Triple_sink sink the results are written to, from this thread only.
+        processes (int): Worker processes; one per core if None.
+        max_pending (int): Chunks submitted but not yet written; twice the number
+            of processes if None. Bounds memory when the writer falls behind.
+        template_file (str): JSON-LD template, ENA_tax_eq.TEMPLATE_FILE if None.
+        pool (ProcessPoolExecutor): Pool to reuse instead of starting one.
+        shared (Template_emitter.SharedTriples): Collect the shared-entity triples
+            there, here in the writer since workers have no common state.
+
+    Returns:
+        int: Number of runs written.
+    """
+    template_file = os.path.abspath(template_file or ENA_tax_eq.TEMPLATE_FILE)
+    own_pool = pool is None
+    pool = pool or process_pool(processes)
+    max_pending = max_pending or 2 * (processes or os.cpu_count())
+    pending = deque()
+    written = 0
+
+    def write_oldest():
+        taxon, run_accessions, future = pending.popleft()
+        documents = future.result()
+        if shared is not None:
+            documents = shared.collect(*documents)
+        return sink.write(taxon, run_accessions, documents)
+
+    try:
+        for taxon, df, names in batches:
+            df = project(df)
+            pending.append((taxon, df['run_accession'].tolist(),
+                            pool.submit(convert_chunk, template_file, df, tuple(names), shared is not None)))
+            if len(pending) >= max_pending:
+                written += write_oldest()
+        while pending:
+            written += write_oldest()
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+    return written
@@ -0,0 +1,290 @@
+"""
+Keeps the QLever index in step with the shards (Triple_sink.ShardSink) and the
+delta files (Incremental_harvest) without rebuilding it on every harvest.
+
+The loader remembers which shards and delta harvests it has loaded, in
+LOAD_STATE_FILE. Shards only ever get added by incremental harvests, so new shards
+and delete deltas can be pushed into the running server as batched SPARQL
+UPDATE requests (INSERT DATA / DELETE DATA). A shard set that was replaced or
+rewritten, or a first load, needs a full `qlever index` instead; the delete deltas
+written since the shard set was started are then replayed on top of it. Each load
+step is timed.
+"""
+
+import gzip
+import io
+import json
+import os
+import subprocess
+import time
+
+from defs import Http
+from defs import Incremental_harvest
+from defs import Triple_sink
+
+LOAD_STATE_FILE = "data/cache/qlever_load.json"
+QLEVERFILE_DIR = "triplestore/BV-BRC"
+SPARQL_ENDPOINT = "http://localhost:7007"  # [server] PORT in the Qleverfile
+BATCH_TRIPLES = 10000  # triples per SPARQL UPDATE request
+# Subdirectories of the shard directory holding shard sets with their own manifest
+# (EBI_search_rdf.SHARD_DIR, Graph_analytics.SHARD_DIR); the Qleverfile GET_DATA_CMD lists the same ones
+SHARD_SUBDIRS = ["ebisearch", "metrics"]
+
+# Run in QLEVERFILE_DIR, in order, for a full rebuild
+REBUILD_CMDS = [
+    "qlever stop",
+    "qlever get-data",
+    "qlever index --overwrite-existing",
+    "qlever start",
+]
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _fingerprint(shard):
+    """What identifies a shard's content in the manifest."""
+    return {key: shard.get(key) for key in ("bytes", "compressed_bytes", "triples")}
+
+
+def _split_line(line, quads):
+    """(triple, graph IRI or None) of an N-Triples or N-Quads line."""
+    statement = line.rstrip()[:-1].rstrip()  # drop the final " ."
+    if not quads:
+        return statement, None
+    # The graph is always an IRI, so it is the last space-separated term
+    triple, _, graph = statement.rpartition(" ")
+    return triple, graph[1:-1]
+
+
+class SparqlUpdater:
+    """
+    Sends INSERT DATA / DELETE DATA requests to a SPARQL endpoint in batches.
+
+    Args:
+        endpoint (str): Endpoint URL, SPARQL_ENDPOINT if None.
+        access_token (str): QLever access token for updates, if the server needs one.
+        batch_triples (int): Triples per request.
+    """
+
+    def __init__(self, endpoint=None, access_token=None, batch_triples=BATCH_TRIPLES):
+        self.endpoint = endpoint or SPARQL_ENDPOINT
+        self.access_token = access_token
+        self.batch_triples = batch_triples
+        self.requests = 0
+        self.triples = 0
+
+    def _post(self, update):
+        headers = {'Content-Type': 'application/sparql-update'}
+        if self.access_token:
+            headers['Authorization'] = f"Bearer {self.access_token}"
+        response = Http.post(self.endpoint, data=update.encode('utf-8'), headers=headers)
+        response.raise_for_status()
+        self.requests += 1
+
+    def _send(self, operation, batch):
+        by_graph = {}
+        for triple, graph in batch:
+            by_graph.setdefault(graph, []).append(triple)
+        blocks = []
+        for graph, triples in by_graph.items():
+            body = " .\n".join(triples) + " ."
+            blocks.append(f"GRAPH <{graph}> {{\n{body}\n}}" if graph else body)
+        self._post(f"{operation} {{\n" + "\n".join(blocks) + "\n}")
+        self.triples += len(batch)
+
+    def apply(self, operation, lines, graph=None, quads=False):
+        """
+        Sends N-Triples/N-Quads lines as INSERT DATA or DELETE DATA batches.
+
+        Args:
+            operation (str): "INSERT DATA" or "DELETE DATA".
+            lines (iterable): N-Triples or N-Quads lines.
+            graph (str): Named graph of N-Triples lines; the default graph if None.
+            quads (bool): The lines are N-Quads and carry their own graph.
+
+        Returns:
+            int: Number of triples sent.
+        """
+        batch = []
+        sent = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            triple, line_graph = _split_line(line, quads)
+            batch.append((triple, line_graph or graph))
+            if len(batch) >= self.batch_triples:
+                self._send(operation, batch)
+                sent += len(batch)
+                batch = []
+        if batch:
+            self._send(operation, batch)
+            sent += len(batch)
+        return sent
+
+
+def _open_shard(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith(".zst"):
+        return io.TextIOWrapper(Triple_sink.zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')),
+                                encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+class QleverLoader:
+    """
+    Decides between nothing, a SPARQL UPDATE push and a full rebuild, and runs it.
+
+    Args:
+        shard_dir (str): Directory of the shards and their manifest.
+        sub_dirs (list): Subdirectories of shard_dir with shard sets of their own;
+            SHARD_SUBDIRS if None. Their shards are named by their relative path.
+        delta_dir (str): Directory of the incremental harvest deltas.
+        state_file (str): Where the loaded shards and deltas are remembered.
+        updater (SparqlUpdater): Endpoint to push updates to; the default endpoint if None.
+        rebuild_cmds (list): Shell commands of a full rebuild, run in qleverfile_dir
+            (REBUILD_CMDS if None); callables are called instead.
+        qleverfile_dir (str): Directory of the Qleverfile.
+    """
+
+    def __init__(self, shard_dir=Triple_sink.SHARD_DIR, delta_dir=Incremental_harvest.DELTA_DIR,
+                 state_file=LOAD_STATE_FILE, updater=None, rebuild_cmds=None, qleverfile_dir=QLEVERFILE_DIR,
+                 sub_dirs=None):
+        self.shard_dir = shard_dir
+        self.sub_dirs = SHARD_SUBDIRS if sub_dirs is None else sub_dirs
+        self.delta_dir = delta_dir
+        self.state_file = state_file
+        self.updater = updater or SparqlUpdater()
+        self.rebuild_cmds = REBUILD_CMDS if rebuild_cmds is None else rebuild_cmds
+        self.qleverfile_dir = qleverfile_dir
+        self.state = _read_json(state_file, {"shards": {}, "deltas": [], "replay": [], "loads": []})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        with open(self.state_file + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self.state_file + ".tmp", self.state_file)
+
+    def _harvests(self):
+        if not os.path.isdir(self.delta_dir):
+            return []
+        return sorted((name for name in os.listdir(self.delta_dir) if name.isdigit()), key=int)
+
+    def plan(self):
+        """
+        Compares the shard manifest and the delta directory with what was loaded.
+
+        Returns:
+            dict: "action" ("none", "update" or "rebuild"), the new, changed and
+            removed shard files, and the harvests whose deltas are not applied yet.
+        """
+        manifest = _read_json(os.path.join(self.shard_dir, "manifest.json"), {"shards": []})
+        shards = {shard["file"]: shard for shard in manifest["shards"]}
+        for sub_dir in self.sub_dirs:
+            sub_manifest = _read_json(os.path.join(self.shard_dir, sub_dir, "manifest.json"), {"shards": []})
+            shards.update({f"{sub_dir}/{shard['file']}": shard for shard in sub_manifest["shards"]})
+        loaded = self.state["shards"]
+        added = [name for name in shards if name not in loaded]
+        changed = [name for name in shards if name in loaded and loaded[name] != _fingerprint(shards[name])]
+        removed = [name for name in loaded if name not in shards]
+        pending = [harvest for harvest in self._harvests() if harvest not in self.state["deltas"]]
+
+        if changed or removed or (shards and not loaded):
+            action = "rebuild"
+        elif added or pending:
+            action = "update"
+        else:
+            action = "none"
+        return {"action": action, "added": added, "changed": changed, "removed": removed,
+                "pending_deltas": pending, "shards": shards, "quads": manifest.get("format", "nq") == "nq"}
+
+    def _delta_files(self, harvest, suffix):
+        directory = os.path.join(self.delta_dir, harvest)
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(suffix))
+
+    def _apply_deletes(self, harvests, quads):
+        """
+        Sends the delete deltas of the harvests, oldest first, into each taxon's
+        named graph when the shards are N-Quads. Triples that a later harvest added
+        again are kept.
+        """
+        sent = 0
+        all_harvests = self._harvests()
+        for harvest in harvests:
+            readded = set()
+            for later in all_harvests[all_harvests.index(harvest) + 1:]:
+                for path in self._delta_files(later, ".add.nt"):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        readded.update(f)
+            for path in self._delta_files(harvest, ".delete.nt"):
+                taxon = os.path.basename(path)[:-len(".delete.nt")]
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = [line for line in f if line not in readded]
+                graph = Triple_sink.GRAPH_IRI.format(taxon=taxon) if quads else None
+                sent += self.updater.apply("DELETE DATA", lines, graph)
+        return sent
+
+    def _step(self, timings, name, func):
+        start = time.perf_counter()
+        result = func()
+        timings.append({"step": name, "seconds": round(time.perf_counter() - start, 3)})
+        print(f"{name}: {timings[-1]['seconds']:.2f}s")
+        return result
+
+    def load(self, action=None):
+        """
+        Brings the index up to date.
+
+        Args:
+            action (str): Force "update" or "rebuild"; the plan decides if None.
+
+        Returns:
+            dict: The plan's action, per-step timings, triples sent as updates and
+            total seconds. Also appended to the load history in the state file.
+        """
+        plan = self.plan()
+        action = action or plan["action"]
+        timings = []
+        inserted = deleted = 0
+        start = time.perf_counter()
+
+        if action == "rebuild":
+            for cmd in self.rebuild_cmds:
+                if callable(cmd):
+                    self._step(timings, cmd.__name__, cmd)
+                else:
+                    self._step(timings, cmd, lambda cmd=cmd: subprocess.run(cmd, shell=True, check=True,
+                                                                             cwd=self.qleverfile_dir))
+            if plan["changed"] or plan["removed"] or not self.state["shards"]:
+                # New shard set: deltas written before it are already in it
+                self.state["replay"] = []
+                self.state["deltas"] = self._harvests()
+            else:
+                # Same append-only shards, rebuilt on request: replay their deletes
+                self.state["deltas"] = self.state["replay"] + plan["pending_deltas"]
+                self.state["replay"] = list(self.state["deltas"])
+            deleted = self._step(timings, "replay delete deltas",
+                                 lambda: self._apply_deletes(self.state["replay"], plan["quads"]))
+        elif action == "update":
+            deleted = self._step(timings, "delete deltas", lambda: self._apply_deletes(plan["pending_deltas"], plan["quads"]))
+            for name in plan["added"]:
+                def insert(name=name):
+                    with _open_shard(os.path.join(self.shard_dir, name)) as f:
+                        return self.updater.apply("INSERT DATA", f, quads=plan["quads"])
+                inserted += self._step(timings, f"insert {name}", insert)
+            self.state["deltas"] += plan["pending_deltas"]
+            self.state["replay"] += plan["pending_deltas"]
+
+        if action != "none":
+            self.state["shards"] = {name: _fingerprint(shard) for name, shard in plan["shards"].items()}
+        seconds = round(time.perf_counter() - start, 3)
+        summary = {"action": action, "time": time.time(), "seconds": seconds, "inserted": inserted,
+                   "deleted": deleted, "steps": timings}
+        self.state["loads"].append(summary)
+        self._save()
+        return summary
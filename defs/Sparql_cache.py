@@ -0,0 +1,159 @@
+"""
+Result cache for the SPARQL queries the demo chat sends to QLever.
+
+Queries are keyed on their canonical text (comments dropped, whitespace outside
+IRIs and literals collapsed) and the endpoint, so the near-identical queries of the
+retry loop and the starter questions are answered from memory. Entries are evicted
+least recently used first, and all of them are dropped once the index is rebuilt:
+QLever rewrites META_DATA_FILE on every `qlever index`, so its modification time
+and size identify the index build. The endpoint call itself runs in a worker thread
+so the event loop is not blocked while QLever answers, and concurrent requests for
+the same query share one call.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+
+from defs import Instrumentation
+
+META_DATA_FILE = "triplestore/BV-BRC/bvbrc.meta-data.json"
+LRU_SIZE = 256
+
+
+def normalize_query(query):
+    """
+    Canonical text of a SPARQL query: comments removed and runs of whitespace
+    outside IRIs and string literals turned into one space.
+    """
+    out = []
+    i = 0
+    n = len(query)
+    pending_space = False
+    while i < n:
+        c = query[i]
+        if c == '#':
+            # Comment to the end of the line ('#' inside IRIs and literals is handled below)
+            while i < n and query[i] != '\n':
+                i += 1
+            pending_space = True
+            continue
+        if c.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space and out:
+            out.append(' ')
+        pending_space = False
+        if c in '"\'':
+            # String literal, long ('''...''') or short, with backslash escapes
+            quote = query[i:i + 3] if query[i:i + 3] == c * 3 else c
+            end = i + len(quote)
+            while end < n and query[end:end + len(quote)] != quote:
+                end += 2 if query[end] == '\\' else 1
+            end = min(end + len(quote), n)
+            out.append(query[i:end])
+            i = end
+        elif c == '<' and i + 1 < n and not query[i + 1].isspace() and query[i + 1] not in '=<':
+            # IRI reference; a '<' followed by a space or '=' is a comparison
+            end = query.find('>', i)
+            if end == -1 or any(ch.isspace() for ch in query[i:end]):
+                out.append(c)
+                i += 1
+            else:
+                out.append(query[i:end + 1])
+                i = end + 1
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+class SparqlCache:
+    """
+    LRU cache in front of a SPARQL query function.
+
+    Args:
+        query_func (callable): ``query_func(query, endpoint_url)`` returning the
+            JSON results, e.g. sparql_llm.utils.query_sparql.
+        size (int): Results kept.
+        meta_data_file (str): QLever index metadata whose changes clear the cache.
+    """
+
+    def __init__(self, query_func, size=LRU_SIZE, meta_data_file=META_DATA_FILE):
+        self.query_func = query_func
+        self.size = size
+        self.meta_data_file = meta_data_file
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.index_stamp = self._index_stamp()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0  # endpoint calls; concurrent misses on one query share a call
+        self.invalidations = 0
+
+    def _index_stamp(self):
+        try:
+            stat = os.stat(self.meta_data_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _lookup(self, key):
+        with self.lock:
+            stamp = self._index_stamp()
+            if stamp != self.index_stamp:
+                self.results.clear()
+                self.index_stamp = stamp
+                self.invalidations += 1
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                Instrumentation.count("cache_lookups", namespace="sparql", result="memory")
+                return True, self.results[key]
+            self.misses += 1
+            Instrumentation.count("cache_lookups", namespace="sparql", result="miss")
+            return False, None
+
+    def _remember(self, key, result):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+
+    def query(self, query, endpoint_url):
+        """Results of a query, from the cache or the endpoint. Errors are not cached."""
+        key = (normalize_query(query), endpoint_url)
+        found, result = self._lookup(key)
+        if not found:
+            self.calls += 1
+            result = self.query_func(query, endpoint_url)
+            self._remember(key, result)
+        return result
+
+    async def aquery(self, query, endpoint_url):
+        """Async query: the endpoint is called in a worker thread, once per concurrent key."""
+        key = (normalize_query(query), endpoint_url)
+        found, result = self._lookup(key)
+        if found:
+            return result
+        if key not in self.in_flight:
+            self.calls += 1
+
+            async def call():
+                try:
+                    result = await asyncio.to_thread(self.query_func, query, endpoint_url)
+                    self._remember(key, result)
+                    return result
+                finally:
+                    del self.in_flight[key]
+            self.in_flight[key] = asyncio.ensure_future(call())
+        # shield: a cancelled session does not cancel the call other sessions wait on
+        return await asyncio.shield(self.in_flight[key])
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "calls": self.calls, "invalidations": self.invalidations,
+                "entries": len(self.results)}
@@ -0,0 +1,132 @@
+"""
+The question-to-SPARQL chat loop of demo.py, without the Chainlit UI, so it can
+also be driven by the load test (benchmarks/bench_chat_sessions.py).
+
+Everything on the event loop is non-blocking: the LLM is called through one shared
+AsyncOpenAI client (and its connection pool) and streamed with `async for`, and the
+SPARQL query runs in a worker thread (Sparql_cache). A cancelled session, e.g.
+Chainlit's stop button cancelling the message task, closes its LLM stream and
+leaves the other sessions alone. Time to first token, generation and query times
+are recorded in METRICS, and as Instrumentation spans when that is on.
+"""
+
+import json
+import time
+
+from defs import Instrumentation
+
+LLM_URL = "http://lambda5.cels.anl.gov:44497/v1"
+# LLM_URL = "https://argo-bridge.cels.anl.gov"
+MODEL = "gpt5"
+MAX_TRY_COUNT = 3
+
+_client = None
+
+
+def get_client():
+    """The AsyncOpenAI client shared by all sessions, created on first use."""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+
+        _client = AsyncOpenAI(base_url=LLM_URL, api_key=".")
+    return _client
+
+
+LatencyMetrics = Instrumentation.LatencyMetrics
+METRICS = LatencyMetrics()
+
+
+async def stream_answer(messages, client=None, model=MODEL, metrics=METRICS):
+    """
+    Streams one completion.
+
+    Yields:
+        str: Content tokens as they arrive. Time to first token and the whole
+        generation time are recorded as "ttft" and "generation".
+    """
+    client = client or get_client()
+    start = time.perf_counter()
+    first_token = True
+    chunks = 0
+    with Instrumentation.span("llm_stream", model=model) as trace:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            temperature=0.0,
+            seed=42,
+        )
+        try:
+            async for r in stream:
+                if not r.choices:
+                    continue
+                delta = r.choices[0].delta
+                if hasattr(delta, "content") and delta.content:
+                    if first_token:
+                        metrics.record("ttft", time.perf_counter() - start)
+                        trace.add(ttft=round(time.perf_counter() - start, 6))
+                        first_token = False
+                    chunks += 1
+                    yield delta.content
+        finally:
+            # Also on cancellation: release the connection instead of reading the rest
+            await stream.close()
+            # Streamed completions carry no usage; each content chunk is about one token
+            trace.add(completion_tokens=chunks)
+            Instrumentation.count("llm_tokens", chunks, kind="completion", model=model)
+    metrics.record("generation", time.perf_counter() - start)
+
+
+async def chat_turns(messages, execute_query, context=list, client=None, model=MODEL,
+                     max_try_count=MAX_TRY_COUNT, metrics=METRICS):
+    """
+    Asks for a SPARQL query, runs it, and asks again to fix a query without
+    results or to summarize the results.
+
+    Args:
+        messages (list): Opening OpenAI messages (system prompt, question, history).
+        execute_query (callable): Async function running the query in an answer and
+            returning its bindings.
+        context (callable): Current chat history as OpenAI messages, appended to
+            the follow-up requests.
+        client (AsyncOpenAI): Client to use; the shared one if None.
+        model (str): Model name.
+        max_try_count (int): Completions requested at most.
+        metrics (LatencyMetrics): Where "ttft", "generation" and "query" go.
+
+    Yields:
+        tuple: ("token", str) while an answer streams, ("answer", str) when it is
+        complete, and ("results", list) when its query returned bindings.
+    """
+    query_success = False
+    for _ in range(max_try_count):
+        parts = []
+        async for token in stream_answer(messages, client, model, metrics):
+            parts.append(token)
+            yield "token", token
+        content = "".join(parts)
+        yield "answer", content
+
+        if query_success:
+            break
+
+        start = time.perf_counter()
+        with Instrumentation.span("sparql_query") as trace:
+            query_res = await execute_query(content)
+            trace.add(results=len(query_res))
+        metrics.record("query", time.perf_counter() - start)
+        if len(query_res) < 1:
+            print("⚠️ No results, trying to fix")
+            messages = [
+                {"role": "user", "content": f"""The query you provided returned no results, please fix the query:\n\n{content}"""},
+                *context(),
+            ]
+        else:
+            print(f"✅ Got {len(query_res)} results! Summarizing them, then stopping the chat")
+            yield "results", query_res
+            messages = [
+                {"role": "user", "content": f"""The query you provided returned these results, summarize them:\n\n{json.dumps(query_res, indent=2)}"""},
+                *context(),
+            ]
+            query_success = True
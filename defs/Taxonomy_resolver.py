@@ -0,0 +1,84 @@
+"""
+Bulk UniProt taxonomy resolution. Instead of one GET per taxon ID (plus a search
+per pathogen name for the lineage), the whole taxon list is resolved with a few
+``id:(a OR b OR ...)`` searches, following the paged results over the shared
+keep-alive session. The answers land in one in-memory table that
+Tool_Pathogen_Name_from_Taxon_ID and Tool_Pathogen_Class both read from.
+"""
+
+import threading
+
+from defs import Http
+from defs import Lookup_cache
+
+UNIPROT_TAXONOMY_URL = "https://rest.uniprot.org/taxonomy"
+IDS_PER_QUERY = 100  # keeps the query URL well under UniProt's length limit
+PAGE_SIZE = 500  # UniProt's maximum page size
+
+taxa = {}  # taxon ID -> {"scientificName": str, "lineage": list}
+by_name = {}  # scientific name -> taxon ID
+_lock = threading.Lock()
+
+
+def _remember(taxon_id, entry):
+    with _lock:
+        taxa[taxon_id] = entry
+        by_name[entry["scientificName"]] = taxon_id
+
+
+def lookup_id(taxon_id):
+    """Entry of a resolved taxon ID, or None."""
+    with _lock:
+        return taxa.get(int(taxon_id))
+
+
+def lookup_name(scientific_name):
+    """Entry of a resolved taxon by scientific name, or None."""
+    with _lock:
+        taxon_id = by_name.get(scientific_name)
+        return taxa.get(taxon_id) if taxon_id is not None else None
+
+
+def resolve_taxa(taxon_ids):
+    """
+    Resolves scientific names and lineages of a list of taxon IDs.
+
+    IDs already in the table or in the taxon_entry lookup cache cost nothing; the
+    rest are fetched IDS_PER_QUERY at a time. IDs UniProt does not return (e.g.
+    merged taxa) stay unresolved and fall back to the single-ID lookup.
+
+    Args:
+        taxon_ids (list): NCBI taxonomy IDs.
+
+    Returns:
+        dict: Taxon ID to {"scientificName", "lineage"} for every resolved ID.
+    """
+    cache = Lookup_cache.get_cache("taxon_entry")
+    ids = [int(taxon_id) for taxon_id in dict.fromkeys(taxon_ids)]
+    missing = [taxon_id for taxon_id in ids if lookup_id(taxon_id) is None]
+
+    if Lookup_cache.ENABLED:
+        for key, entry in cache.get_many(missing).items():
+            _remember(int(key), entry)
+        missing = [taxon_id for taxon_id in missing if lookup_id(taxon_id) is None]
+
+    for start in range(0, len(missing), IDS_PER_QUERY):
+        batch = missing[start:start + IDS_PER_QUERY]
+        url = f"{UNIPROT_TAXONOMY_URL}/search"
+        params = {"query": "id:(" + " OR ".join(str(i) for i in batch) + ")", "format": "json", "size": PAGE_SIZE}
+        while url:
+            response = Http.get(url, params=params)
+            response.raise_for_status()
+            for result in response.json().get("results", []):
+                entry = {
+                    "scientificName": result.get("scientificName", ""),
+                    "lineage": result.get("lineage", []),
+                }
+                _remember(result["taxonId"], entry)
+                if Lookup_cache.ENABLED and entry["scientificName"]:
+                    cache.set(result["taxonId"], entry)
+            # Further pages are linked from the response header
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    return {taxon_id: lookup_id(taxon_id) for taxon_id in ids if lookup_id(taxon_id) is not None}
@@ -0,0 +1,437 @@
+"""
+Compiles the JSON-LD template (data/Pathogen_schemav2.json) once into a fixed list of
+triple patterns with slots, so each ENA row can be written straight to N-Triples
+instead of going through pyld expansion, an rdflib parse and skolemization per row.
+
+The output is isomorphic to the pyld/rdflib path: a slot that is missing for a row
+drops the triples carrying it, a missing @id slot turns its node into a skolemized
+blank node, and IRIs that pyld would reject as relative are dropped the same way.
+
+Blank nodes are skolemized by content rather than at random: the IRI is a hash of
+the node's parent (subject and predicate pointing at it) and of its own IRI and
+literal properties. Identical input therefore always gives identical triples, and
+nodes with the same content under the same parent, such as the agent class of a
+disease, collapse to one IRI across rows and runs.
+
+Triples that do not depend on any RUN_SLOTS value describe entities shared by many
+rows (the disease, its agent class, the taxon, the place). emit_frame can hand
+those back separately, once per batch, and SharedTriples collects them over a
+harvest and writes each of them once, sorted, to a shared document of its own.
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+import pandas as pd
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+SKOLEM_BASE = "https://example.com/.well-known/genid/"
+
+# Placeholders written into the template before compiling. These mirror the
+# assignments serviceCallByTaxonID used to make on every row.
+DISEASE_IRI = "https://example.com/diseases/{pathogen_name_clean}"
+TAXON_IRI = "https://purl.uniprot.org/taxonomy/{tax_id}"
+
+TEMPLATE_SLOTS = [
+    (("@graph", 0, "@id"), DISEASE_IRI),
+    (("@graph", 1, "associatedDisease", "@id"), DISEASE_IRI),
+    (("@graph", 0, "name"), "{pathogen_name}"),
+    (("@graph", 0, "infectiousAgentClass", "name"), "{agent_name}"),
+    (("@graph", 1, "@id"), TAXON_IRI),
+    (("@graph", 1, "name"), TAXON_IRI),
+    (("@graph", 1, "identifier"), "NCBI:txid{tax_id}"),
+    (("@graph", 0, "additionalProperty", 0, "value"), "{run_accession}"),
+    (("@graph", 0, "additionalProperty", 1, "value"), "{experiment_title}"),
+    (("@graph", 0, "additionalProperty", 2, "value"), "{description}"),
+    (("@graph", 0, "spatialCoverage", "name"), "{country}"),
+    (("@graph", 0, "spatialCoverage", "@id"), "{country}"),
+]
+
+# Slots that differ from run to run; triples depending on none of them are shared
+RUN_SLOTS = {"run_accession", "experiment_title", "description"}
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+
+# Same test pyld applies before emitting an IRI (anything else is silently dropped)
+ABSOLUTE_IRI = re.compile(r"^([A-Za-z][A-Za-z0-9+-.]*|_):[^\s]*$")
+
+_emitters = {}
+
+
+class Term:
+    """One position of a triple pattern: an IRI, a literal or a template blank node."""
+
+    def __init__(self, kind, value):
+        self.kind = kind  # "iri", "literal" or "bnode"
+        self.value = value
+        self.slots = SLOT_PATTERN.findall(value) if kind != "bnode" else []
+
+    def fill(self, values):
+        if not self.slots:
+            return self.value
+        for slot in self.slots:
+            if values.get(slot) is None:
+                return None
+        return SLOT_PATTERN.sub(lambda m: values[m.group(1)], self.value)
+
+    def fill_column(self, values):
+        """
+        Column version of fill: slot values may be scalars or pandas Series, and the
+        result is None (slot missing for every row), a constant str or a Series
+        with NaN where a row has no value for a slot.
+        """
+        result = ""
+        for i, part in enumerate(SLOT_PATTERN.split(self.value)):
+            if i % 2:
+                part = values.get(part)
+                if part is None:
+                    return None
+            result = result + part
+        return result
+
+
+def _escape_literal(value):
+    return (value.replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n")
+            .replace("\r", "\\r"))
+
+
+def _escape_column(column):
+    if isinstance(column, str):
+        return _escape_literal(column)
+    # One regex pass to find the few values that need escaping at all
+    needs_escape = column.str.contains(r'[\\"\n\r]', regex=True, na=False)
+    if not needs_escape.any():
+        return column
+    column = column.copy()
+    column[needs_escape] = column[needs_escape].map(_escape_literal)
+    return column
+
+
+class TemplateEmitter:
+    """
+    Fixed triple pattern compiled from a JSON-LD template.
+
+    Args:
+        json_ld_template (dict): The JSON-LD template, as loaded from disk.
+        slots (list): (path, placeholder) pairs written into the template before
+            compiling; templates that carry their own {slot} placeholders pass [].
+        run_slots (set): Slots whose values differ from run to run.
+    """
+
+    def __init__(self, json_ld_template, slots=TEMPLATE_SLOTS, run_slots=RUN_SLOTS):
+        doc = json.loads(json.dumps(json_ld_template))
+        for path, placeholder in slots:
+            node = doc
+            for key in path[:-1]:
+                node = node[key]
+            node[path[-1]] = placeholder
+
+        contexts = doc.get("@context", {})
+        context = {}
+        for ctx in contexts if isinstance(contexts, list) else [contexts]:
+            context.update(ctx)
+        self.vocab = context.pop("@vocab", "")
+        self.prefixes = context
+
+        self.patterns = []
+        self.parents = {}
+        self._bnode_count = 0
+        for node in doc.get("@graph", [doc]):
+            self._compile_node(node, None)
+
+        # Own IRI/literal properties of each blank node, in pattern order, for hashing
+        self.properties = {label: [] for label in self.parents}
+        for subject, s_fallback, predicate, obj, o_fallback in self.patterns:
+            label = _bnode_label(subject, s_fallback)
+            if label is not None:
+                self.properties[label].append((predicate, obj, o_fallback))
+
+        # Whether each pattern belongs to a shared entity rather than to the run
+        self.shared = [not (self._run_dependent(subject, s_fallback, run_slots)
+                            or self._run_dependent(obj, o_fallback, run_slots))
+                       for subject, s_fallback, predicate, obj, o_fallback in self.patterns]
+
+    def _run_dependent(self, term, fallback, run_slots):
+        """Whether a term, or the content of the blank node it may be, uses a run slot."""
+        if run_slots.intersection(term.slots):
+            return True
+        label = _bnode_label(term, fallback)
+        if label is None:
+            return False
+        parent = self.parents[label]
+        if parent is not None and self._run_dependent(parent[0], parent[1], run_slots):
+            return True
+        # The same properties _content hashes: IRI and literal objects only
+        return any(self._run_dependent(obj, None, run_slots)
+                   for predicate, obj, o_fallback in self.properties[label] if obj.kind != "bnode")
+
+    def _expand(self, term):
+        prefix, sep, suffix = term.partition(":")
+        if sep and prefix in self.prefixes:
+            return self.prefixes[prefix] + suffix
+        if sep:
+            return term
+        return self.vocab + term
+
+    def _compile_node(self, node, parent):
+        """
+        Adds the patterns of a node object and returns the term naming it.
+
+        Args:
+            node (dict): The node object.
+            parent (tuple): (subject, fallback, predicate) pointing at the node, or
+                None for a top-level node.
+        """
+        if "@id" in node:
+            subject = Term("iri", node["@id"])
+            # Slotted @id: a missing value leaves the node as a blank node
+            fallback = Term("bnode", f"b{self._bnode_count}") if subject.slots else None
+            self._bnode_count += 1
+        else:
+            subject = Term("bnode", f"b{self._bnode_count}")
+            fallback = None
+            self._bnode_count += 1
+        label = _bnode_label(subject, fallback)
+        if label is not None:
+            self.parents[label] = parent
+
+        types = node.get("@type", [])
+        for rdf_type in [types] if isinstance(types, str) else types:
+            self.patterns.append((subject, fallback, RDF_TYPE, Term("iri", self._expand(rdf_type)), None))
+
+        for key, value in node.items():
+            if key.startswith("@"):
+                continue
+            predicate = self._expand(key)
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict):
+                    obj, obj_fallback = self._compile_node(item, (subject, fallback, predicate))
+                    self.patterns.append((subject, fallback, predicate, obj, obj_fallback))
+                else:
+                    self.patterns.append((subject, fallback, predicate, Term("literal", str(item)), None))
+        return subject, fallback
+
+    def emit(self, values):
+        """
+        Writes the N-Triples for one row.
+
+        Args:
+            values (dict): Slot name to string value, or None when the row has no
+                valid value for that slot.
+
+        Returns:
+            str: N-Triples document, blank nodes replaced by content-addressed skolem IRIs.
+        """
+        bnodes = {}
+        lines = []
+        for subject, s_fallback, predicate, obj, o_fallback in self.patterns:
+            s = self._node_term(subject, s_fallback, values, bnodes)
+            o = self._node_term(obj, o_fallback, values, bnodes) if obj.kind != "literal" else None
+            if s is None:
+                continue
+            if obj.kind == "literal":
+                literal = obj.fill(values)
+                if literal is None:
+                    continue
+                lines.append(f'{s} <{predicate}> "{_escape_literal(literal)}" .\n')
+            elif o is not None:
+                lines.append(f"{s} <{predicate}> {o} .\n")
+        return "".join(lines)
+
+    def emit_frame(self, values, index, shared_lines=None):
+        """
+        Writes the N-Triples for a whole batch of rows with column operations.
+
+        Args:
+            values (dict): Slot name to a pandas Series (NaN where the row has no
+                valid value), a str shared by every row, or None.
+            index (pandas.Index): Index of the rows in the batch.
+            shared_lines (list): If given, the triples of shared entities are
+                appended to it, each once, and left out of the row documents.
+
+        Returns:
+            pandas.Series: One N-Triples document per row, the same as emit gives
+            when shared_lines is None.
+        """
+        nodes = {}
+        lines = []
+        shared = {}
+        for (subject, s_fallback, predicate, obj, o_fallback), is_shared in zip(self.patterns, self.shared):
+            s = self._node_column(subject, s_fallback, values, index, nodes)
+            if obj.kind == "literal":
+                literal = obj.fill_column(values)
+                o = None if literal is None else '"' + _escape_column(literal) + '"'
+            else:
+                o = self._node_column(obj, o_fallback, values, index, nodes)
+            if s is None or o is None:
+                continue
+            line = s + f" <{predicate}> " + o + " .\n"
+            if shared_lines is not None and is_shared:
+                shared.update(dict.fromkeys(line.dropna().unique() if isinstance(line, pd.Series) else [line]))
+                continue
+            lines.append(line.fillna("").tolist() if isinstance(line, pd.Series) else [line] * len(index))
+        if shared_lines is not None:
+            shared_lines.extend(shared)
+        # Join the triples of each row in a single pass over the columns
+        return pd.Series(["".join(row) for row in zip(*lines)] if lines else "", index=index, dtype=object)
+
+    def _node_column(self, term, fallback, values, index, nodes):
+        """Subject/object column of a node term, computed once per batch."""
+        if id(term) in nodes:
+            return nodes[id(term)]
+        column = None
+        if term.kind == "iri":
+            iri = term.fill_column(values)
+            if isinstance(iri, str):
+                column = f"<{iri}>" if ABSOLUTE_IRI.match(iri) else None
+            elif iri is None:
+                column = self._node_column(fallback, None, values, index, nodes)
+            else:
+                missing = iri.isna()
+                absolute = iri.where(~missing, "").str.match(ABSOLUTE_IRI).astype(bool)
+                column = ("<" + iri + ">").where(absolute)
+                if missing.any():
+                    column = column.where(~missing, self._node_column(fallback, None, values, index, nodes))
+        else:
+            content = self._content_column(term.value, values, index, nodes)
+            if isinstance(content, str):
+                column = _skolem_iri(content)
+            else:
+                column = pd.Series([_skolem_iri(c) for c in content], index=index, dtype=object)
+        nodes[id(term)] = column
+        return column
+
+    def _content_column(self, label, values, index, nodes):
+        """Column version of _content: a str shared by every row, or a Series."""
+        content = ""
+        parent = self.parents[label]
+        if parent is not None:
+            subject, s_fallback, predicate = parent
+            s = self._node_column(subject, s_fallback, values, index, nodes)
+            s = "" if s is None else s.fillna("") if isinstance(s, pd.Series) else s
+            content = "^" + s + f" <{predicate}>\n"
+        for predicate, obj, o_fallback in self.properties[label]:
+            if obj.kind == "literal":
+                literal = obj.fill_column(values)
+                o = None if literal is None else '"' + _escape_column(literal) + '"'
+            elif obj.kind == "iri":
+                iri = obj.fill_column(values)
+                if iri is None or isinstance(iri, str):
+                    o = f"<{iri}>" if iri is not None and ABSOLUTE_IRI.match(iri) else None
+                else:
+                    absolute = iri.fillna("").str.match(ABSOLUTE_IRI).astype(bool)
+                    o = ("<" + iri + ">").where(absolute)
+            else:
+                o = None
+            if o is None:
+                continue
+            line = f"<{predicate}> " + o + "\n"
+            content = content + (line.fillna("") if isinstance(line, pd.Series) else line)
+        return content
+
+    def _node_term(self, term, fallback, values, bnodes):
+        if term.kind == "iri":
+            iri = term.fill(values)
+            if iri is None:
+                term = fallback
+            elif ABSOLUTE_IRI.match(iri):
+                return f"<{iri}>"
+            else:
+                return None
+        if term.value not in bnodes:
+            bnodes[term.value] = _skolem_iri(self._content(term.value, values, bnodes))
+        return bnodes[term.value]
+
+    def _content(self, label, values, bnodes):
+        """
+        Canonical text hashed into the skolem IRI of a blank node: the parent's
+        term and predicate, then the node's IRI and literal properties. Blank-node
+        objects are left out so that a node never depends on its own children.
+        """
+        content = ""
+        parent = self.parents[label]
+        if parent is not None:
+            subject, s_fallback, predicate = parent
+            content = f"^{self._node_term(subject, s_fallback, values, bnodes) or ''} <{predicate}>\n"
+        for predicate, obj, o_fallback in self.properties[label]:
+            if obj.kind == "literal":
+                literal = obj.fill(values)
+                o = None if literal is None else f'"{_escape_literal(literal)}"'
+            elif obj.kind == "iri":
+                iri = obj.fill(values)
+                o = f"<{iri}>" if iri is not None and ABSOLUTE_IRI.match(iri) else None
+            else:
+                o = None
+            if o is not None:
+                content += f"<{predicate}> {o}\n"
+        return content
+
+
+def _bnode_label(subject, fallback):
+    """Template label of the blank node a subject may become, or None for a fixed IRI."""
+    if subject.kind == "bnode":
+        return subject.value
+    return fallback.value if fallback is not None else None
+
+
+def _skolem_iri(content):
+    return f"<{SKOLEM_BASE}{hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]}>"
+
+
+class SharedTriples:
+    """
+    Seen-set of the shared-entity triples of one harvest, across taxa, which
+    write_to writes to the sink's shared document once the harvest is done. Sorted
+    and kept apart from the run documents, they are the same whichever taxon or
+    thread came first, and each run document holds only its own triples.
+    Thread-safe, so concurrent harvesting threads can share it.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.written = 0
+        # Only repeats across batches: emit_frame already merged those within a batch
+        self.cross_batch_repeats = 0
+
+    def collect(self, documents, shared_lines):
+        """
+        Records the shared triples of a batch.
+
+        Args:
+            documents (pandas.Series or list): Run documents of a batch, as
+                emit_frame returns them with shared_lines.
+            shared_lines (list): The batch's shared triples.
+
+        Returns:
+            The documents, unchanged.
+        """
+        with self.lock:
+            new = [line for line in shared_lines if line not in self.seen]
+            self.seen.update(new)
+            self.written += len(new)
+            self.cross_batch_repeats += len(shared_lines) - len(new)
+        return documents
+
+    def write_to(self, sink):
+        """Writes the shared triples collected so far, sorted, with sink.write_shared; returns their number."""
+        with self.lock:
+            lines = sorted(self.seen)
+        if lines:
+            sink.write_shared("".join(lines))
+        return len(lines)
+
+
+def get_emitter(template_file, slots=TEMPLATE_SLOTS):
+    """
+    Returns the compiled emitter for a template file, compiling it on first use
+    with the given slots (a template file is always compiled with the same ones).
+    """
+    if template_file not in _emitters:
+        with open(template_file, 'r', encoding='utf-8') as f:
+            _emitters[template_file] = TemplateEmitter(json.load(f), slots)
+    return _emitters[template_file]
@@ -1,5 +1,10 @@
-from openai import OpenAI
-import requests
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from defs import Http
+from defs import Instrumentation
+from defs import Lookup_cache
+from defs import Taxonomy_resolver
 
 """
 The following code fetches lineage information from UniProt (using a tool binded to an LLM) to get Pathogen class 
@@ -8,15 +13,37 @@ The following code fetches lineage information from UniProt (using a tool binded
 
 
 
-# Initialize the OpenAI client
+UNIPROT_TAXONOMY_URL = "https://rest.uniprot.org/taxonomy"
 
 url = "http://lambda5.cels.anl.gov:44497/v1"
-client = OpenAI(
-    base_url=url,
-    api_key="."
-)
+client = None  # the OpenAI client, created by get_client on first use (importing openai takes most of a second)
+
+
+def get_client():
+    """The OpenAI client shared by all threads, created on first use."""
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(
+            base_url=url,
+            api_key="."
+        )
+    return client
+
+
+def _count_usage(trace, response):
+    """Adds the token counts of a completion to its span and the llm_tokens counter."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    trace.add(prompt_tokens=usage.prompt_tokens or 0, completion_tokens=usage.completion_tokens or 0)
+    Instrumentation.count("llm_tokens", usage.prompt_tokens or 0, kind="prompt", model=response.model)
+    Instrumentation.count("llm_tokens", usage.completion_tokens or 0, kind="completion", model=response.model)
+
 
 # Define the tool function
+@Lookup_cache.cached("lineage", keep=bool)
 def get_InfectiousAgentClass(pathogen_name: str):
     """
     Fetches pathogen lineage from UniProt.
@@ -27,13 +54,23 @@ def get_InfectiousAgentClass(pathogen_name: str):
     Returns:
         list: Lineage of the pathogen.
     """
+    # Taxa already fetched in bulk by Taxonomy_resolver.resolve_taxa
+    entry = Taxonomy_resolver.lookup_name(pathogen_name)
+    if entry is not None:
+        return entry["lineage"]
+
     query = pathogen_name.replace(" ", "+")
-    url = f"https://rest.uniprot.org/taxonomy/search?query={query}&format=json"
-    response = requests.get(url).json()
+    url = f"{UNIPROT_TAXONOMY_URL}/search?query={query}&format=json"
+    with Instrumentation.span("uniprot_lineage"):
+        response = Http.get(url)
+    response.raise_for_status()
+    response = response.json()
     lineage = response["results"][0].get("lineage", [])
     return lineage
 
 
+# Bump the version when the model or prompt changes to invalidate cached answers
+@Lookup_cache.cached("pathogen_class", version="gpt-4.1/1")
 def get_pathogen_class(pathogen_name: str):
     # Define the system and user messages
     messages = [
@@ -71,12 +108,15 @@ def get_pathogen_class(pathogen_name: str):
 
 
     # Step 1: Model decides whether to call the tool
-    response = client.chat.completions.create(
-        model="gpt-4.1",  # You can replace with gpt-4o, gpt-4.1-mini, etc.
-        messages=messages,
-        tools=tools,
-        tool_choice="auto",
-    )
+    client = get_client()
+    with Http.host_slot(str(client.base_url)), Instrumentation.span("llm", call="tool_choice") as trace:
+        response = client.chat.completions.create(
+            model="gpt-4.1",  # You can replace with gpt-4o, gpt-4.1-mini, etc.
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+        )
+        _count_usage(trace, response)
 
     tool_call = response.choices[0].message.tool_calls
 
@@ -95,12 +135,124 @@ def get_pathogen_class(pathogen_name: str):
             "content": str(result)
         })
 
-        final_response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=messages
-        )
+        with Http.host_slot(str(client.base_url)), Instrumentation.span("llm", call="tool_answer") as trace:
+            final_response = client.chat.completions.create(
+                model="gpt-4.1",
+                messages=messages
+            )
+            _count_usage(trace, final_response)
         print("Lineage was retrieved from UniProt. LLM used the available tool.")
         return final_response.choices[0].message.content
     else:
         # Model responded directly
         return response.choices[0].message.content 
+
+
+PATHOGEN_CLASSES = ["Virus", "Fungus", "Helminth", "Bacteria", "Prion", "Protozoa"]
+BATCH_SIZE = 50  # pathogen names per completion
+MAX_BATCH_ATTEMPTS = 3
+
+# The batch prompt differs from the tool-calling one, so its answers are cached apart;
+# bump the version when the model or BATCH_SYSTEM_PROMPT changes
+batch_cache = Lookup_cache.get_cache("pathogen_class_batch", version="gpt-4.1/batch-1")
+
+BATCH_SYSTEM_PROMPT = """You are a biomedical AI assistant.
+You are given a JSON list of pathogens, each with its name and its UniProt lineage.
+Classify every pathogen as one of the following only:
+Virus, Fungus, Helminth, Bacteria, Prion, or Protozoa.
+Answer with one entry per pathogen, repeating its name exactly."""
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pathogen_classes",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "classes": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "class": {"type": "string", "enum": PATHOGEN_CLASSES}
+                        },
+                        "required": ["name", "class"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["classes"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+def _lineage_names(pathogen_name):
+    """UniProt lineage as a list of scientific names, empty if UniProt has no match."""
+    try:
+        return [entry.get("scientificName") for entry in get_InfectiousAgentClass(pathogen_name)]
+    except (IndexError, KeyError, ValueError):
+        return []
+
+
+def _classify_batch(pathogen_names, lineages):
+    """One structured-output completion for a batch; returns the answers as given."""
+    pathogens = [{"name": name, "lineage": lineages.get(name, [])} for name in pathogen_names]
+    client = get_client()
+    with Http.host_slot(str(client.base_url)), Instrumentation.span("llm", call="batch") as trace:
+        response = client.chat.completions.create(
+            model="gpt-4.1",
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(pathogens)}
+            ],
+            response_format=BATCH_RESPONSE_FORMAT,
+        )
+        trace.add(pathogens=len(pathogen_names))
+        _count_usage(trace, response)
+    try:
+        answers = json.loads(response.choices[0].message.content)["classes"]
+        return {answer["name"]: answer["class"] for answer in answers}
+    except (TypeError, KeyError, ValueError):
+        return {}
+
+
+def get_pathogen_classes(pathogen_names: list[str]) -> dict[str, str]:
+    """
+    Classifies many pathogens with one completion per BATCH_SIZE names.
+
+    Lineages for all names are fetched from UniProt up front and sent with the
+    names. Answers outside the six classes, or names the model skipped, are
+    retried on their own batches up to MAX_BATCH_ATTEMPTS times.
+
+    Args:
+        pathogen_names (list[str]): Pathogen names (e.g., "Monkeypox virus").
+
+    Returns:
+        dict[str, str]: Pathogen name to class; names never validly answered are left out.
+    """
+    names = [name for name in dict.fromkeys(pathogen_names) if name]
+    results = batch_cache.get_many(names) if Lookup_cache.ENABLED else {}
+    pending = [name for name in names if name not in results]
+    if not pending:
+        return results
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        lineages = dict(zip(pending, pool.map(_lineage_names, pending)))
+
+    for _ in range(MAX_BATCH_ATTEMPTS):
+        for start in range(0, len(pending), BATCH_SIZE):
+            answers = _classify_batch(pending[start:start + BATCH_SIZE], lineages)
+            for name in pending[start:start + BATCH_SIZE]:
+                if answers.get(name) in PATHOGEN_CLASSES:
+                    results[name] = answers[name]
+                    if Lookup_cache.ENABLED:
+                        batch_cache.set(name, answers[name])
+        pending = [name for name in pending if name not in results]
+        if not pending:
+            break
+
+    return results
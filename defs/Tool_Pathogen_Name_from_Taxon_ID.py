@@ -1,4 +1,39 @@
-import requests
+from defs import Http
+from defs import Instrumentation
+from defs import Lookup_cache
+from defs import Taxonomy_resolver
+
+UNIPROT_TAXONOMY_URL = "https://rest.uniprot.org/taxonomy"
+
+def has_name(entry):
+    """Whether a taxon entry is worth caching: one without a name is retried next time."""
+    return bool(entry["scientificName"])
+
+@Lookup_cache.cached("taxon_entry", keep=has_name)
+def get_taxon_entry(taxon_id: int):
+    """
+    Fetches the scientific name and lineage of a taxon from UniProt.
+
+    Args:
+        taxon_id (int): UniProt taxonomy ID.
+
+    Returns:
+        dict: "scientificName" (str) and "lineage" (list of UniProt lineage entries).
+    """
+    # Taxa already fetched in bulk by Taxonomy_resolver.resolve_taxa
+    entry = Taxonomy_resolver.lookup_id(taxon_id)
+    if entry is not None:
+        return entry
+
+    url = f"{UNIPROT_TAXONOMY_URL}/{taxon_id}"
+    with Instrumentation.span("uniprot_taxon", taxon=taxon_id):
+        response = Http.get(url)
+    response.raise_for_status()
+    response = response.json()
+    return {
+        "scientificName": response.get("scientificName", ""),
+        "lineage": response.get("lineage", []),
+    }
 
 def get_pathogen_name_by_taxon_id(taxon_id: int):
     """
@@ -10,6 +45,16 @@ def get_pathogen_name_by_taxon_id(taxon_id: int):
     Returns:
         str: Scientific name of the pathogen.
     """
-    url = f"https://rest.uniprot.org/taxonomy/{taxon_id}"
-    response = requests.get(url).json()
-    return response.get("scientificName", "")
+    return get_taxon_entry(taxon_id)["scientificName"]
+
+def get_lineage_by_taxon_id(taxon_id: int):
+    """
+    Fetches the lineage of a taxon from UniProt using taxon ID.
+
+    Args:
+        taxon_id (int): UniProt taxonomy ID.
+
+    Returns:
+        list: Lineage entries (scientificName, taxonId, rank, ...).
+    """
+    return get_taxon_entry(taxon_id)["lineage"]
@@ -0,0 +1,202 @@
+"""
+Output sinks for converted ENA runs.
+
+RunFileSink keeps the original layout, one data/output/<run_accession>.nt file per
+run. ShardSink appends all runs to a few size-capped, compressed N-Quads (or
+N-Triples) shards with one named graph per taxon, buffering writes in memory, and
+keeps a manifest of the shards next to them: manifest.json with per-shard counts
+and shards.txt with one file name per line, which the Qleverfile reads to load
+them.
+"""
+
+import gzip
+import json
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for compression="zstd"
+    zstandard = None
+
+from defs import ENA_tax_eq
+
+SHARD_DIR = "data/shards"
+GRAPH_IRI = "https://example.com/graphs/taxon/{taxon}"
+# Triples of entities shared across runs and taxa (Template_emitter.SharedTriples)
+SHARED_DOCUMENT = "shared"  # RunFileSink: <output_dir>/shared.nt
+SHARED_GRAPH = "https://example.com/graphs/shared"  # ShardSink: their named graph
+
+MAX_SHARD_BYTES = 256 * 1024 * 1024  # uncompressed bytes per shard
+BUFFER_BYTES = 4 * 1024 * 1024  # bytes buffered before a compressed write
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", None: ""}
+
+
+class RunFileSink:
+    """One N-Triples file per run accession, as ENA_tax_eq.write_documents writes them."""
+
+    def __init__(self, output_dir=ENA_tax_eq.OUTPUT_DIR):
+        self.output_dir = output_dir
+
+    def write(self, taxon, run_accessions, documents, graph=None):
+        return ENA_tax_eq.write_documents(run_accessions, documents, self.output_dir)
+
+    def write_shared(self, ntriples):
+        """Writes the shared-entity triples of a harvest to SHARED_DOCUMENT.nt."""
+        return ENA_tax_eq.write_documents([SHARED_DOCUMENT], [ntriples], self.output_dir)
+
+    def remove(self, taxon, run_accessions):
+        for run_accession in run_accessions:
+            path = os.path.join(self.output_dir, f"{run_accession}.nt")
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardSink:
+    """
+    Size-capped, compressed shards with a named graph per taxon.
+
+    Args:
+        output_dir (str): Directory of the shards and their manifest.
+        compression (str): "gzip", "zstd" (needs the zstandard package) or None.
+        quads (bool): Write N-Quads with the taxon's named graph (GRAPH_IRI), or
+            plain N-Triples.
+        max_bytes (int): A new shard is started once this many uncompressed bytes
+            were written to the current one.
+        buffer_bytes (int): Bytes buffered before they are compressed and written.
+        append (bool): Keep the shards already listed in the manifest and add new
+            ones after them. Otherwise those shards are deleted first.
+    """
+
+    def __init__(self, output_dir=SHARD_DIR, compression="gzip", quads=True, max_bytes=MAX_SHARD_BYTES,
+                 buffer_bytes=BUFFER_BYTES, append=False):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("compression='zstd' needs the zstandard package")
+        self.output_dir = output_dir
+        self.compression = compression
+        self.quads = quads
+        self.max_bytes = max_bytes
+        self.buffer_bytes = buffer_bytes
+        self.lock = threading.Lock()
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.shards = self._read_manifest()
+        if not append:
+            for shard in self.shards:
+                path = os.path.join(output_dir, shard["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+            self.shards = []
+        self._stream = None
+        self._shard = None
+        self._buffer = []
+        self._buffered = 0
+
+    def _read_manifest(self):
+        path = os.path.join(self.output_dir, "manifest.json")
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)["shards"]
+
+    def _write_manifest(self):
+        manifest = {"format": "nq" if self.quads else "nt", "shards": self.shards}
+        for name, content in (("manifest.json", json.dumps(manifest, indent=2)),
+                              ("shards.txt", "".join(shard["file"] + "\n" for shard in self.shards))):
+            path = os.path.join(self.output_dir, name)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+
+    def _open_shard(self):
+        number = len(self.shards)
+        name = f"part-{number:05d}.{'nq' if self.quads else 'nt'}{EXTENSIONS[self.compression]}"
+        path = os.path.join(self.output_dir, name)
+        if self.compression == "gzip":
+            self._stream = gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, 'wb'))
+        else:
+            self._stream = open(path, 'wb')
+        self._shard = {"file": name, "compression": self.compression, "graphs": [], "triples": 0, "bytes": 0}
+
+    def _close_shard(self):
+        self._stream.close()
+        self._shard["compressed_bytes"] = os.path.getsize(os.path.join(self.output_dir, self._shard["file"]))
+        self.shards.append(self._shard)
+        self._stream = None
+        self._shard = None
+        self._write_manifest()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode('utf-8')
+        self._stream.write(data)
+        self._shard["bytes"] += len(data)
+        self._buffer = []
+        self._buffered = 0
+        if self._shard["bytes"] >= self.max_bytes:
+            self._close_shard()
+
+    def write(self, taxon, run_accessions, documents, graph=None):
+        """
+        Appends the documents of a batch of runs of one taxon; returns the number of
+        runs. They go into the taxon's named graph unless another graph IRI is given.
+        """
+        graph = graph or GRAPH_IRI.format(taxon=taxon)
+        # Every N-Triples line ends in " .\n"; literals have their newlines escaped
+        suffix = f" <{graph}> .\n" if self.quads else None
+        count = 0
+        with self.lock:
+            for ntriples in documents:
+                text = ntriples.replace(" .\n", suffix) if suffix else ntriples
+                if self._stream is None and not self._buffer:
+                    self._open_shard()
+                if graph not in self._shard["graphs"]:
+                    self._shard["graphs"].append(graph)
+                self._shard["triples"] += ntriples.count("\n")
+                self._buffer.append(text)
+                self._buffered += len(text)
+                count += 1
+                if self._buffered >= self.buffer_bytes:
+                    self._flush()
+        return count
+
+    def write_shared(self, ntriples):
+        """Appends the shared-entity triples of a harvest in the SHARED_GRAPH named graph."""
+        return self.write(None, [SHARED_DOCUMENT], [ntriples], graph=SHARED_GRAPH)
+
+    def remove(self, taxon, run_accessions):
+        """
+        Shards are append-only: removed runs stay in the shards written so far.
+        Incremental harvests record them in their delete deltas instead.
+        """
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self._stream is not None:
+                self._close_shard()
+            else:
+                self._write_manifest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
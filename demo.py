@@ -1,21 +1,31 @@
-from openai import OpenAI
 import chainlit as cl
 from sparql_llm.validate_sparql import extract_sparql_queries
 from sparql_llm.utils import query_sparql
+import functools
 import json
 from pathlib import Path
 
+from defs import Example_retriever
+from defs import Instrumentation
+from defs import Sparql_cache
+from defs import Sparql_chat
+
 PATHOGEN_SCHEMA_FILE = Path("data", "Pathogen_schemav2.json")
 EXAMPLE_FILE = Path("data", "sparql-examples.json")
 
 
-with PATHOGEN_SCHEMA_FILE.open("r", encoding="utf-8") as f:
-    schema_info = json.dumps(json.load(f), indent=2)
-with EXAMPLE_FILE.open("r", encoding="utf-8") as f:
-    example_queries = json.dumps(json.load(f), indent=2)
+@functools.cache
+def prompt_context():
+    """
+    Schema summary (one line per type instead of the whole template) and the BM25
+    index that picks the examples closest to each question, read on the first message.
+    """
+    with PATHOGEN_SCHEMA_FILE.open("r", encoding="utf-8") as f:
+        schema_info = Example_retriever.schema_summary(json.load(f))
+    return schema_info, Example_retriever.load_index(EXAMPLE_FILE)
 
 
-RAG_PROMPT = f"""
+RAG_PROMPT = """
 You are an assistant that helps users formulate SPARQL queries to be executed on a SPARQL endpoint.
 Your role is to transform the user question into a SPARQL query based on the context provided in the prompt.
 
@@ -36,72 +46,50 @@ If the information provided in the examples above is not sufficient to answer th
 {schema_info}
 """
 
-url = "http://lambda5.cels.anl.gov:44497/v1"
-# url = "https://argo-bridge.cels.anl.gov"
 
-# Initialize the client with custom base URL and API key
-client = OpenAI(
-    base_url=url,
-    api_key="."
-)
+def build_prompt(question: str) -> str:
+    """System prompt with the Example_retriever.TOP_K examples closest to the question."""
+    schema_info, example_index = prompt_context()
+    examples = Example_retriever.format_examples(example_index.search(question))
+    return RAG_PROMPT.format(example_queries=examples, schema_info=schema_info)
+
+# Results of repeated queries (retries, starter questions) until the QLever index is rebuilt
+query_cache = Sparql_cache.SparqlCache(query_sparql)
 
-def execute_query(last_msg: str) -> list[dict[str, str]]:
+async def execute_query(last_msg: str) -> list[dict[str, str]]:
     """Extract SPARQL query from markdown and execute it."""
     for extracted_query in extract_sparql_queries(last_msg):
         if extracted_query.get("query") and extracted_query.get("endpoint_url"):
-            res = query_sparql(extracted_query.get("query"), extracted_query.get("endpoint_url"))
+            res = await query_cache.aquery(extracted_query.get("query"), extracted_query.get("endpoint_url"))
             return res.get("results", {}).get("bindings", [])
+    return []
 
 @cl.on_message
 async def on_message(msg: cl.Message):
     """Main function to handle when user send a message to the assistant."""
     
+    system_prompt = build_prompt(msg.content)
+    prompt_tokens = Example_retriever.count_tokens(system_prompt)
+    Instrumentation.count("llm_tokens", prompt_tokens, kind="prompt", model=Sparql_chat.MODEL)
+    print(f"System prompt: {prompt_tokens} tokens")
     messages = [
-        {"role": "system", "content": RAG_PROMPT},
+        {"role": "system", "content": system_prompt},
         {"role": "user", "content": msg.content},
         *cl.chat_context.to_openai(),
     ]
 
-
-    max_try_count = 3
-    query_success = False
-    for _ in range(max_try_count):
-        answer = cl.Message(content="")
-
-        response = client.chat.completions.create(
-            model="gpt5",
-            messages=messages,
-            stream=True,
-            temperature=0.0,
-            seed=42,
-        )
-
-        for r in response:
-            delta = r.choices[0].delta
-            if hasattr(delta, "content") and delta.content:
-                await answer.stream_token(delta.content)
-        await answer.send()
-
-
-        if query_success:
-            break
-
-        query_res = execute_query(answer.content)
-        if len(query_res) < 1:
-            print("⚠️ No results, trying to fix")
-            messages = [
-                {"role": "user", "content": f"""The query you provided returned no results, please fix the query:\n\n{answer.content}"""},
-                *cl.chat_context.to_openai(),
-            ]
-        else:
-            print(f"✅ Got {len(query_res)} results! Summarizing them, then stopping the chat")
-            async with cl.Step(name=f"{len(query_res)} query results ✨") as step:
-                step.output = f"```json\n{json.dumps(query_res, indent=2)}\n```"
-            messages = [
-                {"role": "user", "content": f"""The query you provided returned these results, summarize them:\n\n{json.dumps(query_res, indent=2)}"""},
-                *cl.chat_context.to_openai(),
-            ]
-            query_success = True
+    # Chainlit cancels this task when the user presses stop; only this session's stream is closed
+    answer = cl.Message(content="")
+    async for event, value in Sparql_chat.chat_turns(messages, execute_query, cl.chat_context.to_openai):
+        if event == "token":
+            await answer.stream_token(value)
+        elif event == "answer":
+            await answer.send()
+            answer = cl.Message(content="")
+        elif event == "results":
+            async with cl.Step(name=f"{len(value)} query results ✨") as step:
+                step.output = f"```json\n{json.dumps(value, indent=2)}\n```"
+    print(f"Latency (s): {Sparql_chat.METRICS.summary()}, SPARQL cache: {query_cache.stats()}")
 
 @cl.set_starters
 async def set_starters():
@@ -0,0 +1,49 @@
+import sys
+
+from defs import ENA_dump_ingest
+from defs import Instrumentation
+from defs import Template_emitter
+from defs import Triple_sink
+
+DEFAULT_DUMPS = ["data/input/japan.tsv", "data/input/virus.tsv"]
+
+
+def main() -> int:
+
+    # ENA read_run TSV exports to convert, e.g. made with data/input/mpox.curl.sh (.gz is fine)
+    dump_files = sys.argv[1:] or DEFAULT_DUMPS
+
+    chunk_rows = 50000  #  Rows read and converted at a time
+    processes = 0  #  Set to the number of cores to convert in worker processes
+    resolve_names = False  #  Set to True to look names/classes up in UniProt and the LLM instead of reading them from the dump
+    shard_output = True  #  Set to False to write one .nt file per run to data/output instead of gzipped N-Quads shards to data/shards
+    dedup_shared = True  #  Set to False to repeat the disease, agent class, taxon and place triples in every run
+    trace_file = None  #  Set to e.g. "data/output/dump-trace.jsonl" to record timing spans per taxon and stage (or set PDN2RDF_TRACE)
+    metrics_port = None  #  Set to e.g. 9464 to serve the metrics in the Prometheus text format while it runs (or set PDN2RDF_METRICS_PORT)
+
+    if trace_file or metrics_port:
+        Instrumentation.configure(trace_file, metrics_port)
+
+    shared = Template_emitter.SharedTriples() if dedup_shared else None
+    sink = Triple_sink.ShardSink() if shard_output else Triple_sink.RunFileSink()
+    with sink:
+        summary = ENA_dump_ingest.ingest_dumps(dump_files, sink, chunk_rows, processes, resolve_names, shared)
+        if shared is not None:
+            shared.write_to(sink)
+
+    print(f"\nConverted {summary['runs']} runs from {len(dump_files)} file(s) in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:.0f} rows/s) to {sink.output_dir}/")
+    if summary["unclassified"]:
+        print(f"No agent class for {len(summary['unclassified'])} of {summary['taxa']} taxa, so their runs have no "
+              f"agent-class triple: {', '.join(summary['unclassified'][:20])}"
+              f"{', ...' if len(summary['unclassified']) > 20 else ''}")
+    if summary["runs_without_taxon"]:
+        print(f"{summary['runs_without_taxon']} runs without a tax_id, written without an agent class")
+    if shared is not None:
+        print(f"Shared triples: {shared.written} written, {shared.cross_batch_repeats} repeated across batches")
+    Instrumentation.print_summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
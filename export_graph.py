@@ -0,0 +1,36 @@
+import sys
+
+from defs import Graph_export
+
+
+def main() -> int:
+
+    # Edges of the "types" query (default), the "places" query, a .rq file, or a saved .tsv/.csv result
+    if len(sys.argv) < 2:
+        print("Usage: python export_graph.py <output.graphml|.gexf|.edgelist|.npz> [types | places | query.rq | result.tsv | result.csv]")
+        return 1
+    output = sys.argv[1]
+    source = sys.argv[2] if len(sys.argv) > 2 else "types"
+
+    endpoint = Graph_export.SPARQL_ENDPOINT
+    directed = False  #  Set to True to keep the edge direction of the triples
+
+    if source.endswith((".tsv", ".csv")):
+        rows = Graph_export.file_rows(source)
+    else:
+        if source == "types":
+            query = Graph_export.TYPE_EDGES_QUERY
+        elif source == "places":
+            query = Graph_export.PATHOGEN_PLACE_QUERY
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                query = f.read()
+        rows = Graph_export.sparql_rows(query, endpoint)
+
+    summary = Graph_export.export(rows, output, directed=directed)
+    print(f"{output}: {summary['nodes']} nodes, {summary['edges']} edges, {summary['predicates']} predicates")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
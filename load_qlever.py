@@ -0,0 +1,30 @@
+import os
+import sys
+
+from defs import Qlever_loader
+
+
+def main() -> int:
+
+    # plan: show what changed; auto: update or rebuild as needed; update / rebuild: force one
+    action = sys.argv[1] if len(sys.argv) > 1 else "auto"
+
+    endpoint = Qlever_loader.SPARQL_ENDPOINT
+    access_token = os.environ.get("QLEVER_ACCESS_TOKEN")  #  The server's ACCESS_TOKEN, needed for SPARQL UPDATE
+
+    loader = Qlever_loader.QleverLoader(updater=Qlever_loader.SparqlUpdater(endpoint, access_token))
+
+    if action == "plan":
+        plan = loader.plan()
+        for key in ("action", "added", "changed", "removed", "pending_deltas"):
+            print(f"{key}: {plan[key]}")
+        return 0
+
+    summary = loader.load(None if action == "auto" else action)
+    print(f"\n{summary['action']} took {summary['seconds']:.2f}s "
+          f"({summary['inserted']} triples inserted, {summary['deleted']} deleted)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+#!/bin/sh
+# GET_DATA_CMD of the Qleverfile: copies the shards listed in the shards.txt manifest of each
+# shard directory given (relative to ../../data/shards, "." for the ENA runs) to ./data, and
+# lists them all in ./data/shards.txt for CAT_INPUT_FILES. Stops with an error when there are none.
+#
+#   sh ./get_data.sh . ebisearch metrics
+set -e
+
+SHARDS=../../data/shards
+
+mkdir -p data
+rm -f data/shards.txt
+for dir in "$@"; do
+    if [ -s "$SHARDS/$dir/shards.txt" ]; then
+        mkdir -p "data/$dir"
+        sed "s|^|$SHARDS/$dir/|" "$SHARDS/$dir/shards.txt" | xargs cp -t "data/$dir"
+        sed "s|^|$dir/|" "$SHARDS/$dir/shards.txt" >> data/shards.txt
+    fi
+done
+
+if [ ! -s data/shards.txt ]; then
+    echo "No shards listed in $SHARDS/shards.txt or its subdirectories" >&2
+    exit 1
+fi